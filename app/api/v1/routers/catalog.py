@@ -1,42 +1,191 @@
-from fastapi import APIRouter, HTTPException, Query, status, Depends
-from app.schemas.product import ProductSchemaInDB, ProductSchemaResponse
-from app.services.product import ProductService
-from typing import List
-from fastapi_cache.decorator import cache
+from fastapi import APIRouter, HTTPException, Query, Request, status, Depends
+from app.schemas.product import CatalogSortEnum, FacetSchema, ProductPageSchema, ProductSchemaInDB, ProductSchemaResponse
+from app.services.attribute import AttributeService
+from app.services.product_card import ProductCardService
+from app.repositories.product_card import attribute_filters, category_filter
+from app.services.category import CategoryService
+from typing import Any, Dict, Iterable, List, Optional
 
-from app.utils.unit_of_work import UnitOfWork
+from app.services.product_card import CATALOG_TAG, category_tag, product_tag
+from app.utils.pagination import InvalidCursorError
+from app.utils.response_cache import response_cache
+from app.utils.unit_of_work import UnitOfWork, get_read_uow
 
 catalog_router = APIRouter(prefix='/api/v1/catalogs', tags=['Catalog'])
 
+CATALOG_QUERY_PARAMS = {'limit', 'offset', 'sort', 'cursor', 'category_id', 'q'}
+MAX_ATTRIBUTE_FILTERS = 10
+
+
+async def get_attribute_filters(request: Request, uow: UnitOfWork = Depends(get_read_uow)) -> Dict[str, List[str]]:
+    """
+    Collects attribute filters from the query string: every parameter that is not a regular
+    catalog parameter and names an existing attribute is a filter, e.g. `?color=red&color=blue&size=XL`.
+    Values of the same attribute are alternatives, different attributes must all match.
+    Other parameters (`?page=2`, a misspelt attribute) are ignored rather than matching no product.
+    """
+    attributes: Dict[str, List[str]] = {}
+    for name, value in request.query_params.multi_items():
+        if name not in CATALOG_QUERY_PARAMS:
+            attributes.setdefault(name, []).append(value)
+
+    if len(attributes) > MAX_ATTRIBUTE_FILTERS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f'At most {MAX_ATTRIBUTE_FILTERS} attribute filters are allowed'
+        )
+    known = await AttributeService.get_existing_names(uow=uow, names=list(attributes))
+    return {name: values for name, values in attributes.items() if name in known}
+
+
+def listing_tags(result: Any, kwargs: Dict[str, Any]) -> Iterable[str]:
+    """A listing is purged when one of its products changes or the listed category (or catalog) does"""
+    if isinstance(result, ProductPageSchema):
+        product_ids = [product.id for product in result.items]
+    else:
+        product_ids = [product['id'] for product in result]
+    scope = category_tag(kwargs['category_id']) if kwargs.get('category_id') is not None else CATALOG_TAG
+    return [scope, *(product_tag(_id) for _id in product_ids)]
+
+
+def facets_tags(result: Any, kwargs: Dict[str, Any]) -> Iterable[str]:
+    return [category_tag(kwargs['category_id']) if kwargs['category_id'] is not None else CATALOG_TAG]
+
+
+def product_tags(result: Any, kwargs: Dict[str, Any]) -> Iterable[str]:
+    return [product_tag(kwargs['product_id'])]
+
 
 @catalog_router.get('', status_code=status.HTTP_200_OK, response_model=List[ProductSchemaInDB])
-@cache(expire=30)
+@response_cache(tags=listing_tags)
 async def get_products_with_limit(
     limit: int = Query(10, description="Number of products to return", ge=1), 
     offset: int = Query(0, description="Number of products to skip", ge=0),
-    uow: UnitOfWork = Depends(UnitOfWork)
+    attributes: Dict[str, List[str]] = Depends(get_attribute_filters),
+    uow: UnitOfWork = Depends(get_read_uow)
 ):
-    return await ProductService.get_by_query_with_limit(uow=uow, limit=limit, offset=offset)
+    """
+    Returns a page of products. Any extra query parameter naming a product attribute filters by it,
+    e.g. `?color=red&size=XL`, see `/catalogs/facets` for the available values. Others are ignored.
+    """
+    return await ProductCardService.get_by_query_with_limit(
+        uow=uow, limit=limit, offset=offset, filters=attribute_filters(attributes), mappings=True
+    )
 
 
 @catalog_router.get('/categories/{category_id}', status_code=status.HTTP_200_OK, response_model=List[ProductSchemaInDB])
-@cache(expire=30)
+@response_cache(tags=listing_tags)
 async def get_products_by_category(
     category_id: int,
     limit: int = Query(10, description="Number of products to return", ge=1), 
     offset: int = Query(0, description="Number of products to skip", ge=0),
-    uow: UnitOfWork = Depends(UnitOfWork)
+    attributes: Dict[str, List[str]] = Depends(get_attribute_filters),
+    uow: UnitOfWork = Depends(get_read_uow)
 ):
-    return await ProductService.get_by_query_with_limit(uow=uow, limit=limit, offset=offset, category_id=category_id)
+    """Returns a page of products of the category and all of its subcategories."""
+    tree = await CategoryService.get_tree(uow=uow)
+    filters = [category_filter(tree.subtree_ids(category_id)), *attribute_filters(attributes)]
+    return await ProductCardService.get_by_query_with_limit(
+        uow=uow, limit=limit, offset=offset, filters=filters, mappings=True
+    )
+
+
+@catalog_router.get('/cursor', status_code=status.HTTP_200_OK, response_model=ProductPageSchema)
+@response_cache(tags=listing_tags)
+async def get_products_with_cursor(
+    sort: CatalogSortEnum = Query(CatalogSortEnum.newest, description="Sort order of the products"),
+    limit: int = Query(10, description="Number of products to return", ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="`next_cursor` of the previous page"),
+    attributes: Dict[str, List[str]] = Depends(get_attribute_filters),
+    uow: UnitOfWork = Depends(get_read_uow)
+):
+    """
+    Returns a page of products using keyset pagination.
+
+    Unlike `limit/offset`, the cost of a page does not depend on how deep it is.
+    Pass `next_cursor` from the response to get the next page, it is `null` on the last page.
+    Extra query parameters filter by product attribute, as in `GET /catalogs`.
+
+    :raises HTTPException: Status `400` if the cursor is invalid or was issued for another sort order.
+    """
+    try:
+        products, next_cursor = await ProductCardService.get_catalog_page(
+            uow=uow, sort=sort.value, limit=limit, cursor=cursor, filters=attribute_filters(attributes)
+        )
+    except InvalidCursorError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail='Invalid cursor')
+    return ProductPageSchema(items=products, next_cursor=next_cursor)
+
+
+@catalog_router.get('/categories/{category_id}/cursor', status_code=status.HTTP_200_OK, response_model=ProductPageSchema)
+@response_cache(tags=listing_tags)
+async def get_products_by_category_with_cursor(
+    category_id: int,
+    sort: CatalogSortEnum = Query(CatalogSortEnum.newest, description="Sort order of the products"),
+    limit: int = Query(10, description="Number of products to return", ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="`next_cursor` of the previous page"),
+    attributes: Dict[str, List[str]] = Depends(get_attribute_filters),
+    uow: UnitOfWork = Depends(get_read_uow)
+):
+    tree = await CategoryService.get_tree(uow=uow)
+    filters = [category_filter(tree.subtree_ids(category_id)), *attribute_filters(attributes)]
+    try:
+        products, next_cursor = await ProductCardService.get_catalog_page(
+            uow=uow, sort=sort.value, limit=limit, cursor=cursor, filters=filters
+        )
+    except InvalidCursorError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail='Invalid cursor')
+    return ProductPageSchema(items=products, next_cursor=next_cursor)
+
+
+@catalog_router.get('/facets', status_code=status.HTTP_200_OK, response_model=List[FacetSchema])
+@response_cache(tags=facets_tags)
+async def get_facets(
+    category_id: Optional[int] = Query(None, description="Count only the products of this category and its subcategories"),
+    attributes: Dict[str, List[str]] = Depends(get_attribute_filters),
+    uow: UnitOfWork = Depends(get_read_uow)
+):
+    """
+    Returns the attribute facets of the products matching the same filters as `GET /catalogs`:
+    every attribute name with its values and the number of matching products per value.
+    """
+    filters = attribute_filters(attributes)
+    if category_id is not None:
+        tree = await CategoryService.get_tree(uow=uow)
+        filters.append(category_filter(tree.subtree_ids(category_id)))
+    return await ProductCardService.get_facets(uow=uow, filters=filters)
+
+
+@catalog_router.get('/search', status_code=status.HTTP_200_OK, response_model=ProductPageSchema)
+@response_cache(tags=listing_tags)
+async def search_products(
+    q: str = Query(..., description="Search text, supports quoted phrases, `or` and `-excluded` words", min_length=1, max_length=256),
+    limit: int = Query(10, description="Number of products to return", ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="`next_cursor` of the previous page"),
+    uow: UnitOfWork = Depends(get_read_uow)
+):
+    """
+    Full-text search by product name and description, best matches first.
+
+    Matches in the name rank higher than matches in the description.
+    Pass `next_cursor` from the response to get the next page, it is `null` on the last page.
+
+    :raises HTTPException: Status `400` if the cursor is invalid.
+    """
+    try:
+        products, next_cursor = await ProductCardService.search_page(uow=uow, text=q, limit=limit, cursor=cursor)
+    except InvalidCursorError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail='Invalid cursor')
+    return ProductPageSchema(items=products, next_cursor=next_cursor)
 
 
 @catalog_router.get('/{product_id}', response_model=ProductSchemaResponse)
-@cache(expire=30)
+@response_cache(tags=product_tags)
 async def get_product_info(
     product_id: int,
-    uow: UnitOfWork = Depends(UnitOfWork)
+    uow: UnitOfWork = Depends(get_read_uow)
 ):
-    product = await ProductService.get_by_query_one_or_none(uow=uow, id=product_id)
+    product = await ProductCardService.get_by_query_one_or_none(uow=uow, id=product_id, mappings=True)
     if not product:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
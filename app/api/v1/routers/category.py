@@ -3,20 +3,23 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from app.models.user import UserModel
 from app.schemas.category import CategorySchemaCreate, CategorySchemaInDB, CategoryResponse, CategorySchemaUpdate
 from app.services.category import CategoryService
-from app.utils.unit_of_work import UnitOfWork
+from app.utils.unit_of_work import UnitOfWork, get_read_uow, get_uow
 from app.services.security import get_current_admin_user
 
 category_router = APIRouter(prefix='/api/v1/categorys', tags=['Category\'s Admin'])
 
 @category_router.post('', status_code=status.HTTP_201_CREATED, response_model=CategorySchemaInDB)
-async def create_category(new_category_data: CategorySchemaCreate, admin_user: Annotated[UserModel, Depends(get_current_admin_user)], uow: UnitOfWork = Depends(UnitOfWork)):
+async def create_category(new_category_data: CategorySchemaCreate, admin_user: Annotated[UserModel, Depends(get_current_admin_user)], uow: UnitOfWork = Depends(get_uow)):
     exists_category = await CategoryService.get_by_query_one_or_none(uow=uow, name = new_category_data.name)
     if exists_category:
         raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f'Category with name {new_category_data.name} already exists')
     new_category = await CategoryService.add_one_and_get_obj(uow=uow, **new_category_data.model_dump(exclude_unset=True))
+    await uow.commit()
+    CategoryService.invalidate_tree()
     return new_category
 
 
 @category_router.get('', response_model=List[CategoryResponse], status_code=status.HTTP_200_OK)
-async def get_main_categories(uow: UnitOfWork = Depends(UnitOfWork)):
-    return await CategoryService.get_by_query_all(uow=uow, parent_id=None)
+async def get_main_categories(uow: UnitOfWork = Depends(get_read_uow)):
+    tree = await CategoryService.get_tree(uow=uow)
+    return tree.roots()
@@ -0,0 +1,28 @@
+from typing import Annotated
+from fastapi import APIRouter, Depends, status
+from app.database.db import async_engine
+from app.database.replicas import replica_router
+from app.models.user import UserModel
+from app.services.security import get_current_admin_user, password_hasher
+from app.utils.response_cache import response_cache
+
+metrics_router = APIRouter(prefix='/api/v1/metrics', tags=['Metrics'])
+
+
+@metrics_router.get('', status_code=status.HTTP_200_OK)
+async def get_metrics(admin_user: Annotated[UserModel, Depends(get_current_admin_user)]):
+    """
+    Returns the runtime counters of this worker.
+
+    - password_hasher: bcrypt thread pool load, queued requests and time spent waiting for a thread
+    - response_cache: size of the in-process response cache, its hits, misses and evictions,
+      requests coalesced or waiting on another worker, stale and early refreshes
+    - database_pool: connections of the primary pool, checkouts, time spent waiting for a connection and holding it
+    - replicas: the read replicas, whether they passed their last health check and their pool
+    """
+    return {
+        "password_hasher": password_hasher.metrics(),
+        "response_cache": response_cache.metrics(),
+        "database_pool": async_engine.pool.metrics(),
+        "replicas": replica_router.metrics(),
+    }
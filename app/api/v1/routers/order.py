@@ -4,19 +4,17 @@ from typing import Annotated, List
 from fastapi import APIRouter, BackgroundTasks, HTTPException, Query, WebSocketException, status, Depends, WebSocket, WebSocketDisconnect
 import websockets
 from app.services.security import get_current_admin_user, get_current_user, verify_ws_token
-from app.services.order import OrderService
-from app.services.order_item import OrderItemService
+from app.services.order import OrderService, OutOfStockError
+from app.services.cart import cart_backend
+from app.services.notification import notification_hub
 from app.schemas.order import OrderSchemaCreate, OrderSchemaResponse, OrderSchemaUpdate
-from app.services.cart import CartService
-from app.utils.unit_of_work import UnitOfWork
+from app.repositories.order import order_response_options
+from app.utils.unit_of_work import UnitOfWork, get_uow
 from app.models.user import UserModel
-from app.services.inventory import InventoryService
-from app.models.models import OrderStatus
+from app.services.product_card import ProductCardService
 from app.services.mail import mail_app
 order_router = APIRouter(prefix='/api/v1/orders', tags = ['Orders'])
 
-admins: List[WebSocket] = []
-
 
 
 @order_router.post('', status_code=status.HTTP_201_CREATED)
@@ -24,21 +22,22 @@ async def create_order(
     delivery_details: OrderSchemaCreate,
     user: Annotated[UserModel, Depends(get_current_user)],
     background_tasks: BackgroundTasks,
-    uow: UnitOfWork = Depends(UnitOfWork)
+    uow: UnitOfWork = Depends(get_uow)
 ):
-    cart_info = await CartService.get_by_query_all(uow=uow, user_id=user.id)
-    if not cart_info:
+    await cart_backend.prepare_checkout(uow=uow, user_id=user.id)
+    try:
+        placed = await OrderService.place_order(
+            uow=uow, user_id=user.id, **delivery_details.model_dump(exclude_unset=True)
+        )
+    except OutOfStockError as e:
+        product_id, quantity = next(iter(e.missing.items()))
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f'Товара с Айди {product_id} в количестве {quantity} нет на складе')
+    if placed is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
+    new_order_id, product_ids = placed
 
-    for inventory in cart_info:
-        if inventory.product.inventory.quantity - inventory.quantity < 0:
-            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f'Товара с Айди {inventory.product.id} в количестве {inventory.quantity} нет на складе')
-
-    new_order_id = await OrderService.add_one_and_get_id(
-        uow=uow, status=OrderStatus.pending, user_id=user.id, total_amount=0, **delivery_details.model_dump(exclude_unset=True)
-    )
-
-    mail_app.send_order_confirmation_email(
+    await mail_app.queue_order_confirmation_email(
+        uow=uow,
         email=user.email,
         user_name=user.first_name,
         order_id=str(new_order_id),
@@ -49,8 +48,15 @@ async def create_order(
         user_email=user.email
 
     )
+    # the cart is cleared in Redis under the lock taken by prepare_checkout, which the commit releases
+    await cart_backend.checked_out(uow=uow, user_id=user.id, product_ids=product_ids)
+    try:
+        await uow.commit()
+    except Exception:
+        await cart_backend.checkout_failed(user_id=user.id)
+        raise
 
-    background_tasks.add_task(fill_order_task, new_order_id, cart_info, user.id, delivery_details, uow)
+    background_tasks.add_task(order_placed_task, new_order_id, product_ids)
 
     return {"order_id": new_order_id}
 
@@ -58,11 +64,12 @@ async def create_order(
 async def get_order_info(
     order_id: int,
     user: Annotated[UserModel, Depends(get_current_user)],
-    uow: UnitOfWork = Depends(UnitOfWork)
+    uow: UnitOfWork = Depends(get_uow)
 ):
     order_info = await OrderService.get_by_query_one_or_none(
         uow=uow,
-        id=order_id
+        id=order_id,
+        options=order_response_options
     )
     
     if order_info is None:
@@ -78,7 +85,7 @@ async def update_order(
     order_id: int,
     new_order_data: OrderSchemaUpdate,
     admin_user: Annotated[UserModel, Depends(get_current_admin_user)],
-    uow: UnitOfWork = Depends(UnitOfWork)
+    uow: UnitOfWork = Depends(get_uow)
 ):
     order_info = await OrderService.get_by_query_one_or_none(
         uow=uow,
@@ -101,44 +108,28 @@ async def update_order(
 @order_router.websocket('/ws')
 async def websocket_orders(
     websocket: WebSocket,
+    # not request-scoped: the socket stays open for hours and must not keep a transaction open
     uow: UnitOfWork = Depends(UnitOfWork)
 ): 
     token = websocket.headers.get('Authorization')
     user = await verify_ws_token(token, uow=uow)
+    if user.role != 'admin':
+        raise WebSocketException(code=status.WS_1008_POLICY_VIOLATION)
     await websocket.accept()
-    admins.append(websocket)
+    connection = notification_hub.connect(websocket)
     try:
         while True:
-            data = await websocket.receive_text()
-            print(f"Received data: {data}")
-    except WebSocketDisconnect:
-        admins.remove(websocket)
-
-
-
-
-async def fill_order_task(order_id: int, cart_info, user_id: int, delivery_details, uow: UnitOfWork):
-    total_amount_sum = 0
-    async with uow:
-        for cart_item in cart_info:
-            await OrderItemService.add_one(
-                uow=uow,
-                order_id=order_id,
-                product_id=cart_item.product_id,
-                quantity=cart_item.quantity,
-                price=cart_item.product.price
-            )
-            total_amount_sum += cart_item.quantity * cart_item.product.price
-            await InventoryService.update_one_by_id(
-                uow=uow,
-                _id=cart_item.product.inventory.id,
-                quantity=cart_item.product.inventory.quantity - cart_item.quantity
-            )
-        await CartService.delete_by_query(uow=uow, user_id=user_id)
-        await OrderService.update_one_by_id(uow=uow, _id=order_id, total_amount=total_amount_sum)
-        
-        for admin in admins:
-            try:
-                await admin.send_text(f'New Order with id {order_id}')
-            except WebSocketDisconnect:
-                admins.remove(admin)
\ No newline at end of file
+            # the dashboard only listens, receiving is how a disconnect is noticed
+            await websocket.receive_text()
+    except (WebSocketDisconnect, RuntimeError):
+        # RuntimeError: the hub already closed a slow socket, receiving from a closed socket raises it
+        pass
+    finally:
+        notification_hub.disconnect(connection)
+
+
+
+
+async def order_placed_task(order_id: int, product_ids: List[int]):
+    await ProductCardService.refresh(uow=UnitOfWork(), product_ids=product_ids)
+    await notification_hub.publish(f'New Order with id {order_id}')
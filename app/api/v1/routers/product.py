@@ -1,5 +1,5 @@
 from fastapi import APIRouter, Depends, HTTPException, status, File, UploadFile
-from typing import Annotated, List
+from typing import Annotated, Dict, List
 from app.models.user import UserModel
 from app.schemas.order import OrderSchemaResponse
 from app.schemas.product import ImageSchemaInDB, ProductSchemaCreate, ProductSchemaInDB, ProductSchemaUpdate
@@ -8,22 +8,43 @@ from app.services.attribute import AttributeService
 from app.schemas.attribute import AttributeSchemaCreate, AttributeSchemaUpdate, AttributeSchemaInDB
 from app.services.order import OrderService
 from app.services.product import ProductService
+from app.services.product_card import ProductCardService, product_tag
+from app.repositories.order import order_response_options
+from app.repositories.product import product_in_db_options
 from app.services.inventory import InventoryService
-from app.services.image import ImageService
-from app.services.security import upload_to_cloud
+from app.services.image import ImageService, ImageTooLargeError, InvalidImageError
 from app.services.security import get_current_admin_user
-from app.utils.unit_of_work import UnitOfWork
-from fastapi_cache.decorator import cache
+from app.utils.unit_of_work import UnitOfWork, get_uow
+from app.utils.response_cache import response_cache
 
 
 product_router = APIRouter(prefix='/api/v1/products', tags=['Admin Dashboard'])
 
+
+async def upload_images(uow: UnitOfWork, images: List[UploadFile]) -> List[Dict[str, str]]:
+    """Validates and uploads the images before the request writes anything, see `ImageService.upload_images`"""
+    if not images:
+        return []
+    for image in images:
+        if image.content_type not in ["image/jpeg", "image/png"]:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Invalid file type: {image.content_type}. Only JPEG, PNG are accepted."
+            )
+    try:
+        return await ImageService.upload_images(uow=uow, images=images)
+    except ImageTooLargeError as e:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=f"Image too large: {e}")
+    except InvalidImageError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid image: {e}")
+
+
 @product_router.post('', status_code=status.HTTP_201_CREATED, response_model=ProductSchemaInDB)
 async def add_product(
     admin_user: Annotated[UserModel, Depends(get_current_admin_user)],
     new_product_data: ProductSchemaCreate = Depends(),
     images: List[UploadFile] = File(...),
-    uow: UnitOfWork = Depends(UnitOfWork)
+    uow: UnitOfWork = Depends(get_uow)
 ):
     
     """
@@ -54,6 +75,7 @@ async def add_product(
     category = await CategoryService.get_by_query_one_or_none(uow=uow, id=new_product_data.category_id)
     if not category:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f'Category with id {new_product_data.category_id} not found')
+    uploaded = await upload_images(uow=uow, images=images)
     product = await ProductService.add_one_and_get_obj(
         uow=uow,
         name=new_product_data.name,
@@ -62,21 +84,15 @@ async def add_product(
         price=new_product_data.price,
     )
 
-    if images:
-        for image in images:
-            if image.content_type not in ["image/jpeg", "image/png"]:
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail=f"Invalid file type: {image.content_type}. Only JPEG, PNG are accepted."
-                )
-            image_content = await image.read()
-            image_url = await upload_to_cloud(image_content)
-            await ImageService.add_one(uow=uow, product_id=product.id, url=image_url)
+    await ImageService.add_images(uow=uow, product_id=product.id, uploaded=uploaded)
 
     if new_product_data.inventory is not None:
         await InventoryService.add_one_and_get_obj(uow=uow, product_id=product.id, quantity=new_product_data.inventory)
 
-    product_info = await ProductService.get_by_query_one_or_none(uow=uow, id=product.id)
+    category_ids = await ProductCardService.refresh(uow=uow, product_ids=[product.id])
+    await ProductCardService.invalidate_listings(uow=uow, category_ids=category_ids)
+
+    product_info = await ProductService.get_by_query_one_or_none(uow=uow, id=product.id, options=product_in_db_options)
 
     return product_info
 
@@ -86,7 +102,7 @@ async def update_product(
     admin_user: Annotated[UserModel, Depends(get_current_admin_user)],
     updated_product_data: ProductSchemaUpdate = Depends(),
     images: List[UploadFile] = File(...),
-    uow: UnitOfWork = Depends(UnitOfWork)
+    uow: UnitOfWork = Depends(get_uow)
 ):
     """
     Updates an existing product in the database.
@@ -129,36 +145,39 @@ async def update_product(
         if not category:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f'Category with id {updated_product_data.category_id} not found')
 
+    uploaded = await upload_images(uow=uow, images=images)
+    # the update below returns into the same session, so keep the category the product is leaving
+    old_category_id = product.category_id
     updated_fields = updated_product_data.model_dump(exclude_unset=True)
     del updated_fields['inventory']
     if updated_fields:
         await ProductService.update_one_by_id(uow=uow, _id=product.id, **updated_fields)
-    if images:
-        for image in images:
-            if image.content_type not in ["image/jpeg", "image/png"]:
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail=f"Invalid file type: {image.content_type}. Only JPEG, PNG are accepted."
-                )
-            image_content = await image.read()
-            image_url = await upload_to_cloud(image_content)
-            await ImageService.add_one(uow=uow, product_id=product.id, url=image_url)
+    await ImageService.add_images(uow=uow, product_id=product.id, uploaded=uploaded)
     
     if updated_product_data.inventory is not None:
-        product_inventory = await InventoryService.get_by_query_one_or_none(uow=uow, product_id=product_id)
-        await InventoryService.update_one_by_id(uow=uow, _id=product_inventory.id, quantity=updated_product_data.inventory)
-    updated_product_info = await ProductService.get_by_query_one_or_none(uow=uow, id=product.id)
+        await InventoryService.upsert_many(
+            uow=uow,
+            values=[{'product_id': product_id, 'quantity': updated_product_data.inventory}],
+            index_elements=['product_id'],
+            set_=['quantity']
+        )
+
+    category_ids = await ProductCardService.refresh(uow=uow, product_ids=[product.id])
+    if updated_fields:
+        # the product may have moved to another category, position in a sort order or search result
+        await ProductCardService.invalidate_listings(uow=uow, category_ids=[old_category_id, *category_ids])
+    updated_product_info = await ProductService.get_by_query_one_or_none(uow=uow, id=product.id, options=product_in_db_options)
 
     return updated_product_info
 
 @product_router.get('/{product_id}', response_model=ProductSchemaInDB)
-@cache(expire=30)
+@response_cache(tags=lambda result, kwargs: [product_tag(kwargs['product_id'])])
 async def get_product(
     product_id: int,
     user: Annotated[UserModel, Depends(get_current_admin_user)],
-    uow: UnitOfWork = Depends(UnitOfWork)
+    uow: UnitOfWork = Depends(get_uow)
 ):
-    product = await ProductService.get_by_query_one_or_none(uow=uow, id=product_id)
+    product = await ProductService.get_by_query_one_or_none(uow=uow, id=product_id, options=product_in_db_options)
     if not product:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -170,7 +189,7 @@ async def get_product(
 async def get_product_images(
     product_id: int,
     admin_user: Annotated[UserModel, Depends(get_current_admin_user)],
-    uow: UnitOfWork = Depends(UnitOfWork)
+    uow: UnitOfWork = Depends(get_uow)
 ):
     images = await ImageService.get_by_query_all(uow=uow, product_id=product_id)
     if not images:
@@ -181,58 +200,68 @@ async def get_product_images(
 async def add_attribute(
     new_attribute_data: AttributeSchemaCreate,
     admin_user: Annotated[UserModel, Depends(get_current_admin_user)],
-    uow: UnitOfWork = Depends(UnitOfWork)
+    uow: UnitOfWork = Depends(get_uow)
 ):
-    return await AttributeService.add_one_and_get_obj(uow=uow, **new_attribute_data.model_dump(exclude_unset=True))
+    attribute = await AttributeService.add_one_and_get_obj(uow=uow, **new_attribute_data.model_dump(exclude_unset=True))
+    category_ids = await ProductCardService.refresh(uow=uow, product_ids=[attribute.product_id])
+    await ProductCardService.invalidate_listings(uow=uow, category_ids=category_ids)
+    return attribute
 
 @product_router.patch('/attributes/{id}', status_code=status.HTTP_200_OK, response_model=AttributeSchemaInDB)
 async def update_attribute(
     id: int,
     new_attribute_data: AttributeSchemaUpdate,
     admin_user: Annotated[UserModel, Depends(get_current_admin_user)],
-    uow: UnitOfWork = Depends(UnitOfWork)
+    uow: UnitOfWork = Depends(get_uow)
 ):
    exists_attribute = await AttributeService.get_by_query_one_or_none(uow=uow, id=id)
    if not exists_attribute:
        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
-   return await AttributeService.update_one_by_id(
+   attribute = await AttributeService.update_one_by_id(
        uow=uow,
        _id=id,
        **new_attribute_data.model_dump(exclude_unset=True)
    )
+   category_ids = await ProductCardService.refresh(uow=uow, product_ids=[exists_attribute.product_id])
+   await ProductCardService.invalidate_listings(uow=uow, category_ids=category_ids)
+   return attribute
 
 @product_router.delete('/attributes/{id}', status_code=status.HTTP_204_NO_CONTENT)
 async def delete_attribute(
     id: int,
     admin_user: Annotated[UserModel, Depends(get_current_admin_user)],
-    uow: UnitOfWork = Depends(UnitOfWork)
+    uow: UnitOfWork = Depends(get_uow)
 ):
     exists_attribute = await AttributeService.get_by_query_one_or_none(uow=uow, id=id)
     if not exists_attribute:
        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
     await AttributeService.delete_by_query(uow=uow, id=id)
+    category_ids = await ProductCardService.refresh(uow=uow, product_ids=[exists_attribute.product_id])
+    await ProductCardService.invalidate_listings(uow=uow, category_ids=category_ids)
        
 
 @product_router.delete('/image/{image_id}', status_code=status.HTTP_200_OK)
 async def delete_product_image(
     image_id: int,
     admin_user: Annotated[UserModel, Depends(get_current_admin_user)],
-    uow: UnitOfWork = Depends(UnitOfWork)
+    uow: UnitOfWork = Depends(get_uow)
 ):
     exists_image = await ImageService.get_by_query_one_or_none(uow=uow, id=image_id)
     if not exists_image:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
     await ImageService.delete_by_query(uow=uow, id=image_id)
+    await ProductCardService.refresh(uow=uow, product_ids=[exists_image.product_id])
 
 @product_router.get('/orders/{order_id}', status_code=status.HTTP_200_OK, response_model=OrderSchemaResponse)
 async def get_admin_order_info(
     order_id: int,
     admin_user: Annotated[UserModel, Depends(get_current_admin_user)],
-    uow: UnitOfWork = Depends(UnitOfWork)
+    uow: UnitOfWork = Depends(get_uow)
 ):
     order_info = await OrderService.get_by_query_one_or_none(
         uow=uow,
-        id=order_id
+        id=order_id,
+        options=order_response_options
     )
     
     if order_info is None:
@@ -3,7 +3,7 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from app.models.user import UserModel
 from app.schemas.user import UserSchemaCreate, UserSchemaResponse
 from app.services.user import UserService
-from app.utils.unit_of_work import UnitOfWork
+from app.utils.unit_of_work import UnitOfWork, get_uow
 from fastapi.security import OAuth2PasswordRequestForm
 from app.services.security import create_access_token, authenticate_user, get_current_user, get_password_hash
 from app.services.mail import mail_app
@@ -11,7 +11,7 @@ user_router = APIRouter(prefix='/api/v1/users', tags=['Reg&Login&Me'])
 
 
 @user_router.post('/register', status_code=status.HTTP_201_CREATED, response_model = UserSchemaResponse)
-async def register_user(user_data: UserSchemaCreate, uow: UnitOfWork = Depends(UnitOfWork)):
+async def register_user(user_data: UserSchemaCreate, uow: UnitOfWork = Depends(get_uow)):
 
     """
     Registers a new user.
@@ -36,15 +36,17 @@ async def register_user(user_data: UserSchemaCreate, uow: UnitOfWork = Depends(U
     user: UserModel | None = await UserService.get_by_query_one_or_none(uow=uow, email=user_data.email)
     if user:
         raise HTTPException(status_code=status.HTTP_409_CONFLICT)
-    user_data.password = get_password_hash(user_data.password)
+    # release the connection while bcrypt runs, the insert below starts a new transaction
+    await uow.commit()
+    user_data.password = await get_password_hash(user_data.password)
 
     user_data = user_data.model_dump(exclude_unset=True)
     new_user : UserModel = await UserService.add_one_and_get_obj(uow=uow, **user_data)
-    mail_app.send_registration_email(email=new_user.email, name=new_user.email)
+    await mail_app.queue_registration_email(uow=uow, email=new_user.email, name=new_user.email)
     return new_user
 
 @user_router.post('/login', status_code=status.HTTP_200_OK)
-async def login(form_data: Annotated[OAuth2PasswordRequestForm, Depends()], uow: UnitOfWork = Depends(UnitOfWork)):
+async def login(form_data: Annotated[OAuth2PasswordRequestForm, Depends()], uow: UnitOfWork = Depends(get_uow)):
     
     """
     Authenticates a user and provides an access token.
@@ -1,22 +1,93 @@
-from typing import AsyncGenerator
+import time
+from typing import Any, AsyncGenerator, Dict
 from uuid import uuid4
+from sqlalchemy import exc
 from sqlalchemy.orm import DeclarativeBase
+from sqlalchemy.pool import AsyncAdaptedQueuePool, ConnectionPoolEntry
 
 
-from sqlalchemy.ext.asyncio import AsyncSession, AsyncConnection, create_async_engine, async_sessionmaker
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, AsyncConnection, create_async_engine, async_sessionmaker
 
 from config import settings
 
-async_engine = create_async_engine(
-    url=settings.DB_URL,
-    echo=False,
-    future=True,
-    pool_size=50,
-    max_overflow=100,
-    connect_args={
-        'prepared_statement_name_func': lambda:  f'__asyncpg_{uuid4()}__',
-    }
-)
+
+class MeteredPool(AsyncAdaptedQueuePool):
+    """The default async pool, also recording how long checkouts wait and how long connections are held"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.held_seconds = 0.0
+        self.max_held_seconds = 0.0
+
+    def _do_get(self) -> ConnectionPoolEntry:
+        started = time.perf_counter()
+        try:
+            record = super()._do_get()
+        except exc.TimeoutError:
+            self.timeouts += 1
+            raise
+        now = time.perf_counter()
+        self.checkouts += 1
+        self.wait_seconds += now - started
+        self.max_wait_seconds = max(self.max_wait_seconds, now - started)
+        record.info['checked_out_at'] = now
+        return record
+
+    def _do_return_conn(self, record: ConnectionPoolEntry) -> None:
+        checked_out_at = record.info.pop('checked_out_at', None)
+        if checked_out_at is not None:
+            held = time.perf_counter() - checked_out_at
+            self.held_seconds += held
+            self.max_held_seconds = max(self.max_held_seconds, held)
+        super()._do_return_conn(record)
+
+    def metrics(self) -> Dict[str, Any]:
+        checkouts = self.checkouts or 1
+        return {
+            "size": self.size(),
+            "checked_out": self.checkedout(),
+            "overflow": self.overflow(),
+            "checkouts": self.checkouts,
+            "timeouts": self.timeouts,
+            "avg_wait_ms": round(self.wait_seconds / checkouts * 1000, 3),
+            "max_wait_ms": round(self.max_wait_seconds * 1000, 3),
+            "avg_held_ms": round(self.held_seconds / checkouts * 1000, 3),
+            "max_held_ms": round(self.max_held_seconds * 1000, 3),
+        }
+
+
+def statement_cache_args() -> Dict[str, Any]:
+    if settings.DB_STATEMENT_CACHE_MODE == 'pgbouncer':
+        # consecutive transactions may run on different server connections, a prepared statement is never reused
+        return {
+            'prepared_statement_cache_size': 0,
+            'statement_cache_size': 0,
+            'prepared_statement_name_func': lambda:  f'__asyncpg_{uuid4()}__',
+        }
+    return {'prepared_statement_cache_size': settings.DB_STATEMENT_CACHE_SIZE}
+
+
+def build_engine(url: str) -> AsyncEngine:
+    return create_async_engine(
+        url=url,
+        echo=False,
+        future=True,
+        poolclass=MeteredPool,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+        connect_args=statement_cache_args()
+    )
+
+
+async_engine = build_engine(settings.DB_URL)
+replica_engines = [build_engine(url) for url in settings.DB_REPLICA_URLS]
 
 async_session_maker = async_sessionmaker(
     bind=async_engine,
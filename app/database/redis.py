@@ -0,0 +1,6 @@
+from redis import asyncio as aioredis
+
+from config import settings
+
+# connections are opened lazily from a pool, so the client can be created at import time
+redis_client = aioredis.from_url(settings.REDIS_URL)
@@ -0,0 +1,125 @@
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional, Sequence, Set
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker
+
+from app.database.db import async_session_maker, replica_engines
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class ReplicaRouter:
+    """
+    Hands out sessions on the read replicas, round-robin over the healthy ones.
+
+    A health-check task measures the replication lag of every replica each `interval` seconds, a replica
+    that fails, does not answer within `timeout` or replays more than `max_lag` seconds behind the primary
+    is skipped until it catches up. Without any healthy replica, or without replicas at all,
+    the sessions are bound to the primary.
+    """
+
+    # a replica that replayed everything it received is not lagging, however old its last replayed transaction is
+    lag_query = text(
+        'SELECT CASE WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 '
+        'ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END'
+    )
+
+    def __init__(
+            self,
+            session_maker: async_sessionmaker,
+            engines: Sequence[AsyncEngine],
+            interval: float,
+            timeout: float,
+            max_lag: float
+    ):
+        self.session_maker = session_maker
+        self.engines = list(engines)
+        self.interval = interval
+        self.timeout = timeout
+        self.max_lag = max_lag
+        self.healthy: Set[AsyncEngine] = set(self.engines)
+        self.lag: Dict[AsyncEngine, Optional[float]] = {}
+        self._next = 0
+        self._checker: Optional[asyncio.Task] = None
+
+    @property
+    def max_staleness(self) -> float:
+        """
+        How far behind the primary a replica session may read: a replica is skipped once a check finds it more
+        than `max_lag` behind, and checks are up to `interval` plus `timeout` seconds apart. 0 without replicas.
+        """
+        return self.max_lag + self.interval + self.timeout if self.engines else 0.0
+
+    def session(self) -> AsyncSession:
+        healthy = [engine for engine in self.engines if engine in self.healthy]
+        if not healthy:
+            return self.session_maker()
+        self._next = (self._next + 1) % len(healthy)
+        return self.session_maker(bind=healthy[self._next])
+
+    def start(self) -> None:
+        if self.engines:
+            self._checker = asyncio.create_task(self._check_loop())
+
+    async def stop(self) -> None:
+        if self._checker is None:
+            return
+        self._checker.cancel()
+        try:
+            await self._checker
+        except asyncio.CancelledError:
+            pass
+        self._checker = None
+
+    def metrics(self) -> List[Dict[str, Any]]:
+        return [
+            {
+                "url": engine.url.render_as_string(hide_password=True),
+                "healthy": engine in self.healthy,
+                "lag_seconds": self.lag.get(engine),
+                "pool": engine.pool.metrics(),
+            }
+            for engine in self.engines
+        ]
+
+    async def check(self, engine: AsyncEngine) -> bool:
+        try:
+            lag = await asyncio.wait_for(self._replication_lag(engine), self.timeout)
+        except Exception:
+            lag = None
+        self.lag[engine] = lag
+        return lag is not None and lag <= self.max_lag
+
+    async def _replication_lag(self, engine: AsyncEngine) -> Optional[float]:
+        async with engine.connect() as connection:
+            lag = (await connection.execute(self.lag_query)).scalar()
+        return None if lag is None else float(lag)
+
+    async def check_all(self) -> None:
+        results = await asyncio.gather(*(self.check(engine) for engine in self.engines))
+        for engine, healthy in zip(self.engines, results):
+            if healthy and engine not in self.healthy:
+                logger.info('replica %s is back', engine.url.render_as_string(hide_password=True))
+                self.healthy.add(engine)
+            elif not healthy and engine in self.healthy:
+                logger.warning(
+                    'replica %s failed its health check, lag %s', engine.url.render_as_string(hide_password=True), self.lag.get(engine)
+                )
+                self.healthy.discard(engine)
+
+    async def _check_loop(self) -> None:
+        while True:
+            await self.check_all()
+            await asyncio.sleep(self.interval)
+
+
+replica_router = ReplicaRouter(
+    session_maker=async_session_maker,
+    engines=replica_engines,
+    interval=settings.DB_REPLICA_CHECK_INTERVAL,
+    timeout=settings.DB_REPLICA_CHECK_TIMEOUT,
+    max_lag=settings.DB_REPLICA_MAX_LAG
+)
@@ -1,27 +1,50 @@
 from typing import Annotated, List
 from fastapi import Depends, FastAPI, WebSocket, WebSocketDisconnect
+from fastapi.responses import ORJSONResponse
 from app.api.v1.routers.category import category_router
 from app.api.v1.routers.user import user_router
 from app.api.v1.routers.product import product_router
 from app.api.v1.routers.catalog import catalog_router
 from app.api.v1.routers.cart import cart_router
 from app.api.v1.routers.order import order_router
+from app.api.v1.routers.metrics import metrics_router
 from collections.abc import AsyncIterator
 from contextlib import asynccontextmanager
-from fastapi_cache import FastAPICache
-from fastapi_cache.backends.redis import RedisBackend
 from fastapi.middleware.cors import CORSMiddleware
 
-from redis import asyncio as aioredis
+from app.database.replicas import replica_router
+from app.services.mail import mail_worker
+from app.services.cart import RedisCartService
+from app.services.notification import notification_hub
+from app.services.user import UserService
+from app.services.upload import image_processor, image_uploader
+from app.utils.response_cache import response_cache
+from config import settings
 
 
 @asynccontextmanager
 async def lifespan(_: FastAPI) -> AsyncIterator[None]:
-    redis = aioredis.from_url("redis://localhost")
-    FastAPICache.init(RedisBackend(redis), prefix="fastapi-cache")
+    replica_router.start()
+    if settings.MAIL_WORKER_ENABLED:
+        mail_worker.start()
+    if settings.CART_BACKEND == 'redis':
+        RedisCartService.start_flusher()
+    notification_hub.start()
+    response_cache.start()
+    UserService.start_principal_listener()
+    image_uploader.start()
+    image_processor.start()
     yield
+    image_processor.stop()
+    await image_uploader.stop()
+    await UserService.stop_principal_listener()
+    await response_cache.stop()
+    await notification_hub.stop()
+    await RedisCartService.stop_flusher()
+    await mail_worker.stop()
+    await replica_router.stop()
 
-app = FastAPI(lifespan=lifespan)
+app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
 
 app.add_middleware(
     CORSMiddleware,
@@ -38,4 +61,5 @@ app.include_router(product_router)
 app.include_router(catalog_router)
 app.include_router(cart_router)
 app.include_router(order_router)
+app.include_router(metrics_router)
 
@@ -1,6 +1,8 @@
-from sqlalchemy import Enum, Integer, String, Column, ForeignKey, DateTime
+from sqlalchemy import Enum, FetchedValue, Index, Integer, String, Column, ForeignKey, DateTime, UniqueConstraint, func
+from sqlalchemy.dialects.postgresql import JSONB, TSVECTOR
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from datetime import datetime, timezone
+from typing import Optional
 from app.database.db import Base
 from enum import Enum as PyEnum
 
@@ -24,25 +26,41 @@ class ProductModel(Base):
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
     name: Mapped[str] = mapped_column(String, nullable=False)
-    category_id: Mapped[int] = mapped_column(Integer, ForeignKey('category.id'))
+    category_id: Mapped[int] = mapped_column(Integer, ForeignKey('category.id'), index=True)
     description: Mapped[str] = mapped_column(String, nullable=False)
     price: Mapped[int] = mapped_column(Integer, nullable=False, index=True)
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=datetime.now(timezone.utc))
     updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=datetime.now(timezone.utc), onupdate=datetime.now(timezone.utc))
-
-    images = relationship("ImageModel", back_populates="product", lazy='subquery')
-    inventory = relationship("InventoryModel", uselist=False, back_populates="product", lazy='subquery')
-    attributes = relationship("AttributeModel", back_populates="product", lazy='subquery')
-    category = relationship("CategoryModel", back_populates="products", lazy='subquery')
-    cart_items = relationship("CartModel", back_populates="product", lazy='select')
-    order_items = relationship("OrderItemModel", back_populates="product", lazy='joined')
+    # filled from name and description by the product_search_vector trigger
+    search_vector: Mapped[Optional[str]] = mapped_column(
+        TSVECTOR,
+        nullable=True,
+        server_default=FetchedValue(),
+        server_onupdate=FetchedValue(),
+        deferred=True,
+    )
+
+    # nothing is loaded implicitly, every query passes the loader options its response needs
+    images = relationship("ImageModel", back_populates="product", lazy='raise')
+    inventory = relationship("InventoryModel", uselist=False, back_populates="product", lazy='raise')
+    attributes = relationship("AttributeModel", back_populates="product", lazy='raise')
+    category = relationship("CategoryModel", back_populates="products", lazy='raise')
+    cart_items = relationship("CartModel", back_populates="product", lazy='raise')
+    order_items = relationship("OrderItemModel", back_populates="product", lazy='raise')
+
+    __table_args__ = (
+        Index('ix_product_search_vector', 'search_vector', postgresql_using='gin'),
+    )
 # Image Model
 class ImageModel(Base):
     __tablename__ = 'image'
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
-    product_id: Mapped[int] = mapped_column(Integer, ForeignKey('product.id'), nullable=False)
+    product_id: Mapped[int] = mapped_column(Integer, ForeignKey('product.id'), nullable=False, index=True)
     url: Mapped[str] = mapped_column(String, nullable=False)
+    content_hash: Mapped[str] = mapped_column(String(64), nullable=True, index=True)
+    thumbnail_url: Mapped[str] = mapped_column(String, nullable=True)
+    medium_url: Mapped[str] = mapped_column(String, nullable=True)
     
     product = relationship("ProductModel", back_populates="images")
 
@@ -67,6 +85,35 @@ class AttributeModel(Base):
 
     product = relationship("ProductModel", back_populates="attributes")
 
+    __table_args__ = (
+        # attribute filters of the catalog and facet counts per product
+        Index('ix_attribute_name_value_product_id', 'name', 'value', 'product_id'),
+        Index('ix_attribute_product_id_name_value', 'product_id', 'name', 'value'),
+    )
+
+# Product Card Model: denormalized catalog read model, rebuilt by ProductCardRepository.refresh
+class ProductCardModel(Base):
+    __tablename__ = 'product_card'
+
+    id: Mapped[int] = mapped_column(Integer, ForeignKey('product.id', ondelete='CASCADE'), primary_key=True)
+    name: Mapped[str] = mapped_column(String, nullable=False)
+    category_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    description: Mapped[str] = mapped_column(String, nullable=False)
+    price: Mapped[int] = mapped_column(Integer, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+    inventory: Mapped[dict] = mapped_column(JSONB, nullable=True)
+    images: Mapped[list] = mapped_column(JSONB, nullable=False)
+    attributes: Mapped[list] = mapped_column(JSONB, nullable=False)
+
+    # keyset pagination indexes for the catalog sort orders (see ProductCardService.catalog_sorts)
+    __table_args__ = (
+        Index('ix_product_card_created_at_id', 'created_at', 'id'),
+        Index('ix_product_card_price_id', 'price', 'id'),
+        Index('ix_product_card_category_id_created_at_id', 'category_id', 'created_at', 'id'),
+        Index('ix_product_card_category_id_price_id', 'category_id', 'price', 'id'),
+    )
+
 class CartModel(Base):
     __tablename__ = 'cart'
     
@@ -77,8 +124,13 @@ class CartModel(Base):
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=datetime.now(timezone.utc))
     updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=datetime.now(timezone.utc), onupdate=datetime.now(timezone.utc))
 
-    product = relationship("ProductModel", back_populates="cart_items", lazy='joined')
+    product = relationship("ProductModel", back_populates="cart_items", lazy='raise')
     user = relationship("UserModel", back_populates="cart_items", lazy='select')
+
+    __table_args__ = (
+        # one line per product, also serves the lookups by user_id alone
+        UniqueConstraint('user_id', 'product_id', name='uq_cart_user_id_product_id'),
+    )
     
 
 class OrderStatus(PyEnum):
@@ -91,7 +143,7 @@ class OrderModel(Base):
     __tablename__ = 'order'
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
-    user_id: Mapped[int] = mapped_column(Integer, ForeignKey('user.id'), nullable=False)
+    user_id: Mapped[int] = mapped_column(Integer, ForeignKey('user.id'), nullable=False, index=True)
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=datetime.now(timezone.utc))
     updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=datetime.now(timezone.utc), onupdate=datetime.now(timezone.utc))
     status: Mapped[OrderStatus] = mapped_column(Enum(OrderStatus), nullable=False)
@@ -102,16 +154,39 @@ class OrderModel(Base):
     address: Mapped[str] = mapped_column(String(100), nullable=False)      
 
     user = relationship("UserModel", back_populates="orders")
-    order_items = relationship("OrderItemModel", back_populates="order", lazy='joined')
+    order_items = relationship("OrderItemModel", back_populates="order", lazy='raise')
 
 class OrderItemModel(Base):
     __tablename__ = 'order_item'
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
-    order_id: Mapped[int] = mapped_column(Integer, ForeignKey('order.id'), nullable=False)
+    order_id: Mapped[int] = mapped_column(Integer, ForeignKey('order.id'), nullable=False, index=True)
     product_id: Mapped[int] = mapped_column(Integer, ForeignKey('product.id'), nullable=False)
     quantity: Mapped[int] = mapped_column(Integer, nullable=False)
     price: Mapped[float] = mapped_column(Integer, nullable=False)
 
     order = relationship("OrderModel", back_populates="order_items")
-    product = relationship("ProductModel", back_populates="order_items", lazy='joined')
+    product = relationship("ProductModel", back_populates="order_items", lazy='raise')
+
+class MailStatus(PyEnum):
+    pending = "pending"
+    sent = "sent"
+    failed = "failed"
+
+# Mail Outbox Model: emails waiting to be sent by the MailWorker
+class MailOutboxModel(Base):
+    __tablename__ = 'mail_outbox'
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    recipient: Mapped[str] = mapped_column(String, nullable=False)
+    payload: Mapped[dict] = mapped_column(JSONB, nullable=False)
+    status: Mapped[MailStatus] = mapped_column(Enum(MailStatus), nullable=False, default=MailStatus.pending)
+    attempts: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    next_attempt_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    last_error: Mapped[str] = mapped_column(String, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    sent_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (
+        Index('ix_mail_outbox_status_next_attempt_at', 'status', 'next_attempt_at'),
+    )
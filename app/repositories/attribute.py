@@ -1,6 +1,23 @@
+from typing import Sequence, Set
+
+from sqlalchemy import Result, exists, literal, select, union_all
+
 from app.models.models import AttributeModel
 from app.utils.repository import SqlAlchemyRepository
 
 
 class AttributeRepository(SqlAlchemyRepository):
-    model = AttributeModel
\ No newline at end of file
+    model = AttributeModel
+
+    async def get_existing_names(self, names: Sequence[str]) -> Set[str]:
+        """
+        Returns the given names that some product has an attribute of. One index probe per name
+        on the (name, value, product_id) index, however many products have the attribute.
+        """
+        if not names:
+            return set()
+        query = union_all(*(
+            select(literal(name)).where(exists().where(self.model.name == name)) for name in names
+        ))
+        res: Result = await self.session.execute(query)
+        return set(res.scalars().all())
@@ -1,6 +1,63 @@
-from app.models.models import CartModel
+from datetime import datetime
+from typing import Sequence, Tuple
+
+from sqlalchemy import Result, delete, func, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import joinedload, selectinload
+
+from app.models.models import CartModel, ProductModel
 from app.utils.repository import SqlAlchemyRepository
 
 
+# loads what CartSchemaInDB serializes
+cart_in_db_options = (
+    joinedload(CartModel.product).options(
+        selectinload(ProductModel.images),
+        selectinload(ProductModel.attributes),
+    ),
+)
+
+# first key of the cart advisory locks, the second one is the user id
+CART_LOCK_SPACE = 0x0CA7
+
+
 class CartRepository(SqlAlchemyRepository):
-    model = CartModel
\ No newline at end of file
+    model = CartModel
+
+    async def lock_lines(self, user_id: int) -> Sequence[tuple]:
+        """Returns (id, product_id, quantity) of the user's cart lines, locked until the transaction ends"""
+        query = (
+            select(self.model.id, self.model.product_id, self.model.quantity)
+            .filter_by(user_id=user_id)
+            .with_for_update()
+        )
+        res: Result = await self.session.execute(query)
+        return res.tuples().all()
+
+    async def add_quantity(self, user_id: int, product_id: int, quantity: int) -> CartModel:
+        """Creates the cart line or increases its quantity, atomically in one statement"""
+        query = insert(self.model).values(user_id=user_id, product_id=product_id, quantity=quantity)
+        query = query.on_conflict_do_update(
+            index_elements=[self.model.user_id, self.model.product_id],
+            set_={'quantity': self.model.quantity + query.excluded.quantity}
+        ).returning(self.model)
+        res: Result = await self.session.execute(query)
+        return res.scalar_one()
+
+    async def lock_user(self, user_id: int) -> None:
+        """Serializes writers of the user's cart until the transaction ends, even if it has no rows yet"""
+        await self.session.execute(select(func.pg_advisory_xact_lock(CART_LOCK_SPACE, user_id)))
+
+    async def replace_lines(self, user_id: int, lines: Sequence[Tuple[int, int, datetime, datetime]]) -> None:
+        """Makes the user's cart match `lines`: (product_id, quantity, created_at, updated_at)"""
+        product_ids = [product_id for product_id, _, _, _ in lines]
+        query = delete(self.model).filter(self.model.user_id == user_id, self.model.product_id.not_in(product_ids))
+        await self.session.execute(query)
+        await self.upsert_many(
+            [
+                {'user_id': user_id, 'product_id': product_id, 'quantity': quantity, 'created_at': created_at, 'updated_at': updated_at}
+                for product_id, quantity, created_at, updated_at in lines
+            ],
+            index_elements=['user_id', 'product_id'],
+            set_=['quantity', 'updated_at']
+        )
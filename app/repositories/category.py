@@ -1,4 +1,4 @@
-from typing import Dict, List
+from typing import Dict, List, Sequence, Set
 from sqlalchemy.orm import aliased
 
 from sqlalchemy import select
@@ -7,4 +7,18 @@ from app.utils.repository import SqlAlchemyRepository
 
 
 class CategoryRepository(SqlAlchemyRepository):
-    model = CategoryModel
\ No newline at end of file
+    model = CategoryModel
+
+    async def get_ancestor_ids(self, category_ids: Sequence[int]) -> Set[int]:
+        """The categories and all of their parents up to the root, in one recursive query"""
+        ancestors = (
+            select(self.model.id, self.model.parent_id)
+            .filter(self.model.id.in_(category_ids))
+            .cte('ancestors', recursive=True)
+        )
+        parent = aliased(self.model)
+        ancestors = ancestors.union(
+            select(parent.id, parent.parent_id).join(ancestors, parent.id == ancestors.c.parent_id)
+        )
+        res = await self.session.execute(select(ancestors.c.id))
+        return set(res.scalars().all())
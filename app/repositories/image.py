@@ -1,6 +1,21 @@
+from typing import Sequence
+
+from sqlalchemy import Result, select
+
 from app.models.models import ImageModel
 from app.utils.repository import SqlAlchemyRepository
 
 
 class ImageRepository(SqlAlchemyRepository):
-    model = ImageModel
\ No newline at end of file
+    model = ImageModel
+
+    async def get_by_content_hashes(self, content_hashes: Sequence[str]) -> Sequence[ImageModel]:
+        """One stored image per hash, whichever product it belongs to"""
+        query = (
+            select(self.model)
+            .filter(self.model.content_hash.in_(content_hashes))
+            .distinct(self.model.content_hash)
+            .order_by(self.model.content_hash, self.model.id)
+        )
+        res: Result = await self.session.execute(query)
+        return res.scalars().all()
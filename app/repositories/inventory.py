@@ -1,6 +1,30 @@
-from app.models.models import InventoryModel
+from typing import Sequence
+
+from sqlalchemy import Result, func, select, update
+
+from app.models.models import CartModel, InventoryModel
 from app.utils.repository import SqlAlchemyRepository
 
 
 class InventoryRepository(SqlAlchemyRepository):
-    model = InventoryModel
\ No newline at end of file
+    model = InventoryModel
+
+    async def reserve_cart_lines(self, cart_ids: Sequence[int]) -> Sequence[int]:
+        """
+        Subtracts the quantities of the given cart lines from the stock in one statement.
+        Products without enough stock are left untouched, returns the product ids that were reserved.
+        """
+        requested = (
+            select(CartModel.product_id, func.sum(CartModel.quantity).label('quantity'))
+            .filter(CartModel.id.in_(cart_ids))
+            .group_by(CartModel.product_id)
+            .subquery()
+        )
+        query = (
+            update(self.model)
+            .filter(self.model.product_id == requested.c.product_id, self.model.quantity >= requested.c.quantity)
+            .values(quantity=self.model.quantity - requested.c.quantity)
+            .returning(self.model.product_id)
+        )
+        res: Result = await self.session.execute(query)
+        return res.scalars().all()
@@ -0,0 +1,51 @@
+from datetime import timedelta
+from typing import Optional, Sequence
+
+from sqlalchemy import Result, func, select, update
+
+from app.models.models import MailOutboxModel, MailStatus
+from app.utils.repository import SqlAlchemyRepository
+
+
+class MailOutboxRepository(SqlAlchemyRepository):
+    model = MailOutboxModel
+
+    async def claim_batch(self, limit: int, lease_seconds: int) -> Sequence[MailOutboxModel]:
+        """
+        Takes up to `limit` due emails and pushes their `next_attempt_at` past the lease,
+        so other workers skip them while they are being sent. If the worker dies
+        the emails become due again once the lease expires.
+        """
+        due = (
+            select(self.model.id)
+            .filter(self.model.status == MailStatus.pending, self.model.next_attempt_at <= func.now())
+            .order_by(self.model.next_attempt_at)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+            .scalar_subquery()
+        )
+        query = (
+            update(self.model)
+            .filter(self.model.id.in_(due))
+            .values(next_attempt_at=func.now() + timedelta(seconds=lease_seconds))
+            .returning(self.model)
+        )
+        res: Result = await self.session.execute(query)
+        return res.scalars().all()
+
+    async def mark_sent(self, ids: Sequence[int]) -> None:
+        query = (
+            update(self.model)
+            .filter(self.model.id.in_(ids))
+            .values(status=MailStatus.sent, sent_at=func.now(), attempts=self.model.attempts + 1, last_error=None)
+        )
+        await self.session.execute(query)
+
+    async def mark_retry(self, id: int, error: str, retry_in: Optional[float]) -> None:
+        """Schedules another attempt in `retry_in` seconds, or gives up on the email when it is None"""
+        values = {'attempts': self.model.attempts + 1, 'last_error': error}
+        if retry_in is None:
+            values['status'] = MailStatus.failed
+        else:
+            values['next_attempt_at'] = func.now() + timedelta(seconds=retry_in)
+        await self.session.execute(update(self.model).filter_by(id=id).values(**values))
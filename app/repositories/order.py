@@ -1,6 +1,32 @@
-from app.models.models import OrderModel
+from typing import Sequence
+
+from sqlalchemy import Result, func, insert, select
+from sqlalchemy.orm import joinedload, selectinload
+
+from app.models.models import CartModel, OrderItemModel, OrderModel, ProductModel
 from app.utils.repository import SqlAlchemyRepository
 
 
+# loads what OrderSchemaResponse serializes
+order_response_options = (
+    selectinload(OrderModel.order_items).joinedload(OrderItemModel.product).options(
+        selectinload(ProductModel.images),
+        selectinload(ProductModel.attributes),
+    ),
+)
+
+
 class OrderRepository(SqlAlchemyRepository):
-    model = OrderModel
\ No newline at end of file
+    model = OrderModel
+
+    async def add_from_cart_lines(self, cart_ids: Sequence[int], **values) -> int:
+        """Inserts an order whose total is summed from the given cart lines at the current prices"""
+        total_amount = (
+            select(func.sum(CartModel.quantity * ProductModel.price))
+            .join(ProductModel, ProductModel.id == CartModel.product_id)
+            .filter(CartModel.id.in_(cart_ids))
+            .scalar_subquery()
+        )
+        query = insert(self.model).values(total_amount=total_amount, **values).returning(self.model.id)
+        res: Result = await self.session.execute(query)
+        return res.scalar_one()
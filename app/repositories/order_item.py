@@ -1,6 +1,20 @@
-from app.models.models import OrderItemModel
+from typing import Sequence
+
+from sqlalchemy import insert, literal, select
+
+from app.models.models import CartModel, OrderItemModel, ProductModel
 from app.utils.repository import SqlAlchemyRepository
 
 
 class OrderItemRepository(SqlAlchemyRepository):
-    model = OrderItemModel
\ No newline at end of file
+    model = OrderItemModel
+
+    async def add_from_cart_lines(self, order_id: int, cart_ids: Sequence[int]) -> None:
+        """Copies the given cart lines into the order at the current prices"""
+        lines = (
+            select(literal(order_id), CartModel.product_id, CartModel.quantity, ProductModel.price)
+            .join(ProductModel, ProductModel.id == CartModel.product_id)
+            .filter(CartModel.id.in_(cart_ids))
+        )
+        query = insert(self.model).from_select(['order_id', 'product_id', 'quantity', 'price'], lines)
+        await self.session.execute(query)
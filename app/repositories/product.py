@@ -1,8 +1,17 @@
 from app.models.models import ProductModel
 from app.utils.repository import SqlAlchemyRepository
-from sqlalchemy.orm import joinedload
+from sqlalchemy.orm import joinedload, selectinload
 from sqlalchemy import Result, select
 from typing import Type
 
+
+# loads what ProductSchemaInDB serializes
+product_in_db_options = (
+    selectinload(ProductModel.images),
+    joinedload(ProductModel.inventory),
+    selectinload(ProductModel.attributes),
+)
+
+
 class ProductRepository(SqlAlchemyRepository):
-    model = ProductModel
\ No newline at end of file
+    model = ProductModel
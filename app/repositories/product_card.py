@@ -0,0 +1,143 @@
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import Float, Integer, Result, RowMapping, exists, func, literal, literal_column, select, tuple_
+from sqlalchemy.dialects.postgresql import aggregate_order_by, insert
+from sqlalchemy.orm import aliased
+
+from app.models.models import AttributeModel, ImageModel, InventoryModel, ProductCardModel, ProductModel
+from app.utils.repository import SqlAlchemyRepository
+
+
+def category_filter(category_ids: Sequence[int]) -> Any:
+    """Builds a `filters` entry matching the products of any of the given categories"""
+    return ProductCardModel.category_id.in_(category_ids)
+
+
+def attribute_filters(attributes: Dict[str, Sequence[str]]) -> List[Any]:
+    """
+    Builds `filters` for the product card queries: a product matches when, for every attribute name,
+    it has that attribute with one of the given values. Uses the (name, value, product_id) index.
+    """
+    filters = []
+    for name, values in attributes.items():
+        # aliased, so it does not correlate with an `attribute` table of the outer query (facets)
+        attribute = aliased(AttributeModel)
+        filters.append(exists().where(
+            attribute.name == name,
+            attribute.value.in_(values),
+            attribute.product_id == ProductCardModel.id,
+        ))
+    return filters
+
+
+class ProductCardRepository(SqlAlchemyRepository):
+    model = ProductCardModel
+
+    async def get_facets(self, filters: Sequence[Any] = (), **kwargs) -> Sequence[Tuple[str, str, int]]:
+        """
+        Counts the products of the filtered result set per attribute `(name, value)`,
+        most common values first.
+        """
+        count = func.count(AttributeModel.product_id)
+        query = (
+            select(AttributeModel.name, AttributeModel.value, count)
+            .join(self.model, self.model.id == AttributeModel.product_id)
+            .filter(*(getattr(self.model, column) == value for column, value in kwargs.items()))
+            .filter(*filters)
+            .group_by(AttributeModel.name, AttributeModel.value)
+            .order_by(AttributeModel.name, count.desc(), AttributeModel.value)
+        )
+        res: Result = await self.session.execute(query)
+        return res.tuples().all()
+
+    async def search(
+            self,
+            text: str,
+            limit: int,
+            after: Optional[Sequence[Any]] = None,
+    ) -> Sequence[RowMapping]:
+        """
+        Full-text search over the product name and description using the GIN-indexed `product.search_vector`.
+
+        Returns the card columns and their `rank` as mappings ordered by rank, best first.
+        `after` is the `(rank, id)` of the last row of the previous page.
+        """
+        tsquery = func.websearch_to_tsquery(literal_column("'english'::regconfig"), text)
+        rank = func.ts_rank(ProductModel.search_vector, tsquery)
+
+        query = (
+            select(*self.model.__table__.columns, rank.label('rank'))
+            .join(ProductModel, ProductModel.id == self.model.id)
+            .filter(ProductModel.search_vector.op('@@')(tsquery))
+        )
+        if after is not None:
+            after_rank, after_id = after
+            query = query.filter(
+                tuple_(rank, self.model.id) < tuple_(literal(after_rank, Float), literal(after_id, Integer))
+            )
+
+        query = query.order_by(rank.desc(), self.model.id.desc()).limit(limit)
+        res: Result = await self.session.execute(query)
+        return res.mappings().all()
+
+    async def refresh(self, product_ids: Sequence[int]) -> Sequence[int]:
+        """
+        Rebuilds the cards of the given products from the product, image, attribute and inventory tables
+        with a single INSERT ... SELECT ... ON CONFLICT DO UPDATE, the aggregation happens in Postgres.
+
+        Returns the category ids of the refreshed cards.
+        """
+        images = (
+            select(func.coalesce(
+                func.jsonb_agg(aggregate_order_by(
+                    func.jsonb_build_object(
+                        'id', ImageModel.id,
+                        'url', ImageModel.url,
+                        'thumbnail_url', ImageModel.thumbnail_url,
+                        'medium_url', ImageModel.medium_url,
+                    ),
+                    ImageModel.id,
+                )),
+                func.jsonb_build_array(),
+            ))
+            .where(ImageModel.product_id == ProductModel.id)
+            .scalar_subquery()
+        )
+        attributes = (
+            select(func.coalesce(
+                func.jsonb_agg(aggregate_order_by(
+                    func.jsonb_build_object('id', AttributeModel.id, 'name', AttributeModel.name, 'value', AttributeModel.value),
+                    AttributeModel.id,
+                )),
+                func.jsonb_build_array(),
+            ))
+            .where(AttributeModel.product_id == ProductModel.id)
+            .scalar_subquery()
+        )
+        inventory = (
+            select(func.jsonb_build_object('quantity', InventoryModel.quantity))
+            .where(InventoryModel.product_id == ProductModel.id)
+            .scalar_subquery()
+        )
+
+        columns = ['id', 'name', 'category_id', 'description', 'price', 'created_at', 'updated_at', 'inventory', 'images', 'attributes']
+        source = select(
+            ProductModel.id,
+            ProductModel.name,
+            ProductModel.category_id,
+            ProductModel.description,
+            ProductModel.price,
+            ProductModel.created_at,
+            ProductModel.updated_at,
+            inventory,
+            images,
+            attributes,
+        ).where(ProductModel.id.in_(product_ids))
+
+        query = insert(self.model).from_select(columns, source)
+        query = query.on_conflict_do_update(
+            index_elements=[self.model.id],
+            set_={column: query.excluded[column] for column in columns[1:]},
+        ).returning(self.model.category_id)
+        res: Result = await self.session.execute(query)
+        return res.scalars().all()
@@ -1,6 +1,7 @@
 from pydantic import BaseModel
 from typing import List, Optional
 from datetime import datetime
+from enum import Enum
 
 from app.schemas.attribute import AttributeSchemaInDB, AttributeSchemaResponse
 
@@ -25,6 +26,8 @@ class ImageSchemaCreate(BaseModel):
 
 class ImageSchemaInDB(ImageSchemaCreate):
     id: int
+    thumbnail_url: Optional[str] = None
+    medium_url: Optional[str] = None
 
 class InventorySchemaInDB(BaseModel):
     quantity: int
@@ -47,6 +50,26 @@ class ProductSchemaInDB(BaseModel):
     class Config:
         from_attributes = True
 
+class CatalogSortEnum(str, Enum):
+    newest = "newest"
+    price_asc = "price_asc"
+    price_desc = "price_desc"
+
+class ProductPageSchema(BaseModel):
+    items: List[ProductSchemaInDB] = []
+    next_cursor: Optional[str] = Field(None, description="Cursor of the next page, null on the last page")
+
+    class Config:
+        from_attributes = True
+
+class FacetValueSchema(BaseModel):
+    value: str
+    count: int = Field(..., description="Number of matching products with this value")
+
+class FacetSchema(BaseModel):
+    name: str
+    values: List[FacetValueSchema] = []
+
 class ProductSchemaUpdate(BaseModel):
     name: Optional[str] = Field(None, description="Name of the product", min_length=8, max_length=64)
     category_id: Optional[int] = Field(None, description="Category ID of the product")
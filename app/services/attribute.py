@@ -1,8 +1,16 @@
+from typing import Sequence, Set
+
 from app.utils.service import BaseService
+from app.utils.unit_of_work import UnitOfWork
 
 
 class AttributeService(BaseService):
     base_repository: str = 'attribute'
 
+    @classmethod
+    async def get_existing_names(cls, uow: UnitOfWork, names: Sequence[str]) -> Set[str]:
+        async with uow:
+            return await getattr(uow, cls.base_repository).get_existing_names(names)
+
 class ValueService(BaseService):
-    base_repository: str = 'value'
\ No newline at end of file
+    base_repository: str = 'value'
@@ -1,5 +1,305 @@
+import asyncio
+import logging
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Sequence
+
+from app.database.redis import redis_client
+from app.models.models import CartModel
+from app.repositories.cart import cart_in_db_options
+from app.schemas.cart import CartSchemaInDB
+from app.services.product_card import ProductCardService
 from app.utils.service import BaseService
+from app.utils.unit_of_work import UnitOfWork
+from config import settings
+
+logger = logging.getLogger(__name__)
 
 
 class CartService(BaseService):
-    base_repository: str = 'cart'
\ No newline at end of file
+    """
+    Cart backend storing the lines in the cart table.
+
+    The cart routes only use the methods below `add_product`, `RedisCartService` implements the same ones.
+    """
+
+    base_repository: str = 'cart'
+
+    @classmethod
+    async def add_product(cls, uow: UnitOfWork, user_id: int, product_id: int, quantity: int = 1) -> CartModel:
+        async with uow:
+            _obj = await getattr(uow, cls.base_repository).add_quantity(user_id, product_id, quantity)
+            return _obj
+
+    @classmethod
+    async def get_lines(cls, uow: UnitOfWork, user_id: int) -> Sequence[Any]:
+        return await cls.get_by_query_all(uow=uow, user_id=user_id, options=cart_in_db_options)
+
+    @classmethod
+    async def get_line(cls, uow: UnitOfWork, user_id: int, line_id: int) -> Optional[Any]:
+        """The line may belong to another user, the caller checks `user_id`"""
+        return await cls.get_by_query_one_or_none(uow=uow, id=line_id)
+
+    @classmethod
+    async def update_line(cls, uow: UnitOfWork, user_id: int, line_id: int, **values) -> Optional[Any]:
+        """Moving the line to a product already in the cart merges it into that product's line"""
+        async with uow:
+            product_id = values.get('product_id')
+            line = await cls.get_by_query_one_or_none(uow=uow, id=line_id) if product_id is not None else None
+            if line is not None and line.product_id != product_id:
+                quantity = line.quantity if values.get('quantity') is None else values['quantity']
+                await cls.delete_by_query(uow=uow, id=line_id)
+                return await getattr(uow, cls.base_repository).add_quantity(user_id, product_id, quantity)
+            return await cls.update_one_by_id(uow=uow, _id=line_id, **values)
+
+    @classmethod
+    async def delete_line(cls, uow: UnitOfWork, user_id: int, line_id: int) -> None:
+        await cls.delete_by_query(uow=uow, id=line_id)
+
+    @classmethod
+    async def clear(cls, uow: UnitOfWork, user_id: int) -> bool:
+        """Returns False if the cart was already empty"""
+        if not await cls.get_by_query_all(uow=uow, user_id=user_id):
+            return False
+        await cls.delete_by_query(uow=uow, user_id=user_id)
+        return True
+
+    @classmethod
+    async def prepare_checkout(cls, uow: UnitOfWork, user_id: int) -> None:
+        """Makes the cart table up to date for `OrderService.place_order`"""
+
+    @classmethod
+    async def checked_out(cls, uow: UnitOfWork, user_id: int, product_ids: Sequence[int]) -> None:
+        """Called in the checkout transaction, before it commits, once the lines of these products became an order"""
+
+    @classmethod
+    async def checkout_failed(cls, user_id: int) -> None:
+        """Called when the checkout transaction failed to commit after `checked_out`"""
+
+
+class RedisCartService(CartService):
+    """
+    Cart backend keeping each user's lines in the Redis hash `cart:{user_id}`, the line id is the product id.
+
+    Writes mark the user dirty, a background flusher copies dirty carts to the cart table
+    (write-behind) and checkout flushes the cart synchronously. A cart missing from Redis,
+    because it expired or was never loaded, is loaded from the cart table on first use.
+    The `_loaded` field keeps the hash alive when the cart is empty.
+    """
+
+    dirty_key = 'cart:dirty'
+    loaded_field = '_loaded'
+
+    # fills the hash only if it does not exist, so a concurrent write is never overwritten by a load
+    load_script = redis_client.register_script("""
+        if redis.call('exists', KEYS[1]) == 0 then
+            redis.call('hset', KEYS[1], unpack(ARGV, 2))
+            redis.call('expire', KEYS[1], ARGV[1])
+        end
+    """)
+
+    _flusher: Optional[asyncio.Task] = None
+
+    @staticmethod
+    def _key(user_id: int) -> str:
+        return f'cart:{user_id}'
+
+    @classmethod
+    async def _ensure_loaded(cls, uow: UnitOfWork, user_id: int) -> None:
+        if await redis_client.exists(cls._key(user_id)):
+            return
+        args: List[Any] = [settings.CART_REDIS_TTL, cls.loaded_field, 1]
+        for line in await cls.get_by_query_all(uow=uow, user_id=user_id):
+            args += [
+                line.product_id, line.quantity,
+                f'{line.product_id}:c', line.created_at.timestamp(),
+                f'{line.product_id}:u', line.updated_at.timestamp(),
+            ]
+        await cls.load_script(keys=[cls._key(user_id)], args=args)
+
+    @classmethod
+    def _parse(cls, user_id: int, raw: Dict[bytes, bytes]) -> List[CartSchemaInDB]:
+        fields = {key.decode(): value for key, value in raw.items()}
+        lines = []
+        for field, quantity in fields.items():
+            if field == cls.loaded_field or ':' in field:
+                continue
+            lines.append(cls._line(user_id, int(field), quantity, fields.get(f'{field}:c'), fields.get(f'{field}:u')))
+        return sorted(lines, key=lambda line: line.created_at)
+
+    @staticmethod
+    def _line(user_id: int, product_id: int, quantity: Any, created_at: Any, updated_at: Any) -> CartSchemaInDB:
+        now = time.time()
+        return CartSchemaInDB(
+            id=product_id,
+            user_id=user_id,
+            product_id=product_id,
+            quantity=int(quantity),
+            created_at=datetime.fromtimestamp(float(created_at or now), timezone.utc),
+            updated_at=datetime.fromtimestamp(float(updated_at or now), timezone.utc),
+        )
+
+    @classmethod
+    async def add_product(cls, uow: UnitOfWork, user_id: int, product_id: int, quantity: int = 1) -> Optional[CartSchemaInDB]:
+        """Returns None if the product does not exist, the flusher could not write its line"""
+        if not await ProductCardService.get_products(uow=uow, product_ids=[product_id]):
+            return None
+        await cls._ensure_loaded(uow, user_id)
+        key, now = cls._key(user_id), time.time()
+        pipe = redis_client.pipeline(transaction=True)
+        pipe.hincrby(key, product_id, quantity)
+        pipe.hsetnx(key, f'{product_id}:c', now)
+        pipe.hset(key, f'{product_id}:u', now)
+        pipe.hget(key, f'{product_id}:c')
+        pipe.expire(key, settings.CART_REDIS_TTL)
+        pipe.sadd(cls.dirty_key, user_id)
+        new_quantity, _, _, created_at, _, _ = await pipe.execute()
+        return cls._line(user_id, product_id, new_quantity, created_at, now)
+
+    @classmethod
+    async def get_lines(cls, uow: UnitOfWork, user_id: int) -> Sequence[Any]:
+        await cls._ensure_loaded(uow, user_id)
+        lines = cls._parse(user_id, await redis_client.hgetall(cls._key(user_id)))
+        products = await ProductCardService.get_products(uow=uow, product_ids=[line.product_id for line in lines])
+        return [
+            CartSchemaInDB.model_validate({**line.model_dump(), 'product': products.get(line.product_id)})
+            for line in lines
+        ]
+
+    @classmethod
+    async def get_line(cls, uow: UnitOfWork, user_id: int, line_id: int) -> Optional[Any]:
+        await cls._ensure_loaded(uow, user_id)
+        quantity, created_at, updated_at = await redis_client.hmget(
+            cls._key(user_id), [line_id, f'{line_id}:c', f'{line_id}:u']
+        )
+        if quantity is None:
+            return None
+        return cls._line(user_id, line_id, quantity, created_at, updated_at)
+
+    @classmethod
+    async def update_line(cls, uow: UnitOfWork, user_id: int, line_id: int, **values) -> Optional[Any]:
+        line = await cls.get_line(uow, user_id, line_id)
+        if line is None:
+            return None
+        product_id = line_id if values.get('product_id') is None else values['product_id']
+        quantity = line.quantity if values.get('quantity') is None else values['quantity']
+        if product_id != line_id and not await ProductCardService.get_products(uow=uow, product_ids=[product_id]):
+            return None
+        key, now = cls._key(user_id), time.time()
+
+        pipe = redis_client.pipeline(transaction=True)
+        if product_id != line_id:
+            # merged into the product's line if the cart already has one
+            pipe.hincrby(key, product_id, quantity)
+            pipe.hdel(key, line_id, f'{line_id}:c', f'{line_id}:u')
+            pipe.hsetnx(key, f'{product_id}:c', line.created_at.timestamp())
+        else:
+            pipe.hset(key, product_id, quantity)
+        pipe.hset(key, f'{product_id}:u', now)
+        pipe.hget(key, f'{product_id}:c')
+        pipe.expire(key, settings.CART_REDIS_TTL)
+        pipe.sadd(cls.dirty_key, user_id)
+        results = await pipe.execute()
+        new_quantity = results[0] if product_id != line_id else quantity
+        return cls._line(user_id, product_id, new_quantity, results[-3], now)
+
+    @classmethod
+    async def delete_line(cls, uow: UnitOfWork, user_id: int, line_id: int) -> None:
+        pipe = redis_client.pipeline(transaction=True)
+        pipe.hdel(cls._key(user_id), line_id, f'{line_id}:c', f'{line_id}:u')
+        pipe.sadd(cls.dirty_key, user_id)
+        await pipe.execute()
+
+    @classmethod
+    async def clear(cls, uow: UnitOfWork, user_id: int) -> bool:
+        await cls._ensure_loaded(uow, user_id)
+        key = cls._key(user_id)
+        pipe = redis_client.pipeline(transaction=True)
+        pipe.hlen(key)
+        pipe.delete(key)
+        pipe.hset(key, cls.loaded_field, 1)
+        pipe.expire(key, settings.CART_REDIS_TTL)
+        pipe.sadd(cls.dirty_key, user_id)
+        fields, *_ = await pipe.execute()
+        return fields > 1
+
+    @classmethod
+    async def prepare_checkout(cls, uow: UnitOfWork, user_id: int) -> None:
+        await cls.flush_user(uow, user_id)
+
+    @classmethod
+    async def checked_out(cls, uow: UnitOfWork, user_id: int, product_ids: Sequence[int]) -> None:
+        """
+        Removes the ordered lines from the hash while `prepare_checkout` still holds the user's advisory lock,
+        so a flusher waiting for the lock reads the hash without them once the order is committed
+        """
+        fields = [field for _id in product_ids for field in (_id, f'{_id}:c', f'{_id}:u')]
+        if fields:
+            await redis_client.hdel(cls._key(user_id), *fields)
+
+    @classmethod
+    async def checkout_failed(cls, user_id: int) -> None:
+        # the lines were removed from the hash but are still in the cart table, it is loaded again on next use
+        await redis_client.delete(cls._key(user_id))
+
+    @classmethod
+    async def flush_user(cls, uow: UnitOfWork, user_id: int) -> None:
+        """
+        Writes the Redis cart of the user to the cart table. The hash is read under the user's
+        advisory lock, so concurrent flushes are applied in order and the newest state wins.
+        """
+        async with uow:
+            await getattr(uow, cls.base_repository).lock_user(user_id)
+            raw = await redis_client.hgetall(cls._key(user_id))
+            if not raw:
+                # not loaded, the table is already the latest state
+                return
+            lines = [
+                (line.product_id, line.quantity, line.created_at, line.updated_at)
+                for line in cls._parse(user_id, raw)
+            ]
+            await getattr(uow, cls.base_repository).replace_lines(user_id, lines)
+
+    @classmethod
+    async def flush_dirty(cls, limit: int) -> int:
+        """Flushes up to `limit` dirty carts, returns how many were taken"""
+        user_ids = await redis_client.spop(cls.dirty_key, limit)
+        for user_id in user_ids or ():
+            try:
+                await cls.flush_user(UnitOfWork(), int(user_id))
+            except Exception:
+                logger.exception('cart flush failed for user %s', int(user_id))
+                await redis_client.sadd(cls.dirty_key, user_id)
+        return len(user_ids or ())
+
+    @classmethod
+    async def run_flusher(cls) -> None:
+        while True:
+            try:
+                flushed = await cls.flush_dirty(settings.CART_FLUSH_BATCH)
+            except Exception:
+                logger.exception('cart flush failed')
+                flushed = 0
+            if flushed < settings.CART_FLUSH_BATCH:
+                await asyncio.sleep(settings.CART_FLUSH_INTERVAL)
+
+    @classmethod
+    def start_flusher(cls) -> None:
+        cls._flusher = asyncio.create_task(cls.run_flusher())
+
+    @classmethod
+    async def stop_flusher(cls) -> None:
+        if cls._flusher is None:
+            return
+        cls._flusher.cancel()
+        try:
+            await cls._flusher
+        except asyncio.CancelledError:
+            pass
+        cls._flusher = None
+        # carts left dirty stay in Redis and are flushed by the next worker
+        await cls.flush_dirty(settings.CART_FLUSH_BATCH)
+
+
+# the backend the cart and order routes use
+cart_backend = RedisCartService if settings.CART_BACKEND == 'redis' else CartService
@@ -1,9 +1,75 @@
+import time
 from app.utils.service import BaseService
-from typing import Optional, Union, Any, Sequence, Dict
+from typing import Optional, Union, Any, Sequence, Dict, List, Iterable, Set
 from uuid import uuid4
 
 
-from app.utils.unit_of_work import UnitOfWork
+from app.database.replicas import replica_router
+from app.utils.unit_of_work import ReadOnlyUnitOfWork, UnitOfWork
+
+
+class CategoryTree:
+    """An in-memory snapshot of the category adjacency list"""
+
+    def __init__(self, categories: Sequence[Any]):
+        self.categories: Dict[int, Any] = {category.id: category for category in categories}
+        self.children: Dict[Optional[int], List[int]] = {}
+        for category in categories:
+            self.children.setdefault(category.parent_id, []).append(category.id)
+
+    def roots(self) -> List[Any]:
+        return [self.categories[_id] for _id in self.children.get(None, [])]
+
+    def subtree_ids(self, category_id: int) -> List[int]:
+        """The category itself and all of its descendants"""
+        result, stack = [], [category_id]
+        while stack:
+            _id = stack.pop()
+            if _id not in result:
+                result.append(_id)
+                stack.extend(self.children.get(_id, []))
+        return result
+
+    def ancestor_ids(self, category_id: int) -> List[int]:
+        """The category itself and all of its parents up to the root"""
+        result = []
+        while category_id is not None and category_id not in result:
+            result.append(category_id)
+            category = self.categories.get(category_id)
+            category_id = category.parent_id if category else None
+        return result
+
 
 class CategoryService(BaseService):
     base_repository: str = 'category'
+
+    # categories change rarely: the tree is cached per process and rebuilt when
+    # this process creates a category, other workers pick it up after `tree_ttl` seconds
+    # (plus the replica staleness when built from a replica).
+    # Right after an invalidation the tree is rebuilt on the primary, a replica may not have the new category yet
+    tree_ttl: int = 300
+    _tree: Optional[CategoryTree] = None
+    _tree_built_at: float = 0.0
+    _tree_invalidated_at: float = float('-inf')
+
+    @classmethod
+    async def get_tree(cls, uow: UnitOfWork) -> CategoryTree:
+        if cls._tree is None or time.monotonic() - cls._tree_built_at > cls.tree_ttl:
+            if isinstance(uow, ReadOnlyUnitOfWork) and time.monotonic() - cls._tree_invalidated_at < replica_router.max_staleness:
+                uow = UnitOfWork()
+            categories = await cls.get_by_query_all(uow=uow)
+            cls._tree, cls._tree_built_at = CategoryTree(categories), time.monotonic()
+        return cls._tree
+
+    @classmethod
+    def invalidate_tree(cls) -> None:
+        cls._tree, cls._tree_invalidated_at = None, time.monotonic()
+
+    @classmethod
+    async def get_with_ancestors(cls, uow: UnitOfWork, category_ids: Iterable[int]) -> Set[int]:
+        """Read from the database, the cached tree may miss a category created by another worker"""
+        category_ids = [_id for _id in category_ids if _id is not None]
+        if not category_ids:
+            return set()
+        async with uow:
+            return await getattr(uow, cls.base_repository).get_ancestor_ids(category_ids)
@@ -1,5 +1,134 @@
+import asyncio
+import hashlib
+import io
+import os
+import tempfile
+from typing import Dict, List, Sequence, Tuple
+
+from fastapi import UploadFile
+from PIL import Image, UnidentifiedImageError
+from starlette.concurrency import run_in_threadpool
+
+from app.services.upload import image_processor, image_uploader
 from app.utils.service import BaseService
+from app.utils.unit_of_work import UnitOfWork
+from config import settings
+
+
+class InvalidImageError(ValueError):
+    """Raised when an uploaded file can't be decoded as an image"""
+
+
+class ImageTooLargeError(InvalidImageError):
+    """Raised when an uploaded file is larger than UPLOAD_MAX_FILE_SIZE"""
 
 
 class ImageService(BaseService):
-    base_repository: str = 'image'
\ No newline at end of file
+    base_repository: str = 'image'
+
+    @classmethod
+    async def upload_images(
+            cls,
+            uow: UnitOfWork,
+            images: Sequence[UploadFile]
+    ) -> List[Dict[str, str]]:
+        """
+        Uploads the images with their thumbnail and medium variants, `add_images` then adds them to a product.
+        Images are identified by the sha256 of their content: one that was already stored,
+        for any product, reuses the existing urls and is neither processed nor uploaded again.
+
+        Commits `uow` after looking up the known images, so the request's connection goes back to the pool
+        instead of idling in a transaction while the images are processed and uploaded:
+        call it before the request writes anything.
+
+        Each image is copied to a temporary file while it is hashed, the size limit is checked on the way
+        and the process pool workers read the file instead of receiving its content.
+
+        raises: InvalidImageError, ImageTooLargeError, nothing is uploaded in that case
+        """
+        paths: List[str] = []
+        try:
+            hashes = []
+            for image in images:
+                content_hash, path = await cls._spool(image)
+                hashes.append(content_hash)
+                paths.append(path)
+            return await cls._upload_new(uow, images, hashes, paths)
+        finally:
+            for path in paths:
+                os.unlink(path)
+
+    @classmethod
+    async def _upload_new(
+            cls,
+            uow: UnitOfWork,
+            images: Sequence[UploadFile],
+            hashes: Sequence[str],
+            paths: Sequence[str]
+    ) -> List[Dict[str, str]]:
+        async with uow:
+            known = await getattr(uow, cls.base_repository).get_by_content_hashes(list(set(hashes)))
+            await uow.commit()
+        urls: Dict[str, Tuple[str, str, str]] = {
+            image.content_hash: (image.url, image.thumbnail_url, image.medium_url)
+            for image in known if image.thumbnail_url is not None
+        }
+
+        new_images = {}
+        for image, content_hash, path in zip(images, hashes, paths):
+            if content_hash not in urls:
+                new_images.setdefault(content_hash, (image, path))
+        stored = await asyncio.gather(*(cls._upload_with_variants(image, path) for image, path in new_images.values()))
+        urls.update(zip(new_images, stored))
+
+        return [
+            {
+                'content_hash': content_hash,
+                'url': urls[content_hash][0],
+                'thumbnail_url': urls[content_hash][1],
+                'medium_url': urls[content_hash][2],
+            }
+            for content_hash in hashes
+        ]
+
+    @classmethod
+    async def add_images(
+            cls,
+            uow: UnitOfWork,
+            product_id: int,
+            uploaded: Sequence[Dict[str, str]]
+    ) -> None:
+        """Adds images returned by `upload_images` to the product"""
+        if uploaded:
+            await cls.add_many(uow=uow, values=[{'product_id': product_id, **image} for image in uploaded])
+
+    @staticmethod
+    async def _spool(image: UploadFile) -> Tuple[str, str]:
+        """Copies the upload to a temporary file, returns its sha256 and the path of the file"""
+        digest, size = hashlib.sha256(), 0
+        fd, path = tempfile.mkstemp(prefix='upload-')
+        try:
+            with os.fdopen(fd, 'wb') as file:
+                while chunk := await image.read(1 << 20):
+                    size += len(chunk)
+                    if size > settings.UPLOAD_MAX_FILE_SIZE:
+                        raise ImageTooLargeError(image.filename)
+                    digest.update(chunk)
+                    await run_in_threadpool(file.write, chunk)
+        except BaseException:
+            os.unlink(path)
+            raise
+        return digest.hexdigest(), path
+
+    @staticmethod
+    async def _upload_with_variants(image: UploadFile, path: str) -> Tuple[str, str, str]:
+        try:
+            variants = await image_processor.make_variants(path)
+        except (UnidentifiedImageError, Image.DecompressionBombError, OSError):
+            raise InvalidImageError(image.filename)
+        with open(path, 'rb') as original:
+            url, thumbnail_url, medium_url = await image_uploader.upload_many(
+                [original, io.BytesIO(variants['thumbnail']), io.BytesIO(variants['medium'])],
+                [image.content_type, image_processor.content_type, image_processor.content_type]
+            )
+        return url, thumbnail_url, medium_url
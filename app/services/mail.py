@@ -1,15 +1,35 @@
+import asyncio
+import logging
 from datetime import datetime
+from typing import Callable, Dict, Optional
+
+import httpx
 import mailtrap as mt
 from config import settings
+from app.services.mail_outbox import MailOutboxService
+from app.utils.unit_of_work import UnitOfWork
+
+logger = logging.getLogger(__name__)
+
 
 class MailService:
+    """
+    Builds template emails and queues them in the mail_outbox table.
+    Nothing is sent from the request, `MailWorker` delivers the queued emails.
+    """
+
     def __init__(self, token: str):
-        self.client = mt.MailtrapClient(token=token)
+        self.token = token
         self.sender = mt.Address(email="mailtrap@demomailtrap.com", name="Mailtrap Test")
         self.reg_template_uuid = "0fb26393-1adc-4508-993a-149a20b7f501"
         self.order_template_uuid = "ecdcc387-0387-4f9b-94cb-10dbdcb6c46f"
 
-    def send_registration_email(self, email: str, name: str):
+    async def queue(self, uow: UnitOfWork, mail: mt.MailFromTemplate) -> None:
+        await MailOutboxService.add_one(
+            uow=uow, recipient=mail.to[0].email, payload=mail.api_data
+        )
+
+    async def queue_registration_email(self, uow: UnitOfWork, email: str, name: str):
         mail = mt.MailFromTemplate(
             sender=self.sender,
             to=[mt.Address(email=email)],
@@ -23,9 +43,9 @@ class MailService:
                 "company_info_country": "United Kingdom"
             }
         )
-        self.client.send(mail)
-    
-    def send_order_confirmation_email(self, email: str, user_name: str, order_id: str, order_date: datetime, country: str, city: str, address: str, user_email: str):
+        await self.queue(uow, mail)
+
+    async def queue_order_confirmation_email(self, uow: UnitOfWork, email: str, user_name: str, order_id: str, order_date: datetime, country: str, city: str, address: str, user_email: str):
         order_date_str = order_date.strftime('%Y-%m-%d %H:%M:%S')
         mail = mt.MailFromTemplate(
             sender=self.sender,
@@ -41,6 +61,127 @@ class MailService:
                 "user_email": user_email
             }
         )
-        self.client.send(mail)
+        await self.queue(uow, mail)
+
+
+class MailWorker:
+    """
+    Background task delivering the mail_outbox in batches.
+
+    Every process runs one worker, claimed rows are leased so workers never send the same email twice
+    at the same time. Sends are spaced to `rate_per_second` and failures are retried with exponential backoff.
+    The provider is reached at `api_url`, which can point to a local HTTP sink in development.
+    """
+
+    def __init__(
+            self,
+            api_url: str,
+            token: str,
+            batch_size: int,
+            rate_per_second: float,
+            poll_interval: float,
+            lease_seconds: int,
+            max_attempts: int,
+            retry_base: float
+    ):
+        self.api_url = api_url.rstrip('/')
+        self.token = token
+        self.batch_size = batch_size
+        self.interval = 1 / rate_per_second
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.retry_base = retry_base
+        self.client: Optional[httpx.AsyncClient] = None
+        self.uow_factory: Callable[[], UnitOfWork] = UnitOfWork
+        self._task: Optional[asyncio.Task] = None
+        self._next_slot = 0.0
+
+    def start(self) -> None:
+        self.client = httpx.AsyncClient(
+            base_url=self.api_url,
+            headers={"Authorization": f"Bearer {self.token}"},
+            timeout=10
+        )
+        self._task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
+
+    async def run(self) -> None:
+        while True:
+            try:
+                claimed = await self.process_batch()
+            except Exception:
+                logger.exception('mail outbox batch failed')
+                claimed = 0
+            # a full batch means there is probably more waiting
+            if claimed < self.batch_size:
+                await asyncio.sleep(self.poll_interval)
+
+    async def process_batch(self) -> int:
+        mails = await MailOutboxService.claim_batch(
+            uow=self.uow_factory(), limit=self.batch_size, lease_seconds=self.lease_seconds
+        )
+        if not mails:
+            return 0
+
+        errors = await asyncio.gather(*(self.send(mail['payload']) for mail in mails))
+
+        sent_ids, retries = [], []
+        for mail, error in zip(mails, errors):
+            if error is None:
+                sent_ids.append(mail['id'])
+            else:
+                retries.append((mail['id'], error[0], self.retry_in(mail['attempts'] + 1) if error[1] else None))
+        await MailOutboxService.record_results(uow=self.uow_factory(), sent_ids=sent_ids, retries=retries)
+        return len(mails)
+
+    async def send(self, payload: Dict) -> Optional[tuple]:
+        """Returns None on success, otherwise (error, retryable)"""
+        await self._throttle()
+        try:
+            response = await self.client.post('/api/send', json=payload)
+        except httpx.HTTPError as e:
+            return repr(e), True
+        if response.is_success:
+            return None
+        retryable = response.status_code in (408, 429) or response.status_code >= 500
+        return f'{response.status_code}: {response.text[:500]}', retryable
+
+    def retry_in(self, attempts: int) -> Optional[float]:
+        if attempts >= self.max_attempts:
+            return None
+        return min(self.retry_base * 2 ** (attempts - 1), 3600.0)
+
+    async def _throttle(self) -> None:
+        # every send reserves the next free slot, so concurrent sends stay within the rate
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        slot = max(now, self._next_slot)
+        self._next_slot = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+
+mail_app = MailService(token=settings.MAILTRAP_TOKEN)
 
-mail_app = MailService(token=settings.MAILTRAP_TOKEN)
\ No newline at end of file
+mail_worker = MailWorker(
+    api_url=settings.MAIL_API_URL,
+    token=settings.MAILTRAP_TOKEN,
+    batch_size=settings.MAIL_BATCH_SIZE,
+    rate_per_second=settings.MAIL_RATE_PER_SECOND,
+    poll_interval=settings.MAIL_POLL_INTERVAL,
+    lease_seconds=settings.MAIL_LEASE_SECONDS,
+    max_attempts=settings.MAIL_MAX_ATTEMPTS,
+    retry_base=settings.MAIL_RETRY_BASE_SECONDS
+)
@@ -0,0 +1,32 @@
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from app.utils.service import BaseService
+from app.utils.unit_of_work import UnitOfWork
+
+
+class MailOutboxService(BaseService):
+    base_repository: str = 'mail_outbox'
+
+    @classmethod
+    async def claim_batch(cls, uow: UnitOfWork, limit: int, lease_seconds: int) -> List[Dict]:
+        async with uow:
+            mails = await getattr(uow, cls.base_repository).claim_batch(limit=limit, lease_seconds=lease_seconds)
+            return [{'id': mail.id, 'payload': mail.payload, 'attempts': mail.attempts} for mail in mails]
+
+    @classmethod
+    async def record_results(
+            cls,
+            uow: UnitOfWork,
+            sent_ids: Sequence[int],
+            retries: Sequence[Tuple[int, str, Optional[float]]]
+    ) -> None:
+        """
+        params:
+            - sent_ids: ids of the emails accepted by the provider
+            - retries: (id, error, retry_in) of the emails that failed, retry_in is None for permanent failures
+        """
+        async with uow:
+            if sent_ids:
+                await getattr(uow, cls.base_repository).mark_sent(sent_ids)
+            for _id, error, retry_in in retries:
+                await getattr(uow, cls.base_repository).mark_retry(_id, error, retry_in)
@@ -0,0 +1,113 @@
+import asyncio
+import logging
+from typing import Optional, Set
+
+from fastapi import WebSocket
+
+from app.database.redis import redis_client
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class _Connection:
+    """A websocket with its own bounded queue, drained by a dedicated sender task"""
+
+    def __init__(self, websocket: WebSocket, queue_size: int):
+        self.websocket = websocket
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.sender: Optional[asyncio.Task] = None
+
+
+class NotificationHub:
+    """
+    Fans messages out to the websockets connected to any worker.
+
+    `publish` goes through a Redis pub/sub channel, every worker subscribes to it and copies
+    each message into the queue of its local connections. A socket whose queue is full or whose
+    send fails or takes longer than `send_timeout` is closed and forgotten, so a slow dashboard
+    never delays the others.
+    """
+
+    def __init__(self, channel: str, queue_size: int, send_timeout: float):
+        self.channel = channel
+        self.queue_size = queue_size
+        self.send_timeout = send_timeout
+        self.connections: Set[_Connection] = set()
+        self._subscriber: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        self._subscriber = asyncio.create_task(self._subscribe())
+
+    async def stop(self) -> None:
+        if self._subscriber is not None:
+            self._subscriber.cancel()
+            try:
+                await self._subscriber
+            except asyncio.CancelledError:
+                pass
+            self._subscriber = None
+        senders = [connection.sender for connection in self.connections]
+        for connection in list(self.connections):
+            self.disconnect(connection)
+        await asyncio.gather(*senders, return_exceptions=True)
+
+    async def publish(self, message: str) -> None:
+        await redis_client.publish(self.channel, message)
+
+    def connect(self, websocket: WebSocket) -> _Connection:
+        """Registers an accepted websocket"""
+        connection = _Connection(websocket, self.queue_size)
+        connection.sender = asyncio.create_task(self._send_loop(connection))
+        self.connections.add(connection)
+        return connection
+
+    def disconnect(self, connection: _Connection) -> None:
+        """Forgets the connection, its sender task closes the socket"""
+        self.connections.discard(connection)
+        connection.sender.cancel()
+
+    def broadcast_local(self, message: str) -> None:
+        for connection in list(self.connections):
+            try:
+                connection.queue.put_nowait(message)
+            except asyncio.QueueFull:
+                logger.warning('dropping a websocket that is %s messages behind', self.queue_size)
+                self.disconnect(connection)
+
+    async def _send_loop(self, connection: _Connection) -> None:
+        try:
+            while True:
+                message = await connection.queue.get()
+                await asyncio.wait_for(connection.websocket.send_text(message), self.send_timeout)
+        except Exception:
+            pass
+        finally:
+            self.connections.discard(connection)
+            try:
+                await connection.websocket.close()
+            except Exception:
+                # already closed by the client
+                pass
+
+    async def _subscribe(self) -> None:
+        while True:
+            pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(self.channel)
+                async for message in pubsub.listen():
+                    self.broadcast_local(message['data'].decode())
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception('notification subscription lost, reconnecting')
+                await asyncio.sleep(1)
+            finally:
+                await pubsub.reset()
+
+
+notification_hub = NotificationHub(
+    channel=settings.NOTIFY_CHANNEL,
+    queue_size=settings.NOTIFY_QUEUE_SIZE,
+    send_timeout=settings.NOTIFY_SEND_TIMEOUT
+)
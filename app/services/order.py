@@ -1,5 +1,52 @@
+from typing import Dict, List, Optional, Tuple
+
+from app.models.models import OrderStatus
 from app.utils.service import BaseService
+from app.utils.unit_of_work import UnitOfWork
+
+
+class OutOfStockError(Exception):
+    """Raised when the stock can't cover some of the cart lines, maps product id to the requested quantity"""
+
+    def __init__(self, missing: Dict[int, int]):
+        super().__init__(missing)
+        self.missing = missing
 
 
 class OrderService(BaseService):
-    base_repository: str = 'order'
\ No newline at end of file
+    base_repository: str = 'order'
+
+    @classmethod
+    async def place_order(
+            cls,
+            uow: UnitOfWork,
+            user_id: int,
+            **delivery_details
+    ) -> Optional[Tuple[int, List[int]]]:
+        """
+        Turns the user's cart into an order in a single transaction.
+        The stock is checked and reserved by the same statement, so concurrent checkouts can't oversell.
+
+        returns: (order id, ordered product ids), None when the cart is empty
+        raises: OutOfStockError, nothing is changed in that case
+        """
+        async with uow:
+            lines = await uow.cart.lock_lines(user_id=user_id)
+            if not lines:
+                return None
+            cart_ids = [line_id for line_id, _, _ in lines]
+            requested: Dict[int, int] = {}
+            for _, product_id, quantity in lines:
+                requested[product_id] = requested.get(product_id, 0) + quantity
+
+            reserved = await uow.inventory.reserve_cart_lines(cart_ids)
+            if len(reserved) < len(requested):
+                missing = {product_id: quantity for product_id, quantity in requested.items() if product_id not in reserved}
+                raise OutOfStockError(missing)
+
+            order_id = await getattr(uow, cls.base_repository).add_from_cart_lines(
+                cart_ids, user_id=user_id, status=OrderStatus.pending, **delivery_details
+            )
+            await uow.order_item.add_from_cart_lines(order_id, cart_ids)
+            await uow.cart.delete_by_ids(cart_ids)
+            return order_id, list(requested)
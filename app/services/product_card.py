@@ -0,0 +1,170 @@
+import json
+from functools import partial
+
+from app.database.redis import redis_client
+from app.schemas.product import ProductSchemaResponse
+from app.services.category import CategoryService
+from app.utils.service import BaseService
+from app.utils.unit_of_work import UnitOfWork
+from app.utils.pagination import decode_cursor, encode_cursor
+from app.utils.response_cache import response_cache
+from typing import Dict, List, Optional, Any, Sequence, Tuple
+from config import settings
+
+# response cache tags: entries showing a product, listing a category (and its subcategories),
+# or listing the whole catalog
+CATALOG_TAG = 'catalog'
+
+
+def product_tag(product_id: int) -> str:
+    return f'product:{product_id}'
+
+
+def category_tag(category_id: int) -> str:
+    return f'category:{category_id}'
+
+
+class ProductCardService(BaseService):
+    """
+    Catalog read model. Every endpoint that changes a product, its images, attributes
+    or inventory must call `refresh` for that product afterwards, and `invalidate_listings`
+    when the change can add or remove the product from a listing or move it within one.
+    """
+
+    base_repository: str = 'product_card'
+
+    # sort name -> (keyset columns, descending); every key ends with `id` to stay unique
+    catalog_sorts = {
+        'newest': (('created_at', 'id'), True),
+        'price_asc': (('price', 'id'), False),
+        'price_desc': (('price', 'id'), True),
+    }
+
+    @classmethod
+    async def refresh(
+            cls,
+            uow: UnitOfWork,
+            product_ids: Sequence[int]
+    ) -> Sequence[int]:
+        """
+        Rebuilds the cards in the caller's transaction. Their caches are purged after it commits,
+        purging earlier would let a concurrent request cache the old cards again.
+        """
+        async with uow:
+            _category_ids = await getattr(uow, cls.base_repository).refresh(product_ids)
+            if product_ids:
+                uow.after_commit(partial(cls._purge, list(product_ids)))
+        return _category_ids
+
+    @classmethod
+    async def _purge(cls, product_ids: Sequence[int]) -> None:
+        await redis_client.delete(*(cls._product_key(_id) for _id in product_ids))
+        await response_cache.invalidate(*(product_tag(_id) for _id in product_ids))
+
+    @classmethod
+    async def get_products(
+            cls,
+            uow: UnitOfWork,
+            product_ids: Sequence[int]
+    ) -> Dict[int, Dict[str, Any]]:
+        """
+        Returns `ProductSchemaResponse` dicts by product id, cached in Redis for PRODUCT_CARD_CACHE_TTL seconds
+        and dropped by `refresh`. Missing products are left out.
+        """
+        if not product_ids:
+            return {}
+        cached = await redis_client.mget([cls._product_key(_id) for _id in product_ids])
+        products = {_id: json.loads(raw) for _id, raw in zip(product_ids, cached) if raw is not None}
+
+        missing = [_id for _id in product_ids if _id not in products]
+        if missing:
+            cards = await cls.get_by_ids(uow=uow, ids=missing, mappings=True)
+            pipe = redis_client.pipeline(transaction=False)
+            for card in cards:
+                products[card['id']] = ProductSchemaResponse.model_validate(card).model_dump(mode='json')
+                pipe.set(cls._product_key(card['id']), json.dumps(products[card['id']]), ex=settings.PRODUCT_CARD_CACHE_TTL)
+            await pipe.execute()
+        return products
+
+    @staticmethod
+    def _product_key(product_id: int) -> str:
+        return f'product_card:{product_id}'
+
+    @classmethod
+    async def get_facets(
+            cls,
+            uow: UnitOfWork,
+            filters: Sequence[Any] = (),
+            **kwargs
+    ) -> List[Dict[str, Any]]:
+        """Returns the attribute facets of the filtered catalog: `[{name, values: [{value, count}]}]`"""
+        async with uow:
+            rows = await getattr(uow, cls.base_repository).get_facets(filters, **kwargs)
+
+        facets: Dict[str, List[Dict[str, Any]]] = {}
+        for name, value, count in rows:
+            facets.setdefault(name, []).append({'value': value, 'count': count})
+        return [{'name': name, 'values': values} for name, values in facets.items()]
+
+    @staticmethod
+    async def invalidate_listings(uow: UnitOfWork, category_ids: Sequence[int]) -> None:
+        """
+        Drops the cached listings and facets of the whole catalog and of the given categories,
+        including their parents since a category lists its subcategories, once `uow` commits.
+        """
+        async with uow:
+            ancestor_ids = await CategoryService.get_with_ancestors(uow=uow, category_ids=category_ids)
+            uow.after_commit(partial(response_cache.invalidate, CATALOG_TAG, *(category_tag(_id) for _id in ancestor_ids)))
+
+    @classmethod
+    async def search_page(
+            cls,
+            uow: UnitOfWork,
+            text: str,
+            limit: int,
+            cursor: Optional[str] = None,
+    ) -> Tuple[Sequence[Any], Optional[str]]:
+        """
+        Returns one page of full-text search results, best match first, and the cursor of the next page.
+
+        Raises `InvalidCursorError` if the cursor was not issued by a search.
+        """
+        after = decode_cursor(cursor, 'search', 2) if cursor else None
+        async with uow:
+            rows = await getattr(uow, cls.base_repository).search(text, limit + 1, after)
+
+        cards = rows[:limit]
+        if len(rows) <= limit:
+            return cards, None
+
+        last = cards[-1]
+        return cards, encode_cursor('search', [last['rank'], last['id']])
+
+    @classmethod
+    async def get_catalog_page(
+            cls,
+            uow: UnitOfWork,
+            sort: str,
+            limit: int,
+            cursor: Optional[str] = None,
+            filters: Sequence[Any] = (),
+            **kwargs
+    ) -> Tuple[Sequence[Any], Optional[str]]:
+        """
+        Returns one keyset page of product card mappings and the cursor of the next page (None on the last page).
+
+        Raises `InvalidCursorError` if the cursor was not issued for this sort order.
+        """
+        order_by, descending = cls.catalog_sorts[sort]
+        after = decode_cursor(cursor, sort, len(order_by)) if cursor else None
+
+        cards = await cls.get_by_query_with_cursor(
+            uow=uow, limit=limit + 1, order_by=order_by, descending=descending, after=after, filters=filters,
+            mappings=True, **kwargs
+        )
+        if len(cards) <= limit:
+            return cards, None
+
+        cards = cards[:limit]
+        last = cards[-1]
+        return cards, encode_cursor(sort, [last[column] for column in order_by])
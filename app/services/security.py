@@ -1,6 +1,8 @@
+import asyncio
 import datetime
-import uuid
-import httpx
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict
 import jwt
 from app.models.user import UserModel
 from app.services.user import UserService
@@ -8,7 +10,7 @@ import fastapi.security as security
 from fastapi import HTTPException, Depends
 from passlib.context import CryptContext
 from config import settings
-from app.utils.unit_of_work import UnitOfWork
+from app.utils.unit_of_work import UnitOfWork, get_uow
 
 
 
@@ -16,18 +18,74 @@ oauth2_schema = security.OAuth2PasswordBearer("/api/v1/users/login")
 
 pwd_context = CryptContext(schemes=['bcrypt'], deprecated = 'auto')
 
-def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+class PasswordHasher:
+    """
+    Runs bcrypt in a bounded thread pool so it does not block the event loop (bcrypt releases the GIL).
 
+    At most `workers` hashes run at once and `max_waiting` wait for a thread, beyond that
+    the request fails with 503, so a login spike only slows down the routes that hash passwords.
+    """
 
+    def __init__(self, workers: int, max_waiting: int):
+        self.workers = workers
+        self.max_waiting = max_waiting
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='bcrypt')
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
 
+    async def run(self, func: Callable[..., Any], *args: Any) -> Any:
+        if self.pending >= self.workers + self.max_waiting:
+            self.rejected += 1
+            raise HTTPException(status_code=503, detail="Server is busy, try again later", headers={"Retry-After": "1"})
 
-async def authenticate_user(email:str, password: str, uow: UnitOfWork = Depends(UnitOfWork)):
+        def timed():
+            return time.perf_counter(), func(*args)
+
+        submitted_at = time.perf_counter()
+        self.pending += 1
+        try:
+            started_at, result = await asyncio.get_running_loop().run_in_executor(self.executor, timed)
+        finally:
+            self.pending -= 1
+
+        wait = started_at - submitted_at
+        self.completed += 1
+        self.total_wait += wait
+        self.max_wait = max(self.max_wait, wait)
+        return result
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "pending": self.pending,
+            "waiting": max(self.pending - self.workers, 0),
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "avg_wait_seconds": self.total_wait / self.completed if self.completed else 0.0,
+            "max_wait_seconds": self.max_wait,
+        }
+
+
+password_hasher = PasswordHasher(workers=settings.PASSWORD_HASH_WORKERS, max_waiting=settings.PASSWORD_HASH_MAX_WAITING)
+
+async def get_password_hash(password: str) -> str:
+    return await password_hasher.run(pwd_context.hash, password)
+
+async def verify_password(plain_password: str, hashed_password: str) -> bool:
+    return await password_hasher.run(pwd_context.verify, plain_password, hashed_password)
+
+
+
+
+async def authenticate_user(email:str, password: str, uow: UnitOfWork = Depends(get_uow)):
     user: UserModel | None = await UserService.get_by_query_one_or_none(uow=uow, email=email)
-    if not (user and verify_password(password, user.password)):
+    # end the read before bcrypt, so the connection is not held idle in a transaction while hashing
+    await uow.commit()
+    if not (user and await verify_password(password, user.password)):
         return None
     
     return user
@@ -43,10 +101,10 @@ async def create_access_token(data: dict) -> str:
     )
     return {"access_token": encoded_jwt, "token_type": "bearer"}
 
-async def get_current_user(token: str = Depends(oauth2_schema), uow: UnitOfWork = Depends(UnitOfWork)):
+async def get_current_user(token: str = Depends(oauth2_schema), uow: UnitOfWork = Depends(get_uow)):
     try:
         payload = jwt.decode(token, settings.JWT_SECRET, algorithms=["HS256"])
-        user = await UserService.get_by_query_one_or_none(uow = uow, email=payload.get("sub"))
+        user = await UserService.get_principal(uow = uow, email=payload.get("sub"))
         if not user:
             raise HTTPException(status_code=401, detail="User not found")
     except jwt.ExpiredSignatureError:
@@ -57,7 +115,7 @@ async def get_current_user(token: str = Depends(oauth2_schema), uow: UnitOfWork
         raise HTTPException(status_code=401, detail="Invalid token")
     return user
 
-async def get_current_admin_user(token: str = Depends(oauth2_schema), uow: UnitOfWork = Depends(UnitOfWork)):
+async def get_current_admin_user(token: str = Depends(oauth2_schema), uow: UnitOfWork = Depends(get_uow)):
     user = await get_current_user(token, uow)
     if user.role != "admin":
         raise HTTPException(status_code=403, detail="Operation forbidden: admin access required")
@@ -66,7 +124,7 @@ async def get_current_admin_user(token: str = Depends(oauth2_schema), uow: UnitO
 async def verify_ws_token(token: str, uow: UnitOfWork = Depends(UnitOfWork)):
     try:
         payload = jwt.decode(token, settings.JWT_SECRET, algorithms=["HS256"])
-        user = await UserService.get_by_query_one_or_none(email=payload.get("sub"), uow=uow)
+        user = await UserService.get_principal(email=payload.get("sub"), uow=uow)
         if not user:
             raise HTTPException(status_code=401, detail="User not found")
         return user
@@ -76,13 +134,4 @@ async def verify_ws_token(token: str, uow: UnitOfWork = Depends(UnitOfWork)):
         raise HTTPException(status_code=401, detail="Could not decode token")
     except jwt.InvalidTokenError:
         raise HTTPException(status_code=401, detail="Invalid token")
-
-async def upload_to_cloud(image):
-    async with httpx.AsyncClient(verify=False) as client:
-
-        timeout = httpx.Timeout(60.0, read=None)
-
-        response = await client.post("https://sd.cuilutech.com/r2/uploadfile", files={'file': (str(uuid.uuid4()), image)}, timeout=timeout)
-        response_data = response.json()
-        return response_data["data"]
     
\ No newline at end of file
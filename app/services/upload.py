@@ -0,0 +1,90 @@
+import asyncio
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from typing import BinaryIO, Dict, List, Optional, Sequence
+
+import httpx
+
+from app.utils.images import make_variants
+from config import settings
+
+
+class ImageUploader:
+    """
+    Uploads images to the cloud storage over one connection pool kept for the app lifetime.
+
+    Files are streamed from their file objects, at most `concurrency` uploads run at once.
+    """
+
+    def __init__(self, url: str, concurrency: int, max_connections: int, http2: bool):
+        self.url = url
+        self.concurrency = concurrency
+        self.max_connections = max_connections
+        self.http2 = http2
+        self.client: Optional[httpx.AsyncClient] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    def start(self) -> None:
+        self.client = httpx.AsyncClient(
+            verify=False,
+            http2=self.http2,
+            timeout=httpx.Timeout(60.0, read=None),
+            limits=httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_connections),
+        )
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+
+    async def stop(self) -> None:
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
+
+    async def upload(self, file: BinaryIO, content_type: str) -> str:
+        """Returns the public url of the uploaded file"""
+        async with self._semaphore:
+            file.seek(0)
+            response = await self.client.post(self.url, files={'file': (str(uuid.uuid4()), file, content_type)})
+            response.raise_for_status()
+            return response.json()["data"]
+
+    async def upload_many(self, files: Sequence[BinaryIO], content_types: Sequence[str]) -> List[str]:
+        """Uploads concurrently, the urls are in the order of `files`"""
+        return await asyncio.gather(*(
+            self.upload(file, content_type) for file, content_type in zip(files, content_types)
+        ))
+
+
+class ImageProcessor:
+    """Runs `make_variants` in a process pool, so decoding and encoding never block the event loop"""
+
+    def __init__(self, workers: int, sizes: Dict[str, int], image_format: str):
+        self.workers = workers
+        self.sizes = sizes
+        self.image_format = image_format
+        self.content_type = f'image/{image_format.lower()}'
+        self.pool: Optional[ProcessPoolExecutor] = None
+
+    def start(self) -> None:
+        self.pool = ProcessPoolExecutor(max_workers=self.workers)
+
+    def stop(self) -> None:
+        if self.pool is not None:
+            self.pool.shutdown(cancel_futures=True)
+            self.pool = None
+
+    async def make_variants(self, path: str) -> Dict[str, bytes]:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.pool, make_variants, path, self.sizes, self.image_format)
+
+
+image_processor = ImageProcessor(
+    workers=settings.IMAGE_WORKERS,
+    sizes={'thumbnail': settings.IMAGE_THUMBNAIL_SIZE, 'medium': settings.IMAGE_MEDIUM_SIZE},
+    image_format=settings.IMAGE_VARIANT_FORMAT
+)
+
+image_uploader = ImageUploader(
+    url=settings.UPLOAD_URL,
+    concurrency=settings.UPLOAD_CONCURRENCY,
+    max_connections=settings.UPLOAD_MAX_CONNECTIONS,
+    http2=settings.UPLOAD_HTTP2
+)
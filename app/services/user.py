@@ -1,5 +1,136 @@
+import asyncio
+import json
+import logging
+from functools import partial
+from typing import Any, Optional, Union
+from uuid import uuid4
+
+from app.database.redis import redis_client
+from app.models.user import UserModel
+from app.utils.cache import TTLCache
 from app.utils.service import BaseService
+from app.utils.unit_of_work import UnitOfWork
+from config import settings
+
+logger = logging.getLogger(__name__)
 
 
 class UserService(BaseService):
-    base_repository: str = 'user'
\ No newline at end of file
+    base_repository: str = 'user'
+
+    # authenticated users by email (the token subject); updates through this service drop the entry
+    # and publish the email on AUTH_CACHE_CHANNEL so every worker drops its own, an invalidation
+    # lost while a worker is not subscribed is bounded by AUTH_CACHE_TTL seconds
+    principal_cache = TTLCache(maxsize=settings.AUTH_CACHE_SIZE, ttl=settings.AUTH_CACHE_TTL)
+    principal_fields = ('id', 'first_name', 'last_name', 'email', 'role')
+    _principal_listener: Optional[asyncio.Task] = None
+
+    @classmethod
+    async def get_principal(
+            cls,
+            uow: UnitOfWork,
+            email: str
+    ) -> Optional[UserModel]:
+        """
+        Returns the user authenticated by a token from the per-worker cache, then Redis
+        if AUTH_CACHE_REDIS is enabled, and only then from the database.
+        The user is detached and has no password, it must not be used to write.
+        """
+        user = cls.principal_cache.get(email)
+        if user is not None:
+            return user
+
+        if settings.AUTH_CACHE_REDIS:
+            cached = await redis_client.get(cls._principal_key(email))
+            if cached is not None:
+                user = UserModel(**json.loads(cached))
+                cls.principal_cache.set(email, user)
+                return user
+
+        user = await cls.get_by_query_one_or_none(uow=uow, email=email)
+        if user is None:
+            return None
+
+        principal = {field: getattr(user, field) for field in cls.principal_fields}
+        user = UserModel(**principal)
+        cls.principal_cache.set(email, user)
+        if settings.AUTH_CACHE_REDIS:
+            await redis_client.set(cls._principal_key(email), json.dumps(principal), ex=settings.AUTH_CACHE_TTL)
+        return user
+
+    @classmethod
+    async def invalidate_principal(cls, *emails: str) -> None:
+        if not emails:
+            return
+        for email in emails:
+            cls.principal_cache.pop(email)
+        if settings.AUTH_CACHE_REDIS:
+            await redis_client.delete(*(cls._principal_key(email) for email in emails))
+        await redis_client.publish(settings.AUTH_CACHE_CHANNEL, json.dumps(emails))
+
+    @classmethod
+    async def listen_principal_invalidations(cls) -> None:
+        """Drops the local principals invalidated by any worker"""
+        while True:
+            pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(settings.AUTH_CACHE_CHANNEL)
+                # invalidations published while this worker was not subscribed are lost
+                cls.principal_cache.clear()
+                async for message in pubsub.listen():
+                    for email in json.loads(message['data']):
+                        cls.principal_cache.pop(email)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception('principal invalidation subscription lost, reconnecting')
+                await asyncio.sleep(1)
+            finally:
+                await pubsub.reset()
+
+    @classmethod
+    def start_principal_listener(cls) -> None:
+        cls._principal_listener = asyncio.create_task(cls.listen_principal_invalidations())
+
+    @classmethod
+    async def stop_principal_listener(cls) -> None:
+        if cls._principal_listener is None:
+            return
+        cls._principal_listener.cancel()
+        try:
+            await cls._principal_listener
+        except asyncio.CancelledError:
+            pass
+        cls._principal_listener = None
+
+    @staticmethod
+    def _principal_key(email: str) -> str:
+        return f'auth:user:{email}'
+
+    @classmethod
+    async def update_one_by_id(
+            cls,
+            uow: UnitOfWork,
+            _id: Union[int, str, uuid4],
+            **values
+    ) -> Any:
+        async with uow:
+            old_user = await cls.get_by_query_one_or_none(uow=uow, id=_id) if 'email' in values else None
+            # the update refreshes the same identity-mapped instance, so read the old email first
+            old_email = old_user.email if old_user else None
+            user = await super().update_one_by_id(uow=uow, _id=_id, **values)
+            if user is not None:
+                # once committed, a worker reloading the principal before that would cache the old one again
+                uow.after_commit(partial(cls.invalidate_principal, *{user.email, old_email or user.email}))
+            return user
+
+    @classmethod
+    async def delete_by_query(
+            cls,
+            uow: UnitOfWork,
+            **kwargs
+    ) -> None:
+        async with uow:
+            users = await cls.get_by_query_all(uow=uow, **kwargs)
+            await super().delete_by_query(uow=uow, **kwargs)
+            uow.after_commit(partial(cls.invalidate_principal, *(user.email for user in users)))
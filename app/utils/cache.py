@@ -0,0 +1,121 @@
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Set, Tuple
+
+
+class TTLCache:
+    """
+    A small in-process LRU cache whose entries expire `ttl` seconds after they were set.
+
+    params:
+        - maxsize: number of entries kept, the least recently used one is evicted first
+        - ttl: lifetime of an entry in seconds
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Any, Tuple[float, Any]]" = OrderedDict()
+
+    def get(self, key: Any, default: Any = None) -> Any:
+        item = self._data.get(key)
+        if item is None:
+            return default
+        expires_at, value = item
+        if expires_at < time.monotonic():
+            del self._data[key]
+            return default
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: Any, value: Any) -> None:
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key: Any) -> None:
+        self._data.pop(key, None)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+
+class SizedLRUCache:
+    """
+    An in-process LRU cache of byte strings bounded by entry count and total size.
+
+    Entries expire `ttl` seconds after they were set and carry tags, `drop_tags` removes
+    every entry carrying any of the given tags.
+
+    params:
+        - maxsize: number of entries kept
+        - maxbytes: total length of the values kept, a value larger than that is not cached
+        - ttl: lifetime of an entry in seconds
+    """
+
+    def __init__(self, maxsize: int, maxbytes: int, ttl: float):
+        self.maxsize = maxsize
+        self.maxbytes = maxbytes
+        self.ttl = ttl
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data: "OrderedDict[Any, Tuple[float, bytes, Tuple[str, ...]]]" = OrderedDict()
+        self._tags: Dict[str, Set[Any]] = {}
+
+    def get(self, key: Any) -> Any:
+        item = self._data.get(key)
+        if item is None or item[0] < time.monotonic():
+            if item is not None:
+                self._remove(key)
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return item[1]
+
+    def set(self, key: Any, value: bytes, tags: Iterable[str] = ()) -> None:
+        if len(value) > self.maxbytes:
+            return
+        self._remove(key)
+        tags = tuple(set(tags))
+        self._data[key] = (time.monotonic() + self.ttl, value, tags)
+        self.bytes += len(value)
+        for tag in tags:
+            self._tags.setdefault(tag, set()).add(key)
+        while len(self._data) > self.maxsize or self.bytes > self.maxbytes:
+            self._remove(next(iter(self._data)))
+            self.evictions += 1
+
+    def drop_tags(self, tags: Iterable[str]) -> None:
+        for tag in tags:
+            for key in list(self._tags.get(tag, ())):
+                self._remove(key)
+
+    def clear(self) -> None:
+        self._data.clear()
+        self._tags.clear()
+        self.bytes = 0
+
+    def metrics(self) -> Dict[str, int]:
+        return {
+            "entries": len(self._data),
+            "bytes": self.bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+    def _remove(self, key: Any) -> None:
+        item = self._data.pop(key, None)
+        if item is None:
+            return
+        self.bytes -= len(item[1])
+        for tag in item[2]:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
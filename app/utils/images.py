@@ -0,0 +1,33 @@
+import io
+from typing import Dict
+
+from PIL import Image, ImageOps
+
+
+def make_variants(path: str, sizes: Dict[str, int], image_format: str) -> Dict[str, bytes]:
+    """
+    Encodes downscaled copies of the image file, each fitting in a `size` x `size` box.
+    CPU bound, meant to run in a process pool, so it takes a path instead of the image data
+    and returns plain bytes.
+
+    raises: PIL.UnidentifiedImageError, PIL.Image.DecompressionBombError, OSError
+
+    params:
+        - sizes: variant name -> longest side in pixels
+        - image_format: 'WEBP' or 'JPEG'
+    """
+    with Image.open(path) as original:
+        image = ImageOps.exif_transpose(original)
+        if image_format == 'JPEG' and image.mode != 'RGB':
+            image = image.convert('RGB')
+        elif image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA')
+
+        variants = {}
+        for name, size in sizes.items():
+            variant = image.copy()
+            variant.thumbnail((size, size), Image.Resampling.LANCZOS)
+            buffer = io.BytesIO()
+            variant.save(buffer, format=image_format, quality=80)
+            variants[name] = buffer.getvalue()
+        return variants
@@ -0,0 +1,51 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, List, Sequence
+
+
+class InvalidCursorError(ValueError):
+    """Raised when a pagination cursor is malformed or belongs to another sort order"""
+
+
+def _dump_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {'dt': value.isoformat()}
+    return value
+
+
+def _load_value(value: Any) -> Any:
+    if isinstance(value, dict):
+        return datetime.fromisoformat(value['dt'])
+    return value
+
+
+def encode_cursor(sort: str, values: Sequence[Any]) -> str:
+    """
+    Builds an opaque keyset cursor from the sort key values of the last row on a page.
+
+    params:
+        - sort: name of the sort order the cursor is valid for
+        - values: values of the sort key columns, in order
+    """
+    payload = {'s': sort, 'v': [_dump_value(value) for value in values]}
+    raw = json.dumps(payload, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str, sort: str, size: int) -> List[Any]:
+    """
+    Returns the sort key values stored in a cursor built by `encode_cursor`.
+
+    params:
+        - cursor: the opaque token received from the client
+        - sort: name of the sort order the client is paginating
+        - size: number of columns in the sort key
+    """
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        if payload['s'] != sort or len(payload['v']) != size:
+            raise InvalidCursorError(cursor)
+        return [_load_value(value) for value in payload['v']]
+    except (ValueError, TypeError, KeyError):
+        raise InvalidCursorError(cursor)
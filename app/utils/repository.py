@@ -1,9 +1,10 @@
 from abc import ABC, abstractmethod
-from typing import Dict, Sequence, Union, Type, Any
+from typing import Dict, Optional, Sequence, Union, Type, Any
 from uuid import uuid4
 from sqlalchemy.orm import joinedload
 
-from sqlalchemy import insert, select, update, delete
+from sqlalchemy import Select, insert, literal, select, tuple_, update, delete
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.engine import Result
 from sqlalchemy.ext.asyncio import AsyncSession
 
@@ -44,6 +45,14 @@ class SqlAlchemyRepository(AbstractRepository):
     """
     A basic repository that implements basic CRUD functions with a base table using the SqlAlchemy library
 
+    The `get_by_query_*` methods accept `options`: loader options such as `selectinload(...)`
+    that decide which relationships are loaded, since models do not load them implicitly.
+    The paginated ones also accept `filters`: SQL expressions added to the `filter_by` keywords.
+    The `*_many` methods take a list of row dicts and write them all in a single round trip.
+    The `get_*` methods accept `mappings`: read only the table columns with a Core query and return
+    `RowMapping` rows instead of ORM instances, skipping the identity map and loader options.
+    Meant for read-only paths that feed the rows straight into response models.
+
     params:
         - model: SQLAlchemy DeclarativeBase child class
     """
@@ -67,25 +76,122 @@ class SqlAlchemyRepository(AbstractRepository):
         _obj: Result = await self.session.execute(query)
         return _obj.unique().scalar_one()
 
-    async def get_by_query_one_or_none(self, **kwargs) -> Type[model]: # type: ignore
-        query = select(self.model).filter_by(**kwargs)
+    async def add_many(self, values: Sequence[Dict[str, Any]], returning: bool = False) -> Sequence[Type[model]]: # type: ignore
+        """Inserts all rows with one batched statement, returns the created rows if `returning`"""
+        if not values:
+            return []
+        query = insert(self.model)
+        if returning:
+            res: Result = await self.session.execute(query.returning(self.model), values)
+            return res.scalars().all()
+        await self.session.execute(query, values)
+        return []
+
+    async def upsert_many(
+            self,
+            values: Sequence[Dict[str, Any]],
+            index_elements: Sequence[str],
+            set_: Sequence[str] = (),
+            returning: bool = False
+    ) -> Sequence[Type[model]]: # type: ignore
+        """
+        INSERT ... ON CONFLICT: rows clashing on the unique `index_elements` get their `set_` columns
+        overwritten with the new values, or are skipped when `set_` is empty.
+        Skipped rows are not returned.
+        """
+        if not values:
+            return []
+        query = pg_insert(self.model).values(list(values))
+        if set_:
+            query = query.on_conflict_do_update(
+                index_elements=index_elements,
+                set_={name: query.excluded[name] for name in set_}
+            )
+        else:
+            query = query.on_conflict_do_nothing(index_elements=index_elements)
+        if returning:
+            res: Result = await self.session.execute(query.returning(self.model))
+            return res.scalars().all()
+        await self.session.execute(query)
+        return []
+
+    def _select(self, options: Sequence[Any] = (), mappings: bool = False) -> Select:
+        if mappings:
+            return select(*self.model.__table__.columns)
+        return select(self.model).options(*options)
+
+    @staticmethod
+    def _all(res: Result, mappings: bool = False) -> Sequence[Any]:
+        return res.mappings().all() if mappings else res.unique().scalars().all()
+
+    async def get_by_query_one_or_none(self, options: Sequence[Any] = (), mappings: bool = False, **kwargs) -> Type[model]: # type: ignore
+        query = self._select(options, mappings).filter_by(**kwargs)
         res: Result = await self.session.execute(query)
-        return res.unique().scalar_one_or_none()
+        return res.mappings().one_or_none() if mappings else res.unique().scalar_one_or_none()
 
-    async def get_by_query_all(self, **kwargs) -> Sequence[Type[model]]: # type: ignore
-        query = select(self.model).filter_by(**kwargs)
+    async def get_by_query_all(self, options: Sequence[Any] = (), mappings: bool = False, **kwargs) -> Sequence[Type[model]]: # type: ignore
+        query = self._select(options, mappings).filter_by(**kwargs)
         res: Result = await self.session.execute(query)
-        return res.unique().scalars().all()
+        return self._all(res, mappings)
     
-    async def get_by_query_with_limit(self, limit: int, offset: int = 0, **kwargs) -> Sequence[Type[model]]: # type: ignore
+    async def get_by_ids(self, ids: Sequence[Any], options: Sequence[Any] = (), mappings: bool = False) -> Sequence[Type[model]]: # type: ignore
+        query = self._select(options, mappings).filter(self.model.id.in_(ids))
+        res: Result = await self.session.execute(query)
+        return self._all(res, mappings)
+
+    async def get_by_query_with_limit(
+            self,
+            limit: int,
+            offset: int = 0,
+            options: Sequence[Any] = (),
+            filters: Sequence[Any] = (),
+            mappings: bool = False,
+            **kwargs
+    ) -> Sequence[Type[model]]: # type: ignore
         query = (
-            select(self.model)
+            self._select(options, mappings)
             .filter_by(**kwargs)
+            .filter(*filters)
             .limit(limit)
             .offset(offset)
         )
         res: Result = await self.session.execute(query)
-        return res.unique().scalars().all()
+        return self._all(res, mappings)
+
+    async def get_by_query_with_cursor(
+            self,
+            limit: int,
+            order_by: Sequence[str],
+            descending: bool = False,
+            after: Optional[Sequence[Any]] = None,
+            options: Sequence[Any] = (),
+            filters: Sequence[Any] = (),
+            mappings: bool = False,
+            **kwargs
+    ) -> Sequence[Type[model]]: # type: ignore
+        """
+        Keyset pagination: returns up to `limit` rows ordered by the `order_by` columns
+        that come strictly after the `after` values, so the cost does not grow with the page depth.
+        The last column of `order_by` must be unique (usually `id`).
+        """
+        columns = [getattr(self.model, name) for name in order_by]
+        query = self._select(options, mappings).filter_by(**kwargs).filter(*filters)
+
+        if after is not None:
+            key = tuple_(*columns)
+            boundary = tuple_(*(
+                literal(value, column.type)
+                for column, value in zip(columns, after)
+            ))
+            query = query.filter(key < boundary if descending else key > boundary)
+
+        query = (
+            query
+            .order_by(*(column.desc() if descending else column.asc() for column in columns))
+            .limit(limit)
+        )
+        res: Result = await self.session.execute(query)
+        return self._all(res, mappings)
 
     async def update_one_by_id(self, _id: int, **values) -> Type[model]: # type: ignore
  
@@ -94,10 +200,20 @@ class SqlAlchemyRepository(AbstractRepository):
         _obj: Result | None = await self.session.execute(query)
         return _obj.unique().scalar_one_or_none()
 
+    async def update_many_by_id(self, values: Sequence[Dict[str, Any]]) -> None:
+        """Updates rows by primary key with one executemany, every dict must contain `id`"""
+        if not values:
+            return
+        await self.session.execute(update(self.model), values)
+
     async def delete_by_query(self, **kwargs) -> None:
         query = delete(self.model).filter_by(**kwargs)
         await self.session.execute(query)
 
+    async def delete_by_ids(self, ids: Sequence[Any]) -> None:
+        query = delete(self.model).filter(self.model.id.in_(ids))
+        await self.session.execute(query)
+
     async def delete_all(self) -> None:
         query = delete(self.model)
         await self.session.execute(query)
\ No newline at end of file
@@ -0,0 +1,408 @@
+import asyncio
+import gzip
+import hashlib
+import inspect
+import logging
+import math
+import random
+import time
+import uuid
+from functools import wraps
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional, Tuple
+from urllib.parse import urlencode
+
+import orjson
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+from starlette.requests import Request
+from starlette.responses import Response
+
+from app.database.redis import redis_client
+from app.database.replicas import replica_router
+from app.utils.cache import SizedLRUCache
+from app.utils.unit_of_work import UnitOfWork
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+TagsBuilder = Callable[[Any, Dict[str, Any]], Iterable[str]]
+
+
+def no_tags(result: Any, kwargs: Dict[str, Any]) -> Iterable[str]:
+    return ()
+
+
+class ResponseCache:
+    """
+    Caches GET endpoint results in Redis and invalidates them by tag.
+
+    Every entry is tagged by the endpoint, e.g. with the ids of the products it shows.
+    `invalidate(*tags)` drops all entries carrying any of the tags, so entries can live for hours
+    and are still purged as soon as the data they show changes.
+
+    Each invalidation bumps a generation counter and stamps the tags it purged with it and the Redis time.
+    A result is only stored if none of its tags was purged since the computation started, otherwise it may
+    already be stale and is returned without being stored. Entries are filled from the endpoint's own kind of
+    unit of work, a read replica for the catalog, which can be up to `staleness` seconds behind the primary:
+    a result is not stored either if one of its tags was purged less than `staleness` seconds before the
+    computation started, as the replica may not have replayed the change yet. Such entries are recomputed
+    by every request until the window passes. The stamps are kept `purge_window` seconds, longer than
+    any computation plus `staleness`.
+
+    Every worker also keeps the entries it served in `local`, an in-process LRU checked before Redis.
+    `invalidate` publishes the tags on `channel` and each worker drops its local entries carrying them.
+    The local tier is only used while the worker is subscribed, and is emptied on every (re)subscription
+    since messages published while disconnected are lost.
+
+    Expiry never makes every request recompute an entry at once:
+        - a missing entry is computed by one request per worker, the others await it, and by one worker
+          at a time, the others poll Redis while the `{entry}:lock` key is held (up to `lock_wait` seconds)
+        - an entry stays in Redis `stale_ttl` seconds after it expired and is served while one request
+          refreshes it in the background
+        - an entry is refreshed early with a probability growing as its expiry nears and with the time it
+          took to compute (`beta` scales it, 0 disables early refreshes)
+
+    Entries are computed in a task of their own, which can outlive the request that started it: the endpoint
+    is called with that request's arguments but a new unit of work of the same type, as the request's one
+    is closed with it.
+
+    Entries hold the encoded response body, served back verbatim without validating or encoding it again.
+    Bodies of at least `gzip_min_size` bytes are also stored gzipped for clients accepting it.
+    """
+
+    purge_window: int = 3600
+
+    def __init__(
+        self,
+        prefix: str,
+        default_expire: int,
+        channel: str,
+        local: SizedLRUCache,
+        stale_ttl: int,
+        lock_timeout: float,
+        lock_wait: float,
+        beta: float,
+        gzip_min_size: int,
+        staleness: float,
+    ):
+        self.prefix = prefix
+        self.default_expire = default_expire
+        self.generation_key = f'{prefix}:generation'
+        self.channel = channel
+        self.local = local
+        self.stale_ttl = stale_ttl
+        self.lock_timeout = lock_timeout
+        self.lock_wait = lock_wait
+        self.beta = beta
+        self.gzip_min_size = gzip_min_size
+        self.staleness = staleness
+        self._adapters: Dict[Any, TypeAdapter] = {}
+        # bumped whenever local entries are dropped, an entry read before a drop is not kept locally
+        self._local_generation = 0
+        self._listening = False
+        self._subscriber: Optional[asyncio.Task] = None
+        # entries being computed by this worker, for a request or as a background refresh
+        self._filling: Dict[str, asyncio.Task] = {}
+        self._refreshing: Dict[str, asyncio.Task] = {}
+        self.coalesced = 0
+        self.lock_waits = 0
+        self.stale_refreshes = 0
+        self.early_refreshes = 0
+        # KEYS: entry, tag sets, tag stamps (one per tag set);
+        # ARGV: generation seen before computing, value, ttl, seconds before now a purge makes the value stale
+        self._store = redis_client.register_script("""
+            local tags = (#KEYS - 1) / 2
+            local time = redis.call('time')
+            local since = time[1] + time[2] / 1000000 - tonumber(ARGV[4])
+            for i = 2 + tags, #KEYS do
+                local generation, purged_at = unpack(redis.call('hmget', KEYS[i], 'generation', 'at'))
+                if tonumber(generation or '0') > tonumber(ARGV[1]) or tonumber(purged_at or '0') > since then
+                    return 0
+                end
+            end
+            redis.call('set', KEYS[1], ARGV[2], 'EX', ARGV[3])
+            for i = 2, 1 + tags do
+                redis.call('sadd', KEYS[i], KEYS[1])
+                if redis.call('ttl', KEYS[i]) < tonumber(ARGV[3]) then
+                    redis.call('expire', KEYS[i], ARGV[3])
+                end
+            end
+            return 1
+        """)
+        # KEYS: generation, tag sets, tag stamps (one per tag set); ARGV: purge window
+        self._purge = redis_client.register_script("""
+            local generation = redis.call('incr', KEYS[1])
+            local time = redis.call('time')
+            local tags = (#KEYS - 1) / 2
+            for i = 2 + tags, #KEYS do
+                redis.call('hset', KEYS[i], 'generation', generation, 'at', time[1] + time[2] / 1000000)
+                redis.call('expire', KEYS[i], ARGV[1])
+            end
+            local entries = redis.call('sunion', unpack(KEYS, 2, 1 + tags))
+            for i = 1, #entries, 1000 do
+                redis.call('del', unpack(entries, i, math.min(i + 999, #entries)))
+            end
+            redis.call('del', unpack(KEYS, 2, 1 + tags))
+            return #entries
+        """)
+        # KEYS: lock; ARGV: token of the holder
+        self._unlock = redis_client.register_script("""
+            if redis.call('get', KEYS[1]) == ARGV[1] then
+                return redis.call('del', KEYS[1])
+            end
+            return 0
+        """)
+
+    def entry_key(self, func: Callable[..., Any], request: Request) -> str:
+        query = urlencode(sorted(request.query_params.multi_items()))
+        digest = hashlib.md5(f"{func.__module__}:{func.__name__}:{request.url.path}?{query}".encode()).hexdigest()
+        return f'{self.prefix}:entry:{digest}'
+
+    def tag_key(self, tag: str) -> str:
+        return f'{self.prefix}:tag:{tag}'
+
+    def tag_generation_key(self, tag: str) -> str:
+        return f'{self.prefix}:purged:{tag}'
+
+    def encode(self, request: Request, result: Any) -> bytes:
+        """Serializes the result the way the route's `response_model` would, ORM objects included"""
+        model = getattr(request.scope.get('route'), 'response_model', None)
+        if model is None:
+            return orjson.dumps(jsonable_encoder(result))
+        adapter = self._adapters.get(model)
+        if adapter is None:
+            adapter = self._adapters[model] = TypeAdapter(model)
+        return adapter.dump_json(adapter.validate_python(result, from_attributes=True))
+
+    def pack(self, tags: Iterable[str], fresh_until: float, delta: float, body: bytes) -> bytes:
+        """
+        An entry is a JSON header line followed by the body and its gzipped copy, if any. The header holds
+        the tags, so a worker reading the entry can tag its local copy, the expiry, the time the body took
+        to compute and its size.
+        """
+        header = {'tags': list(tags), 'fresh_until': fresh_until, 'delta': delta, 'size': len(body)}
+        compressed = gzip.compress(body, mtime=0) if self.gzip_min_size and len(body) >= self.gzip_min_size else b''
+        return orjson.dumps(header) + b'\n' + body + compressed
+
+    @staticmethod
+    def unpack(entry: bytes) -> Tuple[Dict[str, Any], bytes]:
+        header, payload = entry.split(b'\n', 1)
+        return orjson.loads(header), payload
+
+    @staticmethod
+    def respond(request: Request, header: Dict[str, Any], payload: bytes) -> Response:
+        size = header['size']
+        if len(payload) == size:
+            return Response(payload, media_type='application/json')
+        if 'gzip' in request.headers.get('accept-encoding', ''):
+            return Response(
+                payload[size:], media_type='application/json',
+                headers={'Content-Encoding': 'gzip', 'Vary': 'Accept-Encoding'}
+            )
+        return Response(payload[:size], media_type='application/json', headers={'Vary': 'Accept-Encoding'})
+
+    def should_refresh(self, header: Dict[str, Any]) -> bool:
+        """True once the entry expired, or earlier at random (XFetch)"""
+        now = time.time()
+        if now >= header['fresh_until']:
+            self.stale_refreshes += 1
+            return True
+        if self.beta and now - header['delta'] * self.beta * math.log(1.0 - random.random()) >= header['fresh_until']:
+            self.early_refreshes += 1
+            return True
+        return False
+
+    async def invalidate(self, *tags: str) -> None:
+        if not tags:
+            return
+        tags = tuple(set(tags))
+        await self._purge(
+            keys=[self.generation_key, *map(self.tag_key, tags), *map(self.tag_generation_key, tags)],
+            args=[self.purge_window]
+        )
+        self.drop_local(tags)
+        await redis_client.publish(self.channel, orjson.dumps(tags))
+
+    def drop_local(self, tags: Optional[Iterable[str]] = None) -> None:
+        """Drops the local entries carrying any of the tags, or all of them"""
+        self._local_generation += 1
+        if tags is None:
+            self.local.clear()
+        else:
+            self.local.drop_tags(tags)
+
+    def remember(self, key: str, entry: bytes, tags: Iterable[str], local_generation: int) -> None:
+        if self._listening and local_generation == self._local_generation:
+            self.local.set(key, entry, tags)
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            **self.local.metrics(),
+            "subscribed": self._listening,
+            "coalesced": self.coalesced,
+            "lock_waits": self.lock_waits,
+            "stale_refreshes": self.stale_refreshes,
+            "early_refreshes": self.early_refreshes,
+        }
+
+    def start(self) -> None:
+        self._subscriber = asyncio.create_task(self._subscribe())
+
+    async def stop(self) -> None:
+        refreshes = list(self._refreshing.values())
+        for task in refreshes:
+            task.cancel()
+        await asyncio.gather(*refreshes, return_exceptions=True)
+        if self._subscriber is None:
+            return
+        self._subscriber.cancel()
+        try:
+            await self._subscriber
+        except asyncio.CancelledError:
+            pass
+        self._subscriber = None
+
+    async def _subscribe(self) -> None:
+        while True:
+            pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(self.channel)
+                self.drop_local()
+                self._listening = True
+                async for message in pubsub.listen():
+                    self.drop_local(orjson.loads(message['data']))
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception('response cache subscription lost, reconnecting')
+                await asyncio.sleep(1)
+            finally:
+                self._listening = False
+                self.drop_local()
+                await pubsub.reset()
+
+    async def _fill(
+        self, key: str, load: Callable[[float], Awaitable[bytes]], fresh_after: float, wait: bool
+    ) -> Optional[bytes]:
+        """
+        Runs `load` under the Redis lock of the entry and returns the entry. Without the lock, a refresh
+        gives up and returns None, a request polls Redis until the holder stored the entry, then loads
+        it itself if it did not.
+        """
+        lock_key, token = f'{key}:lock', uuid.uuid4().hex
+        locked = await redis_client.set(lock_key, token, nx=True, px=int(self.lock_timeout * 1000))
+        if not locked:
+            if not wait:
+                return None
+            self.lock_waits += 1
+            deadline = time.monotonic() + self.lock_wait
+            while time.monotonic() < deadline:
+                await asyncio.sleep(min(0.05, self.lock_wait))
+                local_generation = self._local_generation
+                cached, held = await redis_client.mget(key, lock_key)
+                if cached is not None:
+                    header, _ = self.unpack(cached)
+                    if header['fresh_until'] > fresh_after:
+                        self.remember(key, cached, header['tags'], local_generation)
+                        return cached
+                if held is None:
+                    break
+        try:
+            return await load(fresh_after)
+        finally:
+            if locked:
+                await self._unlock(keys=[lock_key], args=[token])
+
+    def _single_flight(self, tasks: Dict[str, asyncio.Task], key: str, coroutine: Awaitable[Any]) -> asyncio.Task:
+        task = tasks[key] = asyncio.ensure_future(coroutine)
+        task.add_done_callback(lambda _: tasks.pop(key, None))
+        return task
+
+    def __call__(self, expire: Optional[int] = None, tags: TagsBuilder = no_tags) -> Callable:
+        """
+        Decorates a GET endpoint, placed below the route decorator.
+
+        params:
+            - expire: lifetime of the entries in seconds, defaults to RESPONSE_CACHE_TTL
+            - tags: builds the tags of an entry from the endpoint result and its keyword arguments
+        """
+        def decorator(func: Callable[..., Any]) -> Callable[..., Any]:
+            signature = inspect.signature(func)
+            # the request is needed to build the key, FastAPI passes it to a parameter annotated with Request
+            request_param = inspect.Parameter('_cache_request', inspect.Parameter.KEYWORD_ONLY, annotation=Request)
+
+            @wraps(func)
+            async def wrapper(*args: Any, _cache_request: Request, **kwargs: Any) -> Any:
+                if _cache_request.method != 'GET':
+                    return await func(*args, **kwargs)
+
+                key = self.entry_key(func, _cache_request)
+
+                async def load(fresh_after: float) -> bytes:
+                    """Computes and stores the entry, unless an entry fresher than `fresh_after` was stored meanwhile"""
+                    local_generation = self._local_generation
+                    cached, generation = await redis_client.mget(key, self.generation_key)
+                    if cached is not None:
+                        header, _ = self.unpack(cached)
+                        if header['fresh_until'] > fresh_after:
+                            self.remember(key, cached, header['tags'], local_generation)
+                            return cached
+
+                    started = time.monotonic()
+                    result = await func(*args, **{
+                        name: type(value)() if isinstance(value, UnitOfWork) else value for name, value in kwargs.items()
+                    })
+                    ttl = expire or self.default_expire
+                    entry_tags = set(tags(result, kwargs))
+                    delta = time.monotonic() - started
+                    entry = self.pack(entry_tags, time.time() + ttl, delta, self.encode(_cache_request, result))
+                    stored = await self._store(
+                        keys=[key, *map(self.tag_key, entry_tags), *map(self.tag_generation_key, entry_tags)],
+                        args=[generation or b'0', entry, ttl + self.stale_ttl, delta + self.staleness],
+                    )
+                    if stored:
+                        self.remember(key, entry, entry_tags, local_generation)
+                    return entry
+
+                local_generation = self._local_generation
+                cached = self.local.get(key) if self._listening else None
+                if cached is not None:
+                    header, payload = self.unpack(cached)
+                elif (cached := await redis_client.get(key)) is not None:
+                    header, payload = self.unpack(cached)
+                    self.remember(key, cached, header['tags'], local_generation)
+                if cached is not None:
+                    if key not in self._refreshing and self.should_refresh(header):
+                        self._single_flight(self._refreshing, key, self._fill(key, load, header['fresh_until'], wait=False))
+                    return self.respond(_cache_request, header, payload)
+
+                task = self._filling.get(key)
+                if task is None:
+                    task = self._single_flight(self._filling, key, self._fill(key, load, 0, wait=True))
+                else:
+                    self.coalesced += 1
+                # shielded, a client going away does not cancel the requests awaiting the same entry
+                return self.respond(_cache_request, *self.unpack(await asyncio.shield(task)))
+
+            wrapper.__signature__ = signature.replace(parameters=[*signature.parameters.values(), request_param])
+            return wrapper
+
+        return decorator
+
+
+response_cache = ResponseCache(
+    prefix='response-cache',
+    default_expire=settings.RESPONSE_CACHE_TTL,
+    channel=settings.RESPONSE_CACHE_CHANNEL,
+    local=SizedLRUCache(
+        maxsize=settings.RESPONSE_CACHE_LOCAL_SIZE,
+        maxbytes=settings.RESPONSE_CACHE_LOCAL_BYTES,
+        ttl=settings.RESPONSE_CACHE_LOCAL_TTL
+    ),
+    stale_ttl=settings.RESPONSE_CACHE_STALE_TTL,
+    lock_timeout=settings.RESPONSE_CACHE_LOCK_TIMEOUT,
+    lock_wait=settings.RESPONSE_CACHE_LOCK_WAIT,
+    beta=settings.RESPONSE_CACHE_EARLY_REFRESH_BETA,
+    gzip_min_size=settings.RESPONSE_CACHE_GZIP_MIN_SIZE,
+    staleness=replica_router.max_staleness
+)
@@ -1,4 +1,4 @@
-from typing import Optional, Union, Any, Sequence
+from typing import Dict, Optional, Union, Any, Sequence
 from uuid import uuid4
 
 from app.utils.unit_of_work import UnitOfWork
@@ -21,7 +21,7 @@ class BaseService:
             **kwargs
     ) -> None:
         async with uow:
-            await uow.__dict__[cls.base_repository].add_one(**kwargs)
+            await getattr(uow, cls.base_repository).add_one(**kwargs)
 
     @classmethod
     async def add_one_and_get_id(
@@ -30,7 +30,7 @@ class BaseService:
             **kwargs
     ) -> Union[int, str]:
         async with uow:
-            _id = await uow.__dict__[cls.base_repository].add_one_and_get_id(**kwargs)
+            _id = await getattr(uow, cls.base_repository).add_one_and_get_id(**kwargs)
             return _id
 
     @classmethod
@@ -40,38 +40,95 @@ class BaseService:
             **kwargs
     ) -> Any:
         async with uow:
-            _obj = await uow.__dict__[cls.base_repository].add_one_and_get_obj(**kwargs)
+            _obj = await getattr(uow, cls.base_repository).add_one_and_get_obj(**kwargs)
             return _obj
 
+    @classmethod
+    async def add_many(
+            cls,
+            uow: UnitOfWork,
+            values: Sequence[Dict[str, Any]],
+            returning: bool = False
+    ) -> Sequence[Any]:
+        async with uow:
+            _result = await getattr(uow, cls.base_repository).add_many(values, returning)
+            return _result
+
+    @classmethod
+    async def upsert_many(
+            cls,
+            uow: UnitOfWork,
+            values: Sequence[Dict[str, Any]],
+            index_elements: Sequence[str],
+            set_: Sequence[str] = (),
+            returning: bool = False
+    ) -> Sequence[Any]:
+        async with uow:
+            _result = await getattr(uow, cls.base_repository).upsert_many(values, index_elements, set_, returning)
+            return _result
+
     @classmethod
     async def get_by_query_one_or_none(
             cls,
             uow: UnitOfWork,
+            options: Sequence[Any] = (),
             **kwargs
     ) -> Optional[Any]:
         async with uow:
-            _result = await uow.__dict__[cls.base_repository].get_by_query_one_or_none(**kwargs)
+            _result = await getattr(uow, cls.base_repository).get_by_query_one_or_none(options=options, **kwargs)
             return _result
         
     @classmethod
     async def get_by_query_all(
             cls,
             uow: UnitOfWork,
+            options: Sequence[Any] = (),
             **kwargs
     ) -> Sequence[Any]:
         async with uow:
-            _result = await uow.__dict__[cls.base_repository].get_by_query_all(**kwargs)
+            _result = await getattr(uow, cls.base_repository).get_by_query_all(options=options, **kwargs)
+            return _result
+    @classmethod
+    async def get_by_ids(
+            cls,
+            uow: UnitOfWork,
+            ids: Sequence[Union[int, str, uuid4]],
+            options: Sequence[Any] = (),
+            mappings: bool = False
+    ) -> Sequence[Any]:
+        async with uow:
+            _result = await getattr(uow, cls.base_repository).get_by_ids(ids, options, mappings)
             return _result
+
     @classmethod
     async def get_by_query_with_limit(
             cls,
             uow: UnitOfWork,
             limit: int,
             offset: int = 0,
+            options: Sequence[Any] = (),
+            filters: Sequence[Any] = (),
             **kwargs
     ) -> Sequence[Any]:
         async with uow:
-            _result = await uow.__dict__[cls.base_repository].get_by_query_with_limit(limit, offset, **kwargs)
+            _result = await getattr(uow, cls.base_repository).get_by_query_with_limit(limit, offset, options, filters, **kwargs)
+            return _result
+    @classmethod
+    async def get_by_query_with_cursor(
+            cls,
+            uow: UnitOfWork,
+            limit: int,
+            order_by: Sequence[str],
+            descending: bool = False,
+            after: Optional[Sequence[Any]] = None,
+            options: Sequence[Any] = (),
+            filters: Sequence[Any] = (),
+            **kwargs
+    ) -> Sequence[Any]:
+        async with uow:
+            _result = await getattr(uow, cls.base_repository).get_by_query_with_cursor(
+                limit, order_by, descending, after, options, filters, **kwargs
+            )
             return _result
     @classmethod
     async def update_one_by_id(
@@ -81,9 +138,18 @@ class BaseService:
             **values
     ) -> Any:
         async with uow:
-            _obj = await uow.__dict__[cls.base_repository].update_one_by_id(_id=_id, **values)
+            _obj = await getattr(uow, cls.base_repository).update_one_by_id(_id=_id, **values)
             return _obj
 
+    @classmethod
+    async def update_many_by_id(
+            cls,
+            uow: UnitOfWork,
+            values: Sequence[Dict[str, Any]]
+    ) -> None:
+        async with uow:
+            await getattr(uow, cls.base_repository).update_many_by_id(values)
+
     @classmethod
     async def delete_by_query(
             cls,
@@ -91,7 +157,16 @@ class BaseService:
             **kwargs
     ) -> None:
         async with uow:
-            await uow.__dict__[cls.base_repository].delete_by_query(**kwargs)
+            await getattr(uow, cls.base_repository).delete_by_query(**kwargs)
+
+    @classmethod
+    async def delete_by_ids(
+            cls,
+            uow: UnitOfWork,
+            ids: Sequence[Union[int, str, uuid4]]
+    ) -> None:
+        async with uow:
+            await getattr(uow, cls.base_repository).delete_by_ids(ids)
 
     @classmethod
     async def delete_all(
@@ -99,4 +174,4 @@ class BaseService:
             uow: UnitOfWork,
     ) -> None:
         async with uow:
-            await uow.__dict__[cls.base_repository].delete_all()
\ No newline at end of file
+            await getattr(uow, cls.base_repository).delete_all()
\ No newline at end of file
@@ -1,15 +1,22 @@
+import logging
 from abc import ABC, abstractmethod
+from typing import AsyncIterator, Awaitable, Callable, List
 
 from app.database.db import async_session_maker
+from app.database.replicas import replica_router
 from app.repositories.category import CategoryRepository
 from app.repositories.inventory import InventoryRepository
 from app.repositories.user import UserRepository
 from app.repositories.product import ProductRepository
+from app.repositories.product_card import ProductCardRepository
 from app.repositories.image import ImageRepository
 from app.repositories.attribute import AttributeRepository
 from app.repositories.cart import CartRepository
 from app.repositories.order import OrderRepository
 from app.repositories.order_item import OrderItemRepository
+from app.repositories.mail_outbox import MailOutboxRepository
+
+logger = logging.getLogger(__name__)
 
 
 class AbstractUnitOfWork(ABC):
@@ -37,32 +44,103 @@ class AbstractUnitOfWork(ABC):
 
 
 class UnitOfWork(AbstractUnitOfWork):
-    """The class responsible for the atomicity of transactions"""
+    """
+    The class responsible for the atomicity of transactions.
+
+    The outermost `async with` opens a session and commits it on exit. Nested blocks reuse that
+    session and transaction and neither commit nor close it, an exception leaving any block rolls
+    the whole transaction back. Requests get their unit of work from `get_uow`, so a request runs
+    in one session and one transaction committed after the endpoint returns. Changes that must only be made
+    visible outside the database once the transaction is (cache purges) are registered with `after_commit`.
+    Code about to await slow work that needs no database (password hashing, image uploads) calls `commit`,
+    so the connection goes back to the pool instead of idling in a transaction. The next statement starts
+    a new transaction.
+
+    Repositories are created on first access, once per session.
+    """
+
+    repositories = {
+        'user': UserRepository,
+        'category': CategoryRepository,
+        'product': ProductRepository,
+        'product_card': ProductCardRepository,
+        'image': ImageRepository,
+        'inventory': InventoryRepository,
+        'attribute': AttributeRepository,
+        'cart': CartRepository,
+        'order': OrderRepository,
+        'order_item': OrderItemRepository,
+        'mail_outbox': MailOutboxRepository,
+    }
 
     def __init__(self):
         self.session_factory = async_session_maker
+        self.session = None
+        self._depth = 0
+        self._after_commit: List[Callable[[], Awaitable[None]]] = []
+
+    def __getattr__(self, name):
+        repository = self.repositories.get(name)
+        if repository is None or self.session is None:
+            raise AttributeError(name)
+        self.__dict__[name] = repository(self.session)
+        return self.__dict__[name]
 
     async def __aenter__(self):
-        self.session = self.session_factory()
-        self.user = UserRepository(self.session)
-        self.category = CategoryRepository(self.session)
-        self.product = ProductRepository(self.session)
-        self.image = ImageRepository(self.session)
-        self.inventory = InventoryRepository(self.session)
-        self.attribute = AttributeRepository(self.session)
-        self.cart = CartRepository(self.session)
-        self.order = OrderRepository(self.session)
-        self.order_item = OrderItemRepository(self.session)
+        if self._depth == 0:
+            self.session = self.session_factory()
+            self._after_commit = []
+            for name in self.repositories:
+                self.__dict__.pop(name, None)
+        self._depth += 1
+        return self
 
     async def __aexit__(self, exc_type, *args):
-        if not exc_type:
-            await self.commit()
-        else:
+        self._depth -= 1
+        if exc_type:
             await self.rollback()
-        await self.session.close()
+        elif self._depth == 0:
+            await self.commit()
+        if self._depth == 0:
+            await self.session.close()
+
+    def after_commit(self, callback: Callable[[], Awaitable[None]]) -> None:
+        """Awaits `callback` once the current transaction commits, it is dropped if the transaction rolls back"""
+        self._after_commit.append(callback)
 
     async def commit(self):
         await self.session.commit()
+        callbacks, self._after_commit = self._after_commit, []
+        for callback in callbacks:
+            try:
+                await callback()
+            except Exception:
+                # the transaction is committed, a failed purge must not turn the request into an error
+                logger.exception('after-commit callback failed')
 
     async def rollback(self):
-        await self.session.rollback()
\ No newline at end of file
+        self._after_commit = []
+        await self.session.rollback()
+
+
+class ReadOnlyUnitOfWork(UnitOfWork):
+    """
+    A unit of work on a read replica, see `replica_router`. Replicas lag slightly behind the primary:
+    only for reads that need not see a write made just before, such as the catalog. Writes stay on `UnitOfWork`.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.session_factory = replica_router.session
+
+
+async def get_uow() -> AsyncIterator[UnitOfWork]:
+    """Request-scoped unit of work, FastAPI shares it between the endpoint and its dependencies"""
+    async with UnitOfWork() as uow:
+        yield uow
+
+
+async def get_read_uow() -> AsyncIterator[UnitOfWork]:
+    """Request-scoped `ReadOnlyUnitOfWork`"""
+    async with ReadOnlyUnitOfWork() as uow:
+        yield uow
@@ -10,6 +10,8 @@ from app.models.models import InventoryModel
 from app.models.models import CategoryModel
 from app.models.models import ImageModel
 from app.models.models import ProductModel
+from app.models.models import ProductCardModel
+from app.models.models import MailOutboxModel
 from app.database.db import Base
 
 
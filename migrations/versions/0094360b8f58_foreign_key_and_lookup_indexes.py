@@ -0,0 +1,42 @@
+"""foreign key and lookup indexes
+
+Revision ID: 0094360b8f58
+Revises: 4f001d6e3fd7
+Create Date: 2026-10-18 13:05:19.673420
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0094360b8f58'
+down_revision: Union[str, None] = '4f001d6e3fd7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# CREATE INDEX CONCURRENTLY does not lock writes but cannot run inside a transaction,
+# hence the autocommit blocks. A failed build leaves an INVALID index that must be dropped before retrying.
+INDEXES = [
+    ('ix_cart_user_id_product_id', 'cart', ['user_id', 'product_id']),
+    ('ix_order_user_id', 'order', ['user_id']),
+    ('ix_order_item_order_id', 'order_item', ['order_id']),
+    ('ix_image_product_id', 'image', ['product_id']),
+    ('ix_product_category_id', 'product', ['category_id']),
+    ('ix_user_email', 'user', ['email']),
+]
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.create_index(name, table, columns, unique=False, postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)
@@ -0,0 +1,33 @@
+"""image variants
+
+Revision ID: 3c9f5e1a7b20
+Revises: d57a0e93b1c4
+Create Date: 2026-10-18 16:12:09.735104
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3c9f5e1a7b20'
+down_revision: Union[str, None] = 'd57a0e93b1c4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('image', sa.Column('content_hash', sa.String(length=64), nullable=True))
+    op.add_column('image', sa.Column('thumbnail_url', sa.String(), nullable=True))
+    op.add_column('image', sa.Column('medium_url', sa.String(), nullable=True))
+    with op.get_context().autocommit_block():
+        op.create_index(op.f('ix_image_content_hash'), 'image', ['content_hash'], unique=False, postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_image_content_hash'), table_name='image')
+    op.drop_column('image', 'medium_url')
+    op.drop_column('image', 'thumbnail_url')
+    op.drop_column('image', 'content_hash')
@@ -0,0 +1,37 @@
+"""attribute facet indexes
+
+Revision ID: 4f001d6e3fd7
+Revises: dbb64a9e007d
+Create Date: 2026-10-18 12:26:51.804113
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4f001d6e3fd7'
+down_revision: Union[str, None] = 'dbb64a9e007d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# built concurrently so writes to `attribute` are not locked out, see 0094360b8f58
+INDEXES = [
+    ('ix_attribute_name_value_product_id', 'attribute', ['name', 'value', 'product_id']),
+    ('ix_attribute_product_id_name_value', 'attribute', ['product_id', 'name', 'value']),
+]
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.create_index(name, table, columns, unique=False, postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)
@@ -0,0 +1,71 @@
+"""product card
+
+Revision ID: 9a25204ee9e9
+Revises: fc32f397427e
+Create Date: 2026-10-18 11:03:27.540917
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9a25204ee9e9'
+down_revision: Union[str, None] = 'fc32f397427e'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('product_card',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(), nullable=False),
+    sa.Column('category_id', sa.Integer(), nullable=False),
+    sa.Column('description', sa.String(), nullable=False),
+    sa.Column('price', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('inventory', postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+    sa.Column('images', postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+    sa.Column('attributes', postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+    sa.ForeignKeyConstraint(['id'], ['product.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_product_card_created_at_id', 'product_card', ['created_at', 'id'], unique=False)
+    op.create_index('ix_product_card_price_id', 'product_card', ['price', 'id'], unique=False)
+    op.create_index('ix_product_card_category_id_created_at_id', 'product_card', ['category_id', 'created_at', 'id'], unique=False)
+    op.create_index('ix_product_card_category_id_price_id', 'product_card', ['category_id', 'price', 'id'], unique=False)
+
+    # the catalog is served from product_card now, the keyset indexes moved there
+    op.drop_index('ix_product_category_id_price_id', table_name='product')
+    op.drop_index('ix_product_category_id_created_at_id', table_name='product')
+    op.drop_index('ix_product_price_id', table_name='product')
+    op.drop_index('ix_product_created_at_id', table_name='product')
+
+    op.execute("""
+        INSERT INTO product_card (id, name, category_id, description, price, created_at, updated_at, inventory, images, attributes)
+        SELECT
+            p.id, p.name, p.category_id, p.description, p.price, p.created_at, p.updated_at,
+            (SELECT jsonb_build_object('quantity', i.quantity) FROM inventory i WHERE i.product_id = p.id),
+            (SELECT coalesce(jsonb_agg(jsonb_build_object('id', im.id, 'url', im.url) ORDER BY im.id), '[]'::jsonb)
+             FROM image im WHERE im.product_id = p.id),
+            (SELECT coalesce(jsonb_agg(jsonb_build_object('id', a.id, 'name', a.name, 'value', a.value) ORDER BY a.id), '[]'::jsonb)
+             FROM attribute a WHERE a.product_id = p.id)
+        FROM product p
+    """)
+
+
+def downgrade() -> None:
+    op.create_index('ix_product_created_at_id', 'product', ['created_at', 'id'], unique=False)
+    op.create_index('ix_product_price_id', 'product', ['price', 'id'], unique=False)
+    op.create_index('ix_product_category_id_created_at_id', 'product', ['category_id', 'created_at', 'id'], unique=False)
+    op.create_index('ix_product_category_id_price_id', 'product', ['category_id', 'price', 'id'], unique=False)
+
+    op.drop_index('ix_product_card_category_id_price_id', table_name='product_card')
+    op.drop_index('ix_product_card_category_id_created_at_id', table_name='product_card')
+    op.drop_index('ix_product_card_price_id', table_name='product_card')
+    op.drop_index('ix_product_card_created_at_id', table_name='product_card')
+    op.drop_table('product_card')
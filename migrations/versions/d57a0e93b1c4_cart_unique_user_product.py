@@ -0,0 +1,45 @@
+"""cart unique user product
+
+Revision ID: d57a0e93b1c4
+Revises: 6b2e81c4d3a7
+Create Date: 2026-10-18 15:02:44.185390
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd57a0e93b1c4'
+down_revision: Union[str, None] = '6b2e81c4d3a7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # merge the duplicate lines left by the old read-then-insert into the oldest one
+    op.execute("""
+        UPDATE cart SET quantity = d.quantity
+        FROM (
+            SELECT min(id) AS id, sum(quantity) AS quantity
+            FROM cart GROUP BY user_id, product_id HAVING count(*) > 1
+        ) AS d
+        WHERE cart.id = d.id
+    """)
+    op.execute("""
+        DELETE FROM cart USING cart AS keep
+        WHERE cart.user_id = keep.user_id AND cart.product_id = keep.product_id AND cart.id > keep.id
+    """)
+
+    # the unique index is built without blocking writes, then turned into the constraint
+    with op.get_context().autocommit_block():
+        op.create_index('uq_cart_user_id_product_id', 'cart', ['user_id', 'product_id'], unique=True, postgresql_concurrently=True)
+    op.execute('ALTER TABLE cart ADD CONSTRAINT uq_cart_user_id_product_id UNIQUE USING INDEX uq_cart_user_id_product_id')
+    op.drop_index('ix_cart_user_id_product_id', table_name='cart')
+
+
+def downgrade() -> None:
+    op.create_index('ix_cart_user_id_product_id', 'cart', ['user_id', 'product_id'], unique=False)
+    op.drop_constraint('uq_cart_user_id_product_id', 'cart', type_='unique')
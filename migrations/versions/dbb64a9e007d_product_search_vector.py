@@ -0,0 +1,73 @@
+"""product search vector
+
+Revision ID: dbb64a9e007d
+Revises: 9a25204ee9e9
+Create Date: 2026-10-18 11:47:05.112804
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'dbb64a9e007d'
+down_revision: Union[str, None] = '9a25204ee9e9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# A generated column would rewrite `product` under an ACCESS EXCLUSIVE lock. Instead the column is added
+# nullable (a catalog-only change), kept up to date by a trigger, backfilled in committed batches
+# and indexed concurrently, so reads and writes go on during the migration.
+SEARCH_VECTOR = "setweight(to_tsvector('english', {0}name), 'A') || setweight(to_tsvector('english', {0}description), 'B')"
+BACKFILL_BATCH = 5000
+
+
+def upgrade() -> None:
+    op.add_column('product', sa.Column('search_vector', postgresql.TSVECTOR(), nullable=True))
+    op.execute(f"""
+        CREATE FUNCTION product_search_vector() RETURNS trigger AS $$
+        BEGIN
+            NEW.search_vector := {SEARCH_VECTOR.format('NEW.')};
+            RETURN NEW;
+        END
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER product_search_vector BEFORE INSERT OR UPDATE OF name, description ON product
+        FOR EACH ROW EXECUTE FUNCTION product_search_vector()
+    """)
+
+    with op.get_context().autocommit_block():
+        # rows written from now on are filled by the trigger, the existing ones have an id up to the current max
+        op.execute(f"""
+            DO $$
+            DECLARE
+                last_id integer := 0;
+                max_id integer;
+            BEGIN
+                SELECT coalesce(max(id), 0) INTO max_id FROM product;
+                WHILE last_id < max_id LOOP
+                    UPDATE product SET search_vector = {SEARCH_VECTOR.format('')}
+                    WHERE id > last_id AND id <= last_id + {BACKFILL_BATCH} AND search_vector IS NULL;
+                    last_id := last_id + {BACKFILL_BATCH};
+                    COMMIT;
+                END LOOP;
+            END
+            $$
+        """)
+        op.create_index(
+            'ix_product_search_vector', 'product', ['search_vector'],
+            unique=False, postgresql_using='gin', postgresql_concurrently=True
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_product_search_vector', table_name='product', postgresql_concurrently=True)
+    op.execute('DROP TRIGGER product_search_vector ON product')
+    op.execute('DROP FUNCTION product_search_vector()')
+    op.drop_column('product', 'search_vector')
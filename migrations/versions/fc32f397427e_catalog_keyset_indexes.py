@@ -0,0 +1,39 @@
+"""catalog keyset indexes
+
+Revision ID: fc32f397427e
+Revises: a119548d055b
+Create Date: 2026-10-18 10:12:41.318204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'fc32f397427e'
+down_revision: Union[str, None] = 'a119548d055b'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# built concurrently so the product table keeps taking writes, see 0094360b8f58 for the caveats
+INDEXES = [
+    ('ix_product_created_at_id', 'product', ['created_at', 'id']),
+    ('ix_product_price_id', 'product', ['price', 'id']),
+    ('ix_product_category_id_created_at_id', 'product', ['category_id', 'created_at', 'id']),
+    ('ix_product_category_id_price_id', 'product', ['category_id', 'price', 'id']),
+]
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.create_index(name, table, columns, unique=False, postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)
@@ -0,0 +1,92 @@
+"""
+Before/after benchmarks of the performance work, skipped unless TEST_DB_URL is set like the database tests.
+Run them on their own to read the figures, `pytest tests/benchmarks`: every test prints one line
+per variant, e.g. the wall time per run and the statements it sent.
+
+The "before" variants replay the code that was replaced, written with today's services. Timings depend
+on the machine, so the assertions only check what does not: statement counts, allocations, blocking.
+"""
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import pytest
+from sqlalchemy import event
+
+
+@pytest.fixture(autouse=True)
+def requires_database():
+    if not os.environ.get('TEST_DB_URL'):
+        pytest.skip('TEST_DB_URL is not set')
+
+
+class Report:
+    """Collects the figures of one benchmark, printed when it ends"""
+
+    def __init__(self):
+        self.lines: List[Dict[str, Any]] = []
+
+    def add(self, label: str, **figures: Any) -> Dict[str, Any]:
+        self.lines.append({'label': label, **figures})
+        return self.lines[-1]
+
+    def format(self, title: str) -> str:
+        lines = [f'\n{title}']
+        for line in self.lines:
+            figures = ', '.join(
+                f'{name} {value:.3f}' if isinstance(value, float) else f'{name} {value}'
+                for name, value in line.items() if name != 'label'
+            )
+            lines.append(f'  {line["label"]:<40} {figures}')
+        return '\n'.join(lines)
+
+
+@pytest.fixture
+def report(request, capsys):
+    report = Report()
+    yield report
+    with capsys.disabled():
+        print(report.format(request.node.name))
+
+
+class Bench:
+    """
+    Times async runs and counts the statements they send on the test connection. The savepoints
+    standing in for the BEGIN and COMMIT of each unit of work are not counted.
+    """
+
+    def __init__(self, report: Report):
+        self.report = report
+        self.statements = 0
+
+    def count(self, connection: Any, cursor: Any, statement: str, *args: Any) -> None:
+        if not statement.lstrip().upper().startswith(('SAVEPOINT', 'RELEASE SAVEPOINT', 'ROLLBACK TO SAVEPOINT')):
+            self.statements += 1
+
+    async def measure(
+            self,
+            label: str,
+            run: Callable[[], Awaitable[Any]],
+            rounds: int = 20,
+            setup: Optional[Callable[[], Awaitable[Any]]] = None
+    ) -> Dict[str, Any]:
+        """Awaits `run` `rounds` times, `setup` before each round is neither timed nor counted"""
+        elapsed, statements = 0.0, 0
+        for _ in range(rounds):
+            if setup is not None:
+                await setup()
+            before = self.statements
+            started = time.perf_counter()
+            await run()
+            elapsed += time.perf_counter() - started
+            statements += self.statements - before
+        return self.report.add(label, ms=elapsed / rounds * 1000, statements=statements / rounds)
+
+
+@pytest.fixture
+def bench(db_session, report):
+    bench = Bench(report)
+    connection = db_session.bind.sync_connection
+    event.listen(connection, 'before_cursor_execute', bench.count)
+    yield bench
+    event.remove(connection, 'before_cursor_execute', bench.count)
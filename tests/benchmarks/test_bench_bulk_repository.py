@@ -0,0 +1,126 @@
+import pytest
+from sqlalchemy import delete, select
+
+from app.models.models import AttributeModel, CategoryModel, InventoryModel, ProductModel
+
+ROWS = 500
+
+
+@pytest.fixture
+async def product_ids(db_session, uow):
+    category = CategoryModel(name='Shoes')
+    db_session.add(category)
+    await db_session.commit()
+    async with uow:
+        products = await uow.product.add_many([
+            {'name': f'Running shoe {i}', 'description': 'A light running shoe. ' * 4, 'category_id': category.id, 'price': 100}
+            for i in range(ROWS)
+        ], returning=True)
+    return [product.id for product in products]
+
+
+def attributes(product_ids, value='red'):
+    return [{'product_id': product_id, 'name': 'color', 'value': value} for product_id in product_ids]
+
+
+@pytest.fixture
+def reset(db_session, uow, product_ids):
+    """Setups of the rounds: no attributes, or one per product"""
+    async def clear():
+        await db_session.execute(delete(AttributeModel))
+        await db_session.execute(delete(InventoryModel))
+        await db_session.commit()
+
+    async def fill():
+        await clear()
+        async with uow:
+            await uow.attribute.add_many(attributes(product_ids))
+
+    return clear, fill
+
+
+async def attribute_ids(db_session):
+    return (await db_session.scalars(select(AttributeModel.id).order_by(AttributeModel.id))).all()
+
+
+async def test_insert(uow, bench, product_ids, reset):
+    clear, _ = reset
+
+    async def one_by_one():
+        async with uow:
+            for values in attributes(product_ids):
+                await uow.attribute.add_one(**values)
+
+    async def batched():
+        async with uow:
+            await uow.attribute.add_many(attributes(product_ids))
+
+    before = await bench.measure(f'add_one x {ROWS}', one_by_one, rounds=3, setup=clear)
+    after = await bench.measure(f'add_many of {ROWS}', batched, rounds=3, setup=clear)
+    assert before['statements'] == ROWS
+    assert after['statements'] <= 2
+
+
+async def test_update(db_session, uow, bench, product_ids, reset):
+    _, fill = reset
+
+    async def one_by_one():
+        async with uow:
+            for _id in await attribute_ids(db_session):
+                await uow.attribute.update_one_by_id(_id=_id, value='blue')
+
+    async def batched():
+        async with uow:
+            await uow.attribute.update_many_by_id([{'id': _id, 'value': 'blue'} for _id in await attribute_ids(db_session)])
+
+    before = await bench.measure(f'update_one_by_id x {ROWS}', one_by_one, rounds=3, setup=fill)
+    after = await bench.measure(f'update_many_by_id of {ROWS}', batched, rounds=3, setup=fill)
+    # both read the ids first
+    assert before['statements'] == ROWS + 1
+    assert after['statements'] <= 3
+
+
+async def test_upsert(db_session, uow, bench, product_ids, reset):
+    clear, _ = reset
+    stock = [{'product_id': product_id, 'quantity': 5} for product_id in product_ids]
+
+    async def half_stocked():
+        await clear()
+        async with uow:
+            await uow.inventory.add_many(stock[::2])
+
+    async def one_by_one():
+        async with uow:
+            for values in stock:
+                existing = await uow.inventory.get_by_query_one_or_none(product_id=values['product_id'])
+                if existing is None:
+                    await uow.inventory.add_one(**values)
+                else:
+                    await uow.inventory.update_one_by_id(_id=existing.id, quantity=values['quantity'])
+
+    async def batched():
+        async with uow:
+            await uow.inventory.upsert_many(stock, index_elements=['product_id'], set_=['quantity'])
+
+    before = await bench.measure(f'look up, then insert or update x {ROWS}', one_by_one, rounds=3, setup=half_stocked)
+    after = await bench.measure(f'upsert_many of {ROWS}', batched, rounds=3, setup=half_stocked)
+    assert before['statements'] == 2 * ROWS
+    assert after['statements'] == 1
+
+
+async def test_delete(db_session, uow, bench, product_ids, reset):
+    _, fill = reset
+
+    async def one_by_one():
+        async with uow:
+            for _id in await attribute_ids(db_session):
+                await uow.attribute.delete_by_query(id=_id)
+
+    async def batched():
+        async with uow:
+            await uow.attribute.delete_by_ids(await attribute_ids(db_session))
+
+    before = await bench.measure(f'delete_by_query x {ROWS}', one_by_one, rounds=3, setup=fill)
+    after = await bench.measure(f'delete_by_ids of {ROWS}', batched, rounds=3, setup=fill)
+    assert before['statements'] == ROWS + 1
+    assert after['statements'] == 2
@@ -0,0 +1,93 @@
+from datetime import timedelta
+
+import pytest
+from sqlalchemy import func, update
+from sqlalchemy.orm import joinedload
+
+from app.models.models import CartModel, CategoryModel, InventoryModel, MailOutboxModel, OrderStatus, ProductModel
+from app.services.cart import CartService
+from app.services.inventory import InventoryService
+from app.services.mail_outbox import MailOutboxService
+from app.services.order import OrderService
+from app.services.order_item import OrderItemService
+
+DELIVERY = dict(phone_number='+10000000000', country='UK', city='London', address='221B Baker Street')
+
+
+@pytest.fixture
+async def stocked(db_session):
+    """20 products with plenty of stock"""
+    category = CategoryModel(name='Shoes')
+    db_session.add(category)
+    await db_session.flush()
+    products = [
+        ProductModel(name=f'Running shoe {i}', description='A light running shoe. ' * 4, category_id=category.id, price=100 + i)
+        for i in range(20)
+    ]
+    db_session.add_all(products)
+    await db_session.flush()
+    db_session.add_all([InventoryModel(product_id=product.id, quantity=1_000_000) for product in products])
+    await db_session.commit()
+    return products
+
+
+async def place_order_per_line(uow, user_id):
+    """The checkout before the set-based `place_order`: a statement or two per cart line"""
+    async with uow:
+        lines = await CartService.get_by_query_all(
+            uow=uow, user_id=user_id, options=[joinedload(CartModel.product).joinedload(ProductModel.inventory)]
+        )
+        for line in lines:
+            assert line.product.inventory.quantity >= line.quantity
+        order_id = await OrderService.add_one_and_get_id(
+            uow=uow, status=OrderStatus.pending, user_id=user_id, total_amount=0, **DELIVERY
+        )
+        total = 0
+        for line in lines:
+            await OrderItemService.add_one(
+                uow=uow, order_id=order_id, product_id=line.product_id, quantity=line.quantity, price=line.product.price
+            )
+            total += line.quantity * line.product.price
+            await InventoryService.update_one_by_id(
+                uow=uow, _id=line.product.inventory.id, quantity=line.product.inventory.quantity - line.quantity
+            )
+        await CartService.delete_by_query(uow=uow, user_id=user_id)
+        await OrderService.update_one_by_id(uow=uow, _id=order_id, total_amount=total)
+
+
+@pytest.mark.parametrize('lines', [5, 20])
+async def test_order_placement(db_session, uow, user, stocked, bench, lines):
+    async def fill_cart():
+        db_session.add_all([CartModel(user_id=user.id, product_id=product.id, quantity=2) for product in stocked[:lines]])
+        await db_session.commit()
+
+    before = await bench.measure(f'per line, {lines} lines', lambda: place_order_per_line(uow, user.id), setup=fill_cart)
+    after = await bench.measure(
+        f'place_order, {lines} lines', lambda: OrderService.place_order(uow=uow, user_id=user.id, **DELIVERY), setup=fill_cart
+    )
+
+    # lock the lines, reserve the stock, insert the order, its items, delete the lines: whatever the size of the cart
+    assert after['statements'] == 5
+    assert before['statements'] >= 2 * lines
+
+
+async def test_outbox_leasing(db_session, uow, bench):
+    emails = 500
+    db_session.add_all([MailOutboxModel(recipient=f'user{i}@example.com', payload={}) for i in range(emails)])
+    await db_session.commit()
+
+    async def make_due():
+        await db_session.execute(update(MailOutboxModel).values(next_attempt_at=func.now() - timedelta(seconds=1)))
+        await db_session.commit()
+
+    async def claim(batch_size):
+        claimed = 0
+        for _ in range(emails // batch_size):
+            claimed += len(await MailOutboxService.claim_batch(uow=uow, limit=batch_size, lease_seconds=60))
+        assert claimed == emails
+
+    await bench.measure('one email per claim', lambda: claim(1), rounds=3, setup=make_due)
+    batched = await bench.measure('batches of 100', lambda: claim(100), rounds=3, setup=make_due)
+    bench.report.add('emails per second, batches of 100', rate=emails / batched['ms'] * 1000)
+
+    assert batched['statements'] == emails // 100
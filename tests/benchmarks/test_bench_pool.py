@@ -0,0 +1,108 @@
+import asyncio
+import os
+import time
+
+import pytest
+from sqlalchemy import text
+
+from app.database import db
+from app.database.db import build_engine
+from app.services.security import PasswordHasher, pwd_context
+
+QUERIES = 500
+TASKS = 100
+HASHES = 8
+
+
+@pytest.fixture
+async def engine_with(monkeypatch):
+    """Builds engines from TEST_DB_URL the way `db.py` does, with some settings changed"""
+    engines = []
+
+    def build(**overrides):
+        for name, value in overrides.items():
+            monkeypatch.setattr(db.settings, name, value)
+        engines.append(build_engine(os.environ['TEST_DB_URL']))
+        return engines[-1]
+
+    yield build
+    for engine in engines:
+        await engine.dispose()
+
+
+async def test_statement_cache_modes(engine_with, report):
+    query = text('SELECT id, name, price FROM product WHERE price > :price ORDER BY id LIMIT 10')
+
+    async def run(engine, label):
+        async with engine.connect() as connection:
+            await connection.execute(query, {'price': 0})
+            started = time.perf_counter()
+            for i in range(QUERIES):
+                await connection.execute(query, {'price': i})
+            elapsed = time.perf_counter() - started
+            prepared = await connection.scalar(text('SELECT count(*) FROM pg_prepared_statements'))
+        return report.add(label, ms_per_query=elapsed / QUERIES * 1000, prepared=prepared)
+
+    direct = await run(engine_with(DB_STATEMENT_CACHE_MODE='direct'), 'direct, statements cached')
+    await run(engine_with(DB_STATEMENT_CACHE_MODE='pgbouncer'), 'pgbouncer, prepared every time')
+    assert direct['prepared'] >= 1
+
+
+async def test_pool_size_under_concurrency(engine_with, report):
+    async def run(engine, label):
+        async def one():
+            async with engine.connect() as connection:
+                await connection.execute(text('SELECT pg_sleep(0.01)'))
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(TASKS)))
+        metrics = engine.pool.metrics()
+        report.add(
+            label, ms=(time.perf_counter() - started) * 1000,
+            avg_wait_ms=metrics['avg_wait_ms'], max_wait_ms=metrics['max_wait_ms']
+        )
+        return metrics
+
+    small = await run(engine_with(DB_POOL_SIZE=2, DB_MAX_OVERFLOW=0), f'{TASKS} tasks, 2 connections')
+    large = await run(engine_with(DB_POOL_SIZE=20, DB_MAX_OVERFLOW=0), f'{TASKS} tasks, 20 connections')
+    for metrics in (small, large):
+        assert metrics['checkouts'] == TASKS
+        assert metrics['timeouts'] == 0
+    assert large['avg_wait_ms'] < small['avg_wait_ms']
+
+
+async def test_password_hashing_and_the_event_loop(report):
+    """A ticker stands in for the other requests: the longest gap between its ticks is how long they stalled"""
+    async def run(hash_password, label):
+        stall = 0.0
+        done = asyncio.Event()
+
+        async def ticker():
+            nonlocal stall
+            last = time.perf_counter()
+            while not done.is_set():
+                await asyncio.sleep(0.001)
+                now = time.perf_counter()
+                stall = max(stall, now - last)
+                last = now
+
+        ticking = asyncio.ensure_future(ticker())
+        await asyncio.sleep(0.01)
+        started = time.perf_counter()
+        await asyncio.gather(*(hash_password(f'correct horse {i}') for i in range(HASHES)))
+        elapsed = time.perf_counter() - started
+        done.set()
+        await ticking
+        return report.add(label, hashes_per_s=HASHES / elapsed, max_stall_ms=stall * 1000)
+
+    async def on_the_loop(password):
+        return pwd_context.hash(password)
+
+    hasher = PasswordHasher(workers=4, max_waiting=HASHES)
+    try:
+        before = await run(on_the_loop, 'bcrypt on the event loop')
+        after = await run(lambda password: hasher.run(pwd_context.hash, password), 'PasswordHasher, 4 threads')
+    finally:
+        hasher.executor.shutdown(wait=True)
+    assert hasher.metrics()['completed'] == HASHES
+    assert after['max_stall_ms'] < before['max_stall_ms']
@@ -0,0 +1,88 @@
+import asyncio
+import json
+import time
+from typing import List
+
+import httpx
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse
+
+from app.database.redis import redis_client
+from app.schemas.product import ProductSchemaInDB
+from app.utils.cache import SizedLRUCache
+from app.utils.response_cache import ResponseCache
+
+REQUESTS = 300
+
+PAGE = [
+    {
+        'id': i, 'name': f'Running shoe {i}', 'category_id': 1, 'description': 'A light running shoe. ' * 4, 'price': 100 + i,
+        'created_at': '2026-10-18T10:00:00+00:00', 'updated_at': '2026-10-18T10:00:00+00:00',
+        'images': [{'id': i, 'url': f'https://cdn.example.com/{i}.png', 'thumbnail_url': None, 'medium_url': None}],
+        'inventory': {'quantity': 5},
+        'attributes': [{'id': i, 'name': 'color', 'value': 'red'}],
+    }
+    for i in range(100)
+]
+
+
+@pytest.fixture
+async def cache():
+    cache = ResponseCache(
+        prefix='bench-cache', default_expire=600, channel='bench-cache:invalidations',
+        local=SizedLRUCache(maxsize=100, maxbytes=1 << 24, ttl=600),
+        stale_ttl=60, lock_timeout=5, lock_wait=1, beta=0, gzip_min_size=0, staleness=0,
+    )
+    yield cache
+    await cache.stop()
+
+
+@pytest.fixture
+def calls():
+    return []
+
+
+@pytest.fixture
+def client(cache, calls):
+    app = FastAPI()
+
+    @app.get('/before', response_model=List[ProductSchemaInDB], response_class=JSONResponse)
+    async def before():
+        """The cache before: the result stored as JSON, decoded on a hit then validated and encoded again"""
+        return json.loads(await redis_client.get('bench-cache:before'))
+
+    @app.get('/after', response_model=List[ProductSchemaInDB])
+    @cache()
+    async def after():
+        calls.append(True)
+        return PAGE
+
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url='http://bench')
+
+
+async def requests_per_second(client, path):
+    started = time.perf_counter()
+    for _ in range(REQUESTS):
+        response = await client.get(path)
+    return REQUESTS / (time.perf_counter() - started), response
+
+
+async def test_cache_hits(cache, client, calls, report):
+    await redis_client.set('bench-cache:before', json.dumps(PAGE))
+    await client.get('/after')
+
+    before_rate, before = await requests_per_second(client, '/before')
+    report.add('hit decoded, validated and encoded', rps=before_rate)
+    redis_rate, after = await requests_per_second(client, '/after')
+    report.add('hit served as stored bytes, from Redis', rps=redis_rate)
+
+    cache.start()
+    while not cache._listening:
+        await asyncio.sleep(0.01)
+    await client.get('/after')
+    local_rate, _ = await requests_per_second(client, '/after')
+    report.add('hit served as stored bytes, in process', rps=local_rate)
+
+    assert after.json() == before.json()
+    assert len(calls) == 1
@@ -0,0 +1,60 @@
+from sqlalchemy import select
+
+from app.models.models import InventoryModel
+
+
+async def quantities(db_session):
+    rows = await db_session.execute(select(InventoryModel.product_id, InventoryModel.quantity))
+    return dict(rows.tuples().all())
+
+
+async def test_add_many_returns_the_created_rows(uow, products):
+    async with uow:
+        attributes = await uow.attribute.add_many([
+            {'product_id': products[0].id, 'name': 'color', 'value': 'red'},
+            {'product_id': products[1].id, 'name': 'color', 'value': 'blue'},
+        ], returning=True)
+    assert [(attribute.product_id, attribute.value) for attribute in attributes] == [
+        (products[0].id, 'red'), (products[1].id, 'blue')
+    ]
+    assert all(attribute.id is not None for attribute in attributes)
+
+
+async def test_add_many_without_rows(uow):
+    async with uow:
+        assert await uow.attribute.add_many([], returning=True) == []
+
+
+async def test_upsert_many_overwrites_the_given_columns(db_session, uow, products):
+    async with uow:
+        await uow.inventory.add_many([{'product_id': products[0].id, 'quantity': 1}])
+        upserted = await uow.inventory.upsert_many(
+            [{'product_id': product.id, 'quantity': 7} for product in products],
+            index_elements=['product_id'], set_=['quantity'], returning=True
+        )
+    assert len(upserted) == 2
+    assert await quantities(db_session) == {products[0].id: 7, products[1].id: 7}
+
+
+async def test_upsert_many_skips_conflicts_without_set(db_session, uow, products):
+    async with uow:
+        await uow.inventory.add_many([{'product_id': products[0].id, 'quantity': 1}])
+        inserted = await uow.inventory.upsert_many(
+            [{'product_id': product.id, 'quantity': 7} for product in products],
+            index_elements=['product_id'], returning=True
+        )
+    assert [row.product_id for row in inserted] == [products[1].id]
+    assert await quantities(db_session) == {products[0].id: 1, products[1].id: 7}
+
+
+async def test_update_many_and_delete_by_ids(db_session, uow, products):
+    async with uow:
+        rows = await uow.inventory.add_many(
+            [{'product_id': product.id, 'quantity': 1} for product in products], returning=True
+        )
+        await uow.inventory.update_many_by_id([{'id': row.id, 'quantity': 10 + i} for i, row in enumerate(rows)])
+    assert await quantities(db_session) == {products[0].id: 10, products[1].id: 11}
+
+    async with uow:
+        await uow.inventory.delete_by_ids([rows[0].id])
+    assert await quantities(db_session) == {products[1].id: 11}
@@ -0,0 +1,70 @@
+import time
+
+from app.utils.cache import SizedLRUCache, TTLCache
+
+
+def test_ttl_cache_expires(monkeypatch):
+    cache = TTLCache(maxsize=10, ttl=30)
+    cache.set('a', 1)
+    assert cache.get('a') == 1
+    now = time.monotonic()
+    monkeypatch.setattr(time, 'monotonic', lambda: now + 31)
+    assert cache.get('a') is None
+
+
+def test_ttl_cache_evicts_least_recently_used():
+    cache = TTLCache(maxsize=2, ttl=30)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.get('a')
+    cache.set('c', 3)
+    assert cache.get('a') == 1 and cache.get('b') is None and cache.get('c') == 3
+
+
+def test_sized_lru_is_bounded_by_bytes():
+    cache = SizedLRUCache(maxsize=10, maxbytes=10, ttl=30)
+    cache.set('a', b'12345')
+    cache.set('b', b'12345')
+    cache.set('c', b'123')
+    assert cache.get('a') is None
+    assert cache.get('b') == b'12345' and cache.get('c') == b'123'
+    assert cache.metrics()['bytes'] == 8
+    assert cache.metrics()['evictions'] == 1
+
+
+def test_sized_lru_skips_values_larger_than_the_cache():
+    cache = SizedLRUCache(maxsize=10, maxbytes=4, ttl=30)
+    cache.set('a', b'12345')
+    assert cache.get('a') is None
+    assert cache.metrics()['bytes'] == 0
+
+
+def test_sized_lru_replacing_a_key_keeps_the_size_right():
+    cache = SizedLRUCache(maxsize=10, maxbytes=100, ttl=30)
+    cache.set('a', b'12345', tags=['x'])
+    cache.set('a', b'12', tags=['y'])
+    assert cache.metrics()['bytes'] == 2
+    cache.drop_tags(['x'])
+    assert cache.get('a') == b'12'
+
+
+def test_sized_lru_drops_by_tag():
+    cache = SizedLRUCache(maxsize=10, maxbytes=100, ttl=30)
+    cache.set('a', b'1', tags=['product:1', 'catalog'])
+    cache.set('b', b'2', tags=['product:2', 'catalog'])
+    cache.set('c', b'3', tags=['product:2'])
+    cache.drop_tags(['product:1'])
+    assert cache.get('a') is None and cache.get('b') == b'2'
+    cache.drop_tags(['product:2'])
+    assert cache.metrics()['entries'] == 0 and cache.metrics()['bytes'] == 0
+
+
+def test_sized_lru_counts_hits_and_misses(monkeypatch):
+    cache = SizedLRUCache(maxsize=10, maxbytes=100, ttl=30)
+    cache.set('a', b'1')
+    cache.get('a')
+    cache.get('b')
+    now = time.monotonic()
+    monkeypatch.setattr(time, 'monotonic', lambda: now + 31)
+    cache.get('a')
+    assert cache.metrics() == {'entries': 0, 'bytes': 0, 'hits': 1, 'misses': 2, 'evictions': 0}
@@ -0,0 +1,38 @@
+from types import SimpleNamespace
+
+from app.services.category import CategoryTree
+
+
+def category(id, parent_id=None):
+    return SimpleNamespace(id=id, parent_id=parent_id)
+
+
+# 1 ── 2 ── 4
+#  └── 3
+# 5
+tree = CategoryTree([category(1), category(2, 1), category(3, 1), category(4, 2), category(5)])
+
+
+def test_roots():
+    assert [root.id for root in tree.roots()] == [1, 5]
+
+
+def test_subtree_includes_the_category_and_all_descendants():
+    assert sorted(tree.subtree_ids(1)) == [1, 2, 3, 4]
+    assert tree.subtree_ids(4) == [4]
+
+
+def test_ancestors_go_up_to_the_root():
+    assert tree.ancestor_ids(4) == [4, 2, 1]
+    assert tree.ancestor_ids(5) == [5]
+
+
+def test_unknown_category():
+    assert tree.subtree_ids(99) == [99]
+    assert tree.ancestor_ids(99) == [99]
+
+
+def test_cycles_do_not_loop_forever():
+    cyclic = CategoryTree([category(1, 2), category(2, 1)])
+    assert sorted(cyclic.ancestor_ids(1)) == [1, 2]
+    assert sorted(cyclic.subtree_ids(1)) == [1, 2]
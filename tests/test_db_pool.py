@@ -0,0 +1,46 @@
+import pytest
+from sqlalchemy import exc
+from sqlalchemy.util import greenlet_spawn
+
+from app.database import db
+from app.database.db import MeteredPool, statement_cache_args
+
+
+class FakeConnection:
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+async def test_pool_metrics_count_checkouts_and_timeouts():
+    pool = MeteredPool(creator=FakeConnection, pool_size=1, max_overflow=0, timeout=0.01)
+
+    def checkouts():
+        held = pool.connect()
+        with pytest.raises(exc.TimeoutError):
+            pool.connect()
+        held.close()
+        pool.connect().close()
+
+    # the async pool waits with await_only, so it must be driven from a greenlet
+    await greenlet_spawn(checkouts)
+    metrics = pool.metrics()
+    assert metrics['checkouts'] == 2
+    assert metrics['timeouts'] == 1
+    assert metrics['checked_out'] == 0
+
+
+def test_direct_mode_keeps_the_statement_cache(monkeypatch):
+    monkeypatch.setattr(db.settings, 'DB_STATEMENT_CACHE_MODE', 'direct')
+    monkeypatch.setattr(db.settings, 'DB_STATEMENT_CACHE_SIZE', 250)
+    assert statement_cache_args() == {'prepared_statement_cache_size': 250}
+
+
+def test_pgbouncer_mode_never_reuses_a_statement_name(monkeypatch):
+    monkeypatch.setattr(db.settings, 'DB_STATEMENT_CACHE_MODE', 'pgbouncer')
+    args = statement_cache_args()
+    assert args['prepared_statement_cache_size'] == 0
+    assert args['statement_cache_size'] == 0
+    assert args['prepared_statement_name_func']() != args['prepared_statement_name_func']()
@@ -0,0 +1,57 @@
+import pytest
+from fastapi import HTTPException
+from starlette.requests import Request
+
+from app.api.v1.routers.catalog import MAX_ATTRIBUTE_FILTERS, get_attribute_filters
+from app.repositories.product_card import attribute_filters
+from app.services.attribute import AttributeService
+from app.services.product_card import ProductCardService
+
+
+def request(query_string: str) -> Request:
+    return Request({'type': 'http', 'method': 'GET', 'path': '/api/v1/catalogs', 'query_string': query_string.encode(), 'headers': []})
+
+
+@pytest.fixture
+async def attributed(uow, products):
+    """The cheap shoe is red, the expensive one blue, both are XL"""
+    await AttributeService.add_many(uow=uow, values=[
+        {'product_id': products[0].id, 'name': 'color', 'value': 'red'},
+        {'product_id': products[1].id, 'name': 'color', 'value': 'blue'},
+        *({'product_id': product.id, 'name': 'size', 'value': 'XL'} for product in products),
+    ])
+    async with uow:
+        await ProductCardService.refresh(uow=uow, product_ids=[product.id for product in products])
+    return products
+
+
+async def test_facets_count_every_product(uow, attributed):
+    assert await ProductCardService.get_facets(uow=uow) == [
+        {'name': 'color', 'values': [{'value': 'blue', 'count': 1}, {'value': 'red', 'count': 1}]},
+        {'name': 'size', 'values': [{'value': 'XL', 'count': 2}]},
+    ]
+
+
+async def test_facets_count_only_the_filtered_products(uow, attributed):
+    facets = await ProductCardService.get_facets(uow=uow, filters=attribute_filters({'color': ['red']}))
+    assert facets == [
+        {'name': 'color', 'values': [{'value': 'red', 'count': 1}]},
+        {'name': 'size', 'values': [{'value': 'XL', 'count': 1}]},
+    ]
+
+
+async def test_values_of_one_attribute_are_alternatives(uow, attributed):
+    facets = await ProductCardService.get_facets(uow=uow, filters=attribute_filters({'color': ['red', 'blue'], 'size': ['XL']}))
+    assert facets[1] == {'name': 'size', 'values': [{'value': 'XL', 'count': 2}]}
+
+
+async def test_unknown_parameters_are_not_attribute_filters(uow, attributed):
+    filters = await get_attribute_filters(request('page=2&color=red&color=blue&colour=red&limit=5'), uow=uow)
+    assert filters == {'color': ['red', 'blue']}
+
+
+async def test_too_many_attribute_filters_are_rejected():
+    query_string = '&'.join(f'attribute{i}=x' for i in range(MAX_ATTRIBUTE_FILTERS + 1))
+    with pytest.raises(HTTPException) as error:
+        await get_attribute_filters(request(query_string), uow=None)
+    assert error.value.status_code == 400
@@ -0,0 +1,142 @@
+import io
+import os
+
+import pytest
+from fastapi import FastAPI, UploadFile
+from PIL import Image
+from starlette.datastructures import Headers
+
+from app.services import image as image_module
+from app.services.image import ImageService, ImageTooLargeError, InvalidImageError
+from app.services.upload import ImageProcessor, ImageUploader
+from app.utils.unit_of_work import UnitOfWork
+from config import settings
+
+
+class UploadStub:
+    """A local stand-in for the storage, keeps the uploads and answers with their url"""
+
+    def __init__(self):
+        self.files = {}
+        self.app = FastAPI()
+        self.app.post('/upload')(self.upload)
+
+    async def upload(self, file: UploadFile):
+        url = f'https://cdn.example.com/{len(self.files)}'
+        self.files[url] = (file.content_type, await file.read())
+        return {'data': url}
+
+
+class FakeSession:
+    async def commit(self):
+        pass
+
+    async def rollback(self):
+        pass
+
+    async def close(self):
+        pass
+
+
+class FakeImageRepository:
+    """The stored images, looked up by content hash"""
+
+    known = []
+
+    def __init__(self, session):
+        pass
+
+    async def get_by_content_hashes(self, content_hashes):
+        return [image for image in self.known if image.content_hash in content_hashes]
+
+
+@pytest.fixture
+def uow():
+    FakeImageRepository.known = []
+    uow = UnitOfWork()
+    uow.session_factory = FakeSession
+    uow.repositories = {'image': FakeImageRepository}
+    return uow
+
+
+@pytest.fixture
+async def storage(local_server, monkeypatch):
+    stub = UploadStub()
+    uploader = ImageUploader(url=f'{await local_server(stub.app)}/upload', concurrency=4, max_connections=4, http2=False)
+    uploader.start()
+    monkeypatch.setattr(image_module, 'image_uploader', uploader)
+    # not started: without a process pool the variants are made in the default thread pool
+    monkeypatch.setattr(image_module, 'image_processor', ImageProcessor(
+        workers=1, sizes={'thumbnail': 200, 'medium': 800}, image_format='WEBP'
+    ))
+    yield stub
+    await uploader.stop()
+
+
+@pytest.fixture(autouse=True)
+def spool_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(image_module.tempfile, 'tempdir', str(tmp_path))
+    return tmp_path
+
+
+def png(width: int, height: int, color: str = 'red') -> bytes:
+    buffer = io.BytesIO()
+    Image.new('RGB', (width, height), color).save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def upload_file(content: bytes, filename: str = 'shoe.png') -> UploadFile:
+    return UploadFile(io.BytesIO(content), filename=filename, headers=Headers({'content-type': 'image/png'}))
+
+
+async def test_the_original_and_its_variants_are_uploaded(uow, storage, spool_dir):
+    content = png(1600, 1200)
+
+    [uploaded] = await ImageService.upload_images(uow, [upload_file(content)])
+
+    assert storage.files[uploaded['url']] == ('image/png', content)
+    for name, size in (('thumbnail_url', 200), ('medium_url', 800)):
+        content_type, variant = storage.files[uploaded[name]]
+        assert content_type == 'image/webp'
+        with Image.open(io.BytesIO(variant)) as image:
+            assert (image.format, image.size) == ('WEBP', (size, size * 3 // 4))
+    assert os.listdir(spool_dir) == []
+
+
+async def test_identical_images_are_uploaded_once(uow, storage):
+    content = png(300, 300)
+
+    first, second = await ImageService.upload_images(uow, [upload_file(content), upload_file(content, 'copy.png')])
+
+    assert first == second
+    assert len(storage.files) == 3
+
+
+async def test_an_image_already_stored_is_not_uploaded_again(uow, storage):
+    content = png(300, 300)
+    [stored] = await ImageService.upload_images(uow, [upload_file(content)])
+    FakeImageRepository.known = [type('Image', (), stored)]
+
+    [again] = await ImageService.upload_images(uow, [upload_file(content)])
+
+    assert again == stored
+    assert len(storage.files) == 3
+
+
+async def test_an_image_over_the_size_limit_is_rejected(uow, storage, spool_dir, monkeypatch):
+    monkeypatch.setattr(settings, 'UPLOAD_MAX_FILE_SIZE', 1000)
+    small, large = png(10, 10), os.urandom(2000)
+
+    with pytest.raises(ImageTooLargeError):
+        await ImageService.upload_images(uow, [upload_file(small), upload_file(large, 'large.png')])
+
+    assert storage.files == {}
+    assert os.listdir(spool_dir) == []
+
+
+async def test_a_file_that_is_no_image_is_rejected(uow, storage, spool_dir):
+    with pytest.raises(InvalidImageError):
+        await ImageService.upload_images(uow, [upload_file(b'not an image')])
+
+    assert storage.files == {}
+    assert os.listdir(spool_dir) == []
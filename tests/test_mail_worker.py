@@ -0,0 +1,171 @@
+import asyncio
+import socket
+import time
+from datetime import timedelta
+
+import httpx
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+from sqlalchemy import func, select, update
+
+from app.models.models import MailOutboxModel, MailStatus
+from app.services.mail import MailWorker
+from app.services.mail_outbox import MailOutboxService
+
+
+class MailApiStub:
+    """A local stand-in for the provider, answering with the queued status codes, then 200"""
+
+    def __init__(self):
+        self.statuses = []
+        self.received = []
+        self.url = None
+        self.app = FastAPI()
+        self.app.post('/api/send')(self.send)
+
+    async def send(self, request: Request):
+        self.received.append({
+            'at': time.monotonic(),
+            'authorization': request.headers.get('authorization'),
+            'payload': await request.json(),
+        })
+        status_code = self.statuses.pop(0) if self.statuses else 200
+        return JSONResponse({'success': status_code == 200}, status_code=status_code)
+
+
+@pytest.fixture
+async def mail_api(local_server):
+    stub = MailApiStub()
+    stub.url = await local_server(stub.app)
+    return stub
+
+
+def make_worker(url, **options):
+    worker = MailWorker(**{
+        'api_url': url, 'token': 'secret', 'batch_size': 10, 'rate_per_second': 100, 'poll_interval': 0.05,
+        'lease_seconds': 60, 'max_attempts': 3, 'retry_base': 30, **options
+    })
+    worker.client = httpx.AsyncClient(base_url=worker.api_url, headers={'Authorization': f'Bearer {worker.token}'})
+    return worker
+
+
+@pytest.fixture
+async def worker(mail_api):
+    worker = make_worker(mail_api.url)
+    yield worker
+    await worker.stop()
+
+
+async def test_send_posts_the_payload_with_the_token(worker, mail_api):
+    assert await worker.send({'to': [{'email': 'ada@example.com'}]}) is None
+    assert mail_api.received[0]['payload'] == {'to': [{'email': 'ada@example.com'}]}
+    assert mail_api.received[0]['authorization'] == 'Bearer secret'
+
+
+@pytest.mark.parametrize('status_code, retryable', [(500, True), (503, True), (429, True), (400, False), (401, False)])
+async def test_failures_are_classified(worker, mail_api, status_code, retryable):
+    mail_api.statuses = [status_code]
+    error, can_retry = await worker.send({})
+    assert error.startswith(f'{status_code}: ')
+    assert can_retry is retryable
+
+
+async def test_an_unreachable_provider_is_retried():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        closed_port = sock.getsockname()[1]
+    worker = make_worker(f'http://127.0.0.1:{closed_port}')
+    try:
+        error, retryable = await worker.send({})
+    finally:
+        await worker.stop()
+    assert retryable
+    assert 'ConnectError' in error
+
+
+async def test_sends_are_spaced_to_the_rate(mail_api):
+    worker = make_worker(mail_api.url, rate_per_second=20)
+    try:
+        await asyncio.gather(*(worker.send({'n': n}) for n in range(5)))
+    finally:
+        await worker.stop()
+    times = sorted(request['at'] for request in mail_api.received)
+    # each send waits for its slot, the last one four slots after the first
+    assert times[-1] - times[0] >= 4 * worker.interval * 0.9
+
+
+def test_retries_back_off_exponentially_up_to_the_last_attempt(worker):
+    assert [worker.retry_in(attempts) for attempts in (1, 2, 3)] == [30, 60, None]
+
+
+@pytest.fixture
+def db_worker(worker, uow):
+    worker.uow_factory = lambda: uow
+    return worker
+
+
+async def queue(uow, *recipients):
+    for recipient in recipients:
+        await MailOutboxService.add_one(uow=uow, recipient=recipient, payload={'to': [{'email': recipient}]})
+
+
+async def outbox(db_session):
+    rows = await db_session.execute(
+        select(MailOutboxModel.recipient, MailOutboxModel.status, MailOutboxModel.attempts,
+               MailOutboxModel.last_error, MailOutboxModel.next_attempt_at - func.now())
+        .order_by(MailOutboxModel.id)
+    )
+    return rows.all()
+
+
+async def test_the_worker_sends_the_queued_emails(db_session, uow, db_worker, mail_api):
+    await queue(uow, 'ada@example.com', 'charles@example.com')
+
+    assert await db_worker.process_batch() == 2
+
+    assert sorted(request['payload']['to'][0]['email'] for request in mail_api.received) == ['ada@example.com', 'charles@example.com']
+    assert [(status, attempts) for _, status, attempts, _, _ in await outbox(db_session)] == [(MailStatus.sent, 1)] * 2
+    assert await db_worker.process_batch() == 0
+
+
+async def test_a_failed_send_is_retried_after_the_backoff(db_session, uow, db_worker, mail_api):
+    await queue(uow, 'ada@example.com')
+    mail_api.statuses = [503]
+
+    await db_worker.process_batch()
+    [(_, status, attempts, last_error, retry_in)] = await outbox(db_session)
+    assert (status, attempts) == (MailStatus.pending, 1)
+    assert last_error.startswith('503: ')
+    assert retry_in == timedelta(seconds=30)
+    # not due before the backoff is over
+    assert await db_worker.process_batch() == 0
+
+    await db_session.execute(update(MailOutboxModel).values(next_attempt_at=func.now()))
+    await db_worker.process_batch()
+    [(_, status, attempts, last_error, _)] = await outbox(db_session)
+    assert (status, attempts, last_error) == (MailStatus.sent, 2, None)
+    assert len(mail_api.received) == 2
+
+
+async def test_a_rejected_email_is_given_up(db_session, uow, db_worker, mail_api):
+    await queue(uow, 'ada@example.com')
+    mail_api.statuses = [400]
+
+    await db_worker.process_batch()
+
+    [(_, status, attempts, _, _)] = await outbox(db_session)
+    assert (status, attempts) == (MailStatus.failed, 1)
+
+
+async def test_an_expired_lease_hands_the_email_to_another_worker(db_session, uow, db_worker, mail_api):
+    await queue(uow, 'ada@example.com')
+    # a worker claims the email and dies before sending it
+    await MailOutboxService.claim_batch(uow=uow, limit=10, lease_seconds=60)
+
+    assert await db_worker.process_batch() == 0
+    assert mail_api.received == []
+
+    await db_session.execute(update(MailOutboxModel).values(next_attempt_at=func.now() - timedelta(seconds=1)))
+    assert await db_worker.process_batch() == 1
+    assert len(mail_api.received) == 1
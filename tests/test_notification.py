@@ -0,0 +1,112 @@
+import asyncio
+
+import pytest
+
+from app.database.redis import redis_client
+from app.services.notification import NotificationHub
+
+
+class FakeWebSocket:
+    """Records what is sent, `send_text` hangs until `unblock` when created blocked"""
+
+    def __init__(self, blocked: bool = False):
+        self.sent = []
+        self.closed = False
+        self.gate = asyncio.Event()
+        if not blocked:
+            self.gate.set()
+
+    async def send_text(self, message: str) -> None:
+        await self.gate.wait()
+        self.sent.append(message)
+
+    async def close(self) -> None:
+        self.closed = True
+
+
+@pytest.fixture
+async def hub():
+    hub = NotificationHub(channel='test-notifications', queue_size=2, send_timeout=0.05)
+    yield hub
+    await hub.stop()
+
+
+async def settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+async def test_messages_reach_every_connection(hub):
+    sockets = [FakeWebSocket(), FakeWebSocket()]
+    for websocket in sockets:
+        hub.connect(websocket)
+
+    hub.broadcast_local('a')
+    hub.broadcast_local('b')
+    await settle()
+
+    assert [websocket.sent for websocket in sockets] == [['a', 'b'], ['a', 'b']]
+
+
+async def test_a_full_queue_drops_only_the_slow_subscriber(hub):
+    slow, fast = FakeWebSocket(blocked=True), FakeWebSocket()
+    slow_connection = hub.connect(slow)
+    hub.connect(fast)
+    await settle()
+
+    # the slow sender holds one message, the queue takes two more, the fourth overflows it
+    for message in 'abcd':
+        hub.broadcast_local(message)
+        await settle()
+
+    assert slow_connection not in hub.connections
+    assert len(hub.connections) == 1
+    await settle()
+    assert slow.closed
+    assert fast.sent == list('abcd')
+
+
+async def test_a_send_that_times_out_drops_the_subscriber(hub):
+    slow = FakeWebSocket(blocked=True)
+    connection = hub.connect(slow)
+
+    hub.broadcast_local('a')
+    await asyncio.sleep(hub.send_timeout * 4)
+
+    assert connection not in hub.connections
+    assert slow.closed
+
+
+async def test_broadcast_never_waits_for_a_stuck_socket(hub):
+    hub.connect(FakeWebSocket(blocked=True))
+
+    # synchronous: a stuck socket can only ever be dropped, never awaited
+    for message in range(100):
+        hub.broadcast_local(str(message))
+
+    assert hub.connections == set()
+
+
+async def test_publish_does_not_wait_for_subscribers(hub):
+    hub.connect(FakeWebSocket(blocked=True))
+    hub.start()
+    await settle()
+
+    await asyncio.wait_for(hub.publish('a'), timeout=0.5)
+    await asyncio.wait_for(hub.publish('b'), timeout=0.5)
+
+
+async def test_published_messages_are_broadcast_by_the_subscriber(hub):
+    websocket = FakeWebSocket()
+    hub.connect(websocket)
+    hub.start()
+    while not (await redis_client.pubsub_numsub(hub.channel))[0][1]:
+        await asyncio.sleep(0.01)
+
+    await hub.publish('new order')
+    for _ in range(50):
+        if websocket.sent:
+            break
+        await asyncio.sleep(0.01)
+
+    assert websocket.sent == ['new order']
@@ -0,0 +1,88 @@
+import pytest
+from sqlalchemy import func, select
+
+from app.models.models import CartModel, InventoryModel, MailOutboxModel, MailStatus, OrderItemModel, OrderModel, OrderStatus
+from app.services.order import OrderService, OutOfStockError
+
+DELIVERY = dict(phone_number='+10000000000', country='UK', city='London', address='221B Baker Street')
+
+
+@pytest.fixture
+async def cart(db_session, user, products):
+    """Two of each product in the cart, `stock` sets the inventory"""
+    async def fill(*stock):
+        db_session.add_all([InventoryModel(product_id=product.id, quantity=quantity) for product, quantity in zip(products, stock)])
+        db_session.add_all([CartModel(user_id=user.id, product_id=product.id, quantity=2) for product in products])
+        await db_session.commit()
+    return fill
+
+
+async def stock(db_session, products):
+    rows = await db_session.execute(select(InventoryModel.product_id, InventoryModel.quantity))
+    return [dict(rows.tuples().all())[product.id] for product in products]
+
+
+async def test_place_order(db_session, uow, user, products, cart):
+    await cart(5, 2)
+
+    order_id, product_ids = await OrderService.place_order(uow=uow, user_id=user.id, **DELIVERY)
+
+    assert sorted(product_ids) == sorted(product.id for product in products)
+    order = await db_session.get(OrderModel, order_id)
+    assert order.status == OrderStatus.pending
+    assert order.total_amount == 2 * 100 + 2 * 200
+    items = (await db_session.execute(select(OrderItemModel).filter_by(order_id=order_id))).scalars().all()
+    assert sorted((item.product_id, item.quantity, item.price) for item in items) == [
+        (products[0].id, 2, 100), (products[1].id, 2, 200)
+    ]
+    assert await stock(db_session, products) == [3, 0]
+    assert await db_session.scalar(select(func.count()).select_from(CartModel)) == 0
+
+
+async def test_out_of_stock_changes_nothing(db_session, uow, user, products, cart):
+    await cart(5, 1)
+
+    with pytest.raises(OutOfStockError) as error:
+        await OrderService.place_order(uow=uow, user_id=user.id, **DELIVERY)
+
+    assert error.value.missing == {products[1].id: 2}
+    assert await stock(db_session, products) == [5, 1]
+    assert await db_session.scalar(select(func.count()).select_from(OrderModel)) == 0
+    assert await db_session.scalar(select(func.count()).select_from(CartModel)) == 2
+
+
+async def test_empty_cart(uow, user):
+    assert await OrderService.place_order(uow=uow, user_id=user.id, **DELIVERY) is None
+
+
+async def test_queued_emails_are_leased_to_one_sender(db_session, uow):
+    db_session.add_all([MailOutboxModel(recipient=f'user{i}@example.com', payload={}) for i in range(3)])
+    await db_session.commit()
+
+    async with uow:
+        first = await uow.mail_outbox.claim_batch(limit=2, lease_seconds=60)
+    async with uow:
+        second = await uow.mail_outbox.claim_batch(limit=10, lease_seconds=60)
+    async with uow:
+        leased = await uow.mail_outbox.claim_batch(limit=10, lease_seconds=60)
+
+    assert len(first) == 2 and len(second) == 1 and leased == []
+    assert {mail.id for mail in first}.isdisjoint(mail.id for mail in second)
+
+
+async def test_retried_email_is_due_again(db_session, uow):
+    mails = [MailOutboxModel(recipient=f'user{i}@example.com', payload={}) for i in range(2)]
+    db_session.add_all(mails)
+    await db_session.commit()
+
+    async with uow:
+        claimed = await uow.mail_outbox.claim_batch(limit=10, lease_seconds=60)
+        await uow.mail_outbox.mark_retry(mails[0].id, 'timeout', retry_in=0)
+        await uow.mail_outbox.mark_retry(mails[1].id, 'rejected', retry_in=None)
+    async with uow:
+        retried = await uow.mail_outbox.claim_batch(limit=10, lease_seconds=60)
+
+    assert len(claimed) == 2
+    assert [mail.id for mail in retried] == [mails[0].id]
+    rows = await db_session.execute(select(MailOutboxModel.id, MailOutboxModel.status, MailOutboxModel.attempts))
+    assert sorted(rows.tuples().all()) == [(mails[0].id, MailStatus.pending, 1), (mails[1].id, MailStatus.failed, 1)]
@@ -0,0 +1,34 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from app.utils.pagination import InvalidCursorError, decode_cursor, encode_cursor
+
+
+def test_cursor_round_trip():
+    created_at = datetime(2026, 10, 18, 12, 30, tzinfo=timezone.utc)
+    cursor = encode_cursor('newest', [created_at, 42])
+    assert decode_cursor(cursor, 'newest', 2) == [created_at, 42]
+
+
+def test_cursor_is_url_safe_and_unpadded():
+    cursor = encode_cursor('price_asc', [1999, 7])
+    assert '=' not in cursor and '+' not in cursor and '/' not in cursor
+
+
+def test_cursor_of_another_sort_is_rejected():
+    cursor = encode_cursor('price_asc', [1999, 7])
+    with pytest.raises(InvalidCursorError):
+        decode_cursor(cursor, 'price_desc', 2)
+
+
+def test_cursor_with_another_key_size_is_rejected():
+    cursor = encode_cursor('price_asc', [1999, 7])
+    with pytest.raises(InvalidCursorError):
+        decode_cursor(cursor, 'price_asc', 3)
+
+
+@pytest.mark.parametrize('cursor', ['', 'not a cursor', 'e30', encode_cursor('newest', [{'dt': 'yesterday'}, 1])])
+def test_malformed_cursor_is_rejected(cursor):
+    with pytest.raises(InvalidCursorError):
+        decode_cursor(cursor, 'newest', 2)
@@ -0,0 +1,40 @@
+import asyncio
+import threading
+
+import pytest
+from fastapi import HTTPException
+
+from app.services.security import PasswordHasher, get_password_hash, verify_password
+
+
+async def test_hash_and_verify():
+    hashed = await get_password_hash('correct horse')
+    assert await verify_password('correct horse', hashed)
+    assert not await verify_password('wrong horse', hashed)
+
+
+async def test_saturated_hasher_rejects_with_503():
+    hasher = PasswordHasher(workers=1, max_waiting=1)
+    release = threading.Event()
+    try:
+        running = [asyncio.ensure_future(hasher.run(release.wait)) for _ in range(2)]
+        await asyncio.sleep(0.05)
+        assert hasher.metrics()['pending'] == 2
+        assert hasher.metrics()['waiting'] == 1
+
+        with pytest.raises(HTTPException) as rejected:
+            await hasher.run(release.wait)
+        assert rejected.value.status_code == 503
+        assert rejected.value.headers == {'Retry-After': '1'}
+
+        release.set()
+        assert await asyncio.gather(*running) == [True, True]
+    finally:
+        release.set()
+        hasher.executor.shutdown(wait=True)
+
+    metrics = hasher.metrics()
+    assert metrics['pending'] == 0
+    assert metrics['completed'] == 2
+    assert metrics['rejected'] == 1
+    assert metrics['max_wait_seconds'] > 0
@@ -0,0 +1,177 @@
+import asyncio
+import json
+
+import pytest
+
+from app.database.redis import redis_client
+from app.models.user import UserModel
+from app.services.user import UserService
+from app.utils.unit_of_work import UnitOfWork
+from config import settings
+
+
+class FakeSession:
+    async def commit(self):
+        pass
+
+    async def rollback(self):
+        pass
+
+    async def close(self):
+        pass
+
+
+class FakeUserRepository:
+    """The user table as a dict by id, counting the lookups"""
+
+    users = {}
+    lookups = 0
+
+    def __init__(self, session):
+        pass
+
+    @classmethod
+    def matching(cls, filters):
+        return [user for user in cls.users.values() if all(getattr(user, k) == v for k, v in filters.items())]
+
+    async def get_by_query_one_or_none(self, options=(), **filters):
+        type(self).lookups += 1
+        users = self.matching(filters)
+        return users[0] if users else None
+
+    async def get_by_query_all(self, options=(), **filters):
+        return self.matching(filters)
+
+    async def update_one_by_id(self, _id, **values):
+        user = self.users.get(_id)
+        for name, value in values.items():
+            setattr(user, name, value)
+        return user
+
+    async def delete_by_query(self, **filters):
+        for user in self.matching(filters):
+            del self.users[user.id]
+
+
+@pytest.fixture(autouse=True)
+def users():
+    FakeUserRepository.users = {
+        1: UserModel(id=1, first_name='Ada', last_name='Lovelace', email='ada@example.com', password='hash', role='user')
+    }
+    FakeUserRepository.lookups = 0
+    UserService.principal_cache.clear()
+    yield
+    UserService.principal_cache.clear()
+
+
+@pytest.fixture
+def uow():
+    uow = UnitOfWork()
+    uow.session_factory = FakeSession
+    uow.repositories = {'user': FakeUserRepository}
+    return uow
+
+
+@pytest.fixture
+async def invalidations():
+    """Emails published on the invalidation channel"""
+    pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+    await pubsub.subscribe(settings.AUTH_CACHE_CHANNEL)
+
+    async def received():
+        # an ignored subscribe confirmation also reads as None, so poll for a while
+        emails = set()
+        for _ in range(10):
+            message = await pubsub.get_message(timeout=0.01)
+            if message is not None:
+                emails.update(json.loads(message['data']))
+        return emails
+
+    yield received
+    await pubsub.reset()
+
+
+@pytest.fixture
+async def listener():
+    UserService.start_principal_listener()
+    while not (await redis_client.pubsub_numsub(settings.AUTH_CACHE_CHANNEL))[0][1]:
+        await asyncio.sleep(0.01)
+    yield
+    await UserService.stop_principal_listener()
+
+
+async def test_a_miss_falls_back_to_the_database(uow):
+    user = await UserService.get_principal(uow, 'ada@example.com')
+    again = await UserService.get_principal(uow, 'ada@example.com')
+
+    assert (user.id, user.email, user.role, user.password) == (1, 'ada@example.com', 'user', None)
+    assert again is user
+    assert FakeUserRepository.lookups == 1
+    assert await UserService.get_principal(uow, 'nobody@example.com') is None
+
+
+async def test_a_local_miss_is_served_from_redis_when_shared(uow, monkeypatch):
+    monkeypatch.setattr(settings, 'AUTH_CACHE_REDIS', True)
+    await UserService.get_principal(uow, 'ada@example.com')
+    UserService.principal_cache.clear()
+
+    user = await UserService.get_principal(uow, 'ada@example.com')
+
+    assert user.email == 'ada@example.com'
+    assert FakeUserRepository.lookups == 1
+
+
+async def test_changing_the_role_invalidates_the_principal(uow, invalidations):
+    await UserService.get_principal(uow, 'ada@example.com')
+
+    await UserService.update_one_by_id(uow=uow, _id=1, role='admin')
+
+    assert await invalidations() == {'ada@example.com'}
+    assert (await UserService.get_principal(uow, 'ada@example.com')).role == 'admin'
+
+
+async def test_changing_the_email_invalidates_both_emails(uow, invalidations):
+    await UserService.get_principal(uow, 'ada@example.com')
+
+    await UserService.update_one_by_id(uow=uow, _id=1, email='countess@example.com')
+
+    assert await invalidations() == {'ada@example.com', 'countess@example.com'}
+    assert await UserService.get_principal(uow, 'ada@example.com') is None
+    assert (await UserService.get_principal(uow, 'countess@example.com')).id == 1
+
+
+async def test_deleting_the_user_invalidates_the_principal(uow, invalidations):
+    await UserService.get_principal(uow, 'ada@example.com')
+
+    await UserService.delete_by_query(uow=uow, id=1)
+
+    assert await invalidations() == {'ada@example.com'}
+    assert await UserService.get_principal(uow, 'ada@example.com') is None
+
+
+async def test_nothing_is_invalidated_before_the_commit(uow, invalidations):
+    await UserService.get_principal(uow, 'ada@example.com')
+
+    with pytest.raises(RuntimeError):
+        async with uow:
+            await UserService.update_one_by_id(uow=uow, _id=1, role='admin')
+            assert await invalidations() == set()
+            raise RuntimeError
+
+    assert await invalidations() == set()
+    assert UserService.principal_cache.get('ada@example.com') is not None
+
+
+async def test_invalidations_of_other_workers_drop_the_local_principal(uow, listener):
+    await UserService.get_principal(uow, 'ada@example.com')
+
+    # another worker changed the user
+    await redis_client.publish(settings.AUTH_CACHE_CHANNEL, json.dumps(['ada@example.com']))
+    for _ in range(100):
+        if UserService.principal_cache.get('ada@example.com') is None:
+            break
+        await asyncio.sleep(0.01)
+
+    assert UserService.principal_cache.get('ada@example.com') is None
+    await UserService.get_principal(uow, 'ada@example.com')
+    assert FakeUserRepository.lookups == 2
@@ -0,0 +1,106 @@
+from sqlalchemy import select
+
+from app.database.redis import redis_client
+from app.models.models import AttributeModel, ImageModel, InventoryModel, ProductModel
+from app.services.attribute import AttributeService
+from app.services.image import ImageService
+from app.services.inventory import InventoryService
+from app.services.product import ProductService
+from app.services.product_card import ProductCardService
+
+
+async def expected_card(db_session, product_id):
+    """The card built by hand from the source tables"""
+    # the session does not expire on commit, objects loaded earlier must be overwritten
+    fresh = {'populate_existing': True}
+    product = await db_session.scalar(select(ProductModel).where(ProductModel.id == product_id), execution_options=fresh)
+    images = await db_session.scalars(
+        select(ImageModel).where(ImageModel.product_id == product_id).order_by(ImageModel.id), execution_options=fresh
+    )
+    attributes = await db_session.scalars(
+        select(AttributeModel).where(AttributeModel.product_id == product_id).order_by(AttributeModel.id),
+        execution_options=fresh
+    )
+    quantity = await db_session.scalar(select(InventoryModel.quantity).where(InventoryModel.product_id == product_id))
+    return {
+        'id': product.id,
+        'name': product.name,
+        'category_id': product.category_id,
+        'description': product.description,
+        'price': product.price,
+        'inventory': None if quantity is None else {'quantity': quantity},
+        'images': [
+            {'id': image.id, 'url': image.url, 'thumbnail_url': image.thumbnail_url, 'medium_url': image.medium_url}
+            for image in images
+        ],
+        'attributes': [
+            {'id': attribute.id, 'name': attribute.name, 'value': attribute.value} for attribute in attributes
+        ],
+    }
+
+
+async def card(uow, product_id):
+    cards = await ProductCardService.get_by_ids(uow=uow, ids=[product_id], mappings=True)
+    return {key: value for key, value in dict(cards[0]).items() if key not in ('created_at', 'updated_at')}
+
+
+async def refresh_and_compare(db_session, uow, product_id):
+    async with uow:
+        await ProductCardService.refresh(uow=uow, product_ids=[product_id])
+    assert await card(uow, product_id) == await expected_card(db_session, product_id)
+
+
+async def test_the_card_follows_the_source_tables(db_session, uow, products):
+    product_id = products[0].id
+    await refresh_and_compare(db_session, uow, product_id)
+
+    await ProductService.update_one_by_id(uow=uow, _id=product_id, name='Trail shoe', price=150)
+    await refresh_and_compare(db_session, uow, product_id)
+
+    await ImageService.add_images(uow=uow, product_id=product_id, uploaded=[
+        {'url': f'https://cdn.example.com/{name}.webp', 'thumbnail_url': f'https://cdn.example.com/{name}-t.webp',
+         'medium_url': f'https://cdn.example.com/{name}-m.webp', 'content_hash': name * 32}
+        for name in ('a', 'b')
+    ])
+    await refresh_and_compare(db_session, uow, product_id)
+
+    attribute = await AttributeService.add_one_and_get_obj(uow=uow, product_id=product_id, name='color', value='red')
+    await refresh_and_compare(db_session, uow, product_id)
+    await AttributeService.update_one_by_id(uow=uow, _id=attribute.id, value='blue')
+    await refresh_and_compare(db_session, uow, product_id)
+
+    inventory = await InventoryService.add_one_and_get_obj(uow=uow, product_id=product_id, quantity=3)
+    await refresh_and_compare(db_session, uow, product_id)
+    await InventoryService.update_one_by_id(uow=uow, _id=inventory.id, quantity=0)
+    await refresh_and_compare(db_session, uow, product_id)
+
+    await ImageService.delete_by_query(uow=uow, product_id=product_id)
+    await AttributeService.delete_by_query(uow=uow, id=attribute.id)
+    await refresh_and_compare(db_session, uow, product_id)
+
+
+async def test_refresh_purges_the_cached_card_only_once_committed(uow, products):
+    product_id = products[0].id
+    key = ProductCardService._product_key(product_id)
+    await redis_client.set(key, '{}')
+
+    async with uow:
+        await ProductCardService.refresh(uow=uow, product_ids=[product_id])
+        assert await redis_client.exists(key)
+    assert not await redis_client.exists(key)
+
+
+async def test_a_rolled_back_refresh_keeps_the_cached_card(uow, products):
+    product_id = products[0].id
+    key = ProductCardService._product_key(product_id)
+    await redis_client.set(key, '{}')
+
+    try:
+        async with uow:
+            await ProductCardService.refresh(uow=uow, product_ids=[product_id])
+            raise RuntimeError
+    except RuntimeError:
+        pass
+
+    assert await redis_client.exists(key)
+    assert not await ProductCardService.get_by_ids(uow=uow, ids=[product_id])
@@ -0,0 +1,99 @@
+"""
+Fails when a hot repository query can only be answered by a sequential scan.
+
+Each query is built by its repository and explained instead of executed, with sequential scans disabled:
+the planner then picks any index able to answer the query, so a Seq Scan left in the plan means
+that no index can. Needs TEST_DB_URL, see conftest.
+"""
+import json
+from typing import Any, Dict, Iterator, List
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import ClauseElement, Executable
+
+from app.repositories.attribute import AttributeRepository
+from app.repositories.cart import CartRepository
+from app.repositories.category import CategoryRepository
+from app.repositories.image import ImageRepository
+from app.repositories.mail_outbox import MailOutboxRepository
+from app.repositories.order import OrderRepository
+from app.repositories.order_item import OrderItemRepository
+from app.repositories.product_card import ProductCardRepository, attribute_filters, category_filter
+from app.repositories.user import UserRepository
+
+
+class Explain(Executable, ClauseElement):
+    inherit_cache = False
+
+    def __init__(self, statement: Any):
+        self.statement = statement
+
+
+@compiles(Explain, 'postgresql')
+def compile_explain(element: Explain, compiler: Any, **kw: Any) -> str:
+    return 'EXPLAIN (FORMAT JSON) ' + compiler.process(element.statement, **kw)
+
+
+class Explained(Exception):
+    def __init__(self, plan: Dict[str, Any]):
+        self.plan = plan
+
+
+class ExplainingSession:
+    """Stands in for a repository's session, explains the first statement instead of executing it"""
+
+    def __init__(self, session: Any):
+        self.session = session
+
+    async def execute(self, statement: Any, *args: Any, **kwargs: Any) -> None:
+        await self.session.execute(text('SET LOCAL enable_seqscan = off'))
+        plan = (await self.session.execute(Explain(statement))).scalar()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        raise Explained(plan[0]['Plan'])
+
+
+def nodes(plan: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    yield plan
+    for child in plan.get('Plans', ()):
+        yield from nodes(child)
+
+
+def seq_scans(plan: Dict[str, Any]) -> List[str]:
+    return [node['Relation Name'] for node in nodes(plan) if node['Node Type'] == 'Seq Scan']
+
+
+HOT_QUERIES = {
+    'catalog newest first': (
+        ProductCardRepository, 'get_by_query_with_cursor',
+        dict(limit=21, order_by=['created_at', 'id'], descending=True, mappings=True),
+    ),
+    'catalog of categories by price, next page': (
+        ProductCardRepository, 'get_by_query_with_cursor',
+        dict(limit=21, order_by=['price', 'id'], after=(100, 5), filters=[category_filter([1, 2])], mappings=True),
+    ),
+    'catalog filtered by attributes': (
+        ProductCardRepository, 'get_by_query_with_cursor',
+        dict(limit=21, order_by=['created_at', 'id'], descending=True, filters=attribute_filters({'color': ['red', 'blue']}), mappings=True),
+    ),
+    'facets of a category': (ProductCardRepository, 'get_facets', dict(filters=[category_filter([1])])),
+    'search': (ProductCardRepository, 'search', dict(text='red shoes', limit=20)),
+    'cart lines': (CartRepository, 'lock_lines', dict(user_id=1)),
+    'existing attribute names': (AttributeRepository, 'get_existing_names', dict(names=['color', 'page'])),
+    'images by content hash': (ImageRepository, 'get_by_content_hashes', dict(content_hashes=['0' * 64])),
+    'user by email': (UserRepository, 'get_by_query_one_or_none', dict(email='user@example.com')),
+    'orders of a user': (OrderRepository, 'get_by_query_all', dict(user_id=1)),
+    'items of an order': (OrderItemRepository, 'get_by_query_all', dict(order_id=1)),
+    'due emails': (MailOutboxRepository, 'claim_batch', dict(limit=100, lease_seconds=60)),
+    'category ancestors': (CategoryRepository, 'get_ancestor_ids', dict(category_ids=[1])),
+}
+
+
+@pytest.mark.parametrize('name', HOT_QUERIES)
+async def test_hot_query_uses_an_index(db_session, name):
+    repository, method, kwargs = HOT_QUERIES[name]
+    with pytest.raises(Explained) as explained:
+        await getattr(repository(ExplainingSession(db_session)), method)(**kwargs)
+    assert seq_scans(explained.value.plan) == [], json.dumps(explained.value.plan, indent=2)
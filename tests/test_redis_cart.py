@@ -0,0 +1,88 @@
+import pytest
+
+from config import settings
+from app.database.redis import redis_client
+from app.services.cart import RedisCartService
+from app.services.product_card import ProductCardService
+
+USER_ID = 1
+
+
+@pytest.fixture(autouse=True)
+async def loaded_cart(monkeypatch):
+    """An empty cart already loaded in Redis, every product exists"""
+    async def get_products(uow, product_ids):
+        return {product_id: {'id': product_id} for product_id in product_ids}
+
+    monkeypatch.setattr(ProductCardService, 'get_products', get_products)
+    await redis_client.hset(RedisCartService._key(USER_ID), RedisCartService.loaded_field, 1)
+
+
+async def quantities():
+    lines = RedisCartService._parse(USER_ID, await redis_client.hgetall(RedisCartService._key(USER_ID)))
+    return {line.product_id: line.quantity for line in lines}
+
+
+async def test_adding_a_product_twice_adds_up():
+    await RedisCartService.add_product(None, USER_ID, 10, 2)
+    line = await RedisCartService.add_product(None, USER_ID, 10, 3)
+    assert line.quantity == 5
+    assert await quantities() == {10: 5}
+    assert await redis_client.smembers(RedisCartService.dirty_key) == {str(USER_ID).encode()}
+
+
+async def test_moving_a_line_to_a_product_in_the_cart_merges_them():
+    await RedisCartService.add_product(None, USER_ID, 10, 2)
+    await RedisCartService.add_product(None, USER_ID, 20, 3)
+
+    line = await RedisCartService.update_line(None, USER_ID, 10, product_id=20)
+
+    assert (line.product_id, line.quantity) == (20, 5)
+    assert await quantities() == {20: 5}
+
+
+async def test_moving_a_line_to_a_new_product():
+    await RedisCartService.add_product(None, USER_ID, 10, 2)
+
+    line = await RedisCartService.update_line(None, USER_ID, 10, product_id=30, quantity=4)
+
+    assert (line.product_id, line.quantity) == (30, 4)
+    assert await quantities() == {30: 4}
+
+
+async def test_changing_the_quantity():
+    await RedisCartService.add_product(None, USER_ID, 10, 2)
+
+    line = await RedisCartService.update_line(None, USER_ID, 10, quantity=7)
+
+    assert (line.product_id, line.quantity) == (10, 7)
+    assert await quantities() == {10: 7}
+
+
+async def test_updating_a_line_keeps_its_creation_time_and_refreshes_the_ttl():
+    created = await RedisCartService.add_product(None, USER_ID, 10, 2)
+    await redis_client.expire(RedisCartService._key(USER_ID), 60)
+
+    line = await RedisCartService.update_line(None, USER_ID, 10, quantity=3)
+
+    assert line.created_at == created.created_at
+    assert await redis_client.ttl(RedisCartService._key(USER_ID)) > 60
+    assert await redis_client.ttl(RedisCartService._key(USER_ID)) <= settings.CART_REDIS_TTL
+
+
+async def test_checked_out_lines_leave_the_cart():
+    await RedisCartService.add_product(None, USER_ID, 10, 2)
+    await RedisCartService.add_product(None, USER_ID, 20, 1)
+
+    await RedisCartService.checked_out(None, USER_ID, [10])
+
+    assert await quantities() == {20: 1}
+
+
+async def test_failed_checkout_drops_the_cart_to_reload_it():
+    await RedisCartService.add_product(None, USER_ID, 10, 2)
+    await RedisCartService.checked_out(None, USER_ID, [10])
+
+    await RedisCartService.checkout_failed(USER_ID)
+
+    assert not await redis_client.exists(RedisCartService._key(USER_ID))
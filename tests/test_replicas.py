@@ -0,0 +1,87 @@
+import asyncio
+
+import pytest
+from sqlalchemy.engine import make_url
+
+from app.database.replicas import ReplicaRouter
+
+
+class FakeEngine:
+    def __init__(self, name: str):
+        self.url = make_url(f'postgresql+asyncpg://shop:secret@{name}/shop')
+
+
+class FakeReplication:
+    """The lag every replica reports, an exception is raised, a None lag means the replica hangs"""
+
+    def __init__(self):
+        self.lag = {}
+
+    async def __call__(self, engine):
+        lag = self.lag[engine]
+        if isinstance(lag, Exception):
+            raise lag
+        if lag is None:
+            await asyncio.sleep(60)
+        return lag
+
+
+@pytest.fixture
+def engines():
+    return [FakeEngine('replica-1'), FakeEngine('replica-2')]
+
+
+@pytest.fixture
+def replication(engines):
+    replication = FakeReplication()
+    replication.lag = {engine: 0.0 for engine in engines}
+    return replication
+
+
+@pytest.fixture
+def router(engines, replication, monkeypatch):
+    router = ReplicaRouter(
+        session_maker=lambda bind='primary': bind, engines=engines, interval=1, timeout=0.05, max_lag=5
+    )
+    monkeypatch.setattr(router, '_replication_lag', replication)
+    return router
+
+
+def sessions(router, count=4):
+    """The binds of the next sessions, the fake session maker returns them as the session"""
+    return {router.session() for _ in range(count)}
+
+
+async def test_sessions_are_spread_over_the_healthy_replicas(router, engines):
+    await router.check_all()
+    assert sessions(router) == set(engines)
+
+
+async def test_a_lagging_replica_is_skipped_until_it_catches_up(router, engines, replication):
+    replication.lag[engines[0]] = 30.0
+    await router.check_all()
+    assert sessions(router) == {engines[1]}
+    assert router.lag[engines[0]] == 30.0
+
+    replication.lag[engines[0]] = 1.0
+    await router.check_all()
+    assert sessions(router) == set(engines)
+
+
+@pytest.mark.parametrize('failure', [None, OSError('connection refused')], ids=['timeout', 'error'])
+async def test_an_unreachable_replica_is_skipped(router, engines, replication, failure):
+    replication.lag[engines[1]] = failure
+    await router.check_all()
+    assert sessions(router) == {engines[0]}
+    assert router.lag[engines[1]] is None
+
+
+async def test_sessions_fall_back_to_the_primary(router, engines, replication):
+    replication.lag = {engine: 30.0 for engine in engines}
+    await router.check_all()
+    assert sessions(router) == {'primary'}
+
+
+def test_staleness_covers_the_lag_between_two_checks(router):
+    assert router.max_staleness == router.max_lag + router.interval + router.timeout
+    assert ReplicaRouter(lambda: None, [], interval=1, timeout=1, max_lag=5).max_staleness == 0
@@ -0,0 +1,200 @@
+import asyncio
+import gzip
+import time
+
+import httpx
+import orjson
+import pytest
+from fastapi import FastAPI
+
+from app.database.redis import redis_client
+from app.utils import response_cache as response_cache_module
+from app.utils.cache import SizedLRUCache
+from app.utils.response_cache import ResponseCache
+
+
+@pytest.fixture
+def cache():
+    return ResponseCache(
+        prefix='test-cache',
+        default_expire=60,
+        channel='test-cache:invalidations',
+        local=SizedLRUCache(maxsize=100, maxbytes=1 << 20, ttl=60),
+        stale_ttl=60,
+        lock_timeout=5,
+        lock_wait=1,
+        beta=0,
+        gzip_min_size=100,
+        staleness=0,
+    )
+
+
+@pytest.fixture
+def calls():
+    return []
+
+
+@pytest.fixture
+def client(cache, calls):
+    app = FastAPI()
+
+    @app.get('/items/{item_id}')
+    @cache(tags=lambda result, kwargs: [f'item:{kwargs["item_id"]}'])
+    async def get_item(item_id: int, size: int = 1):
+        calls.append(item_id)
+        await asyncio.sleep(0.01)
+        return {'id': item_id, 'version': len(calls), 'payload': 'x' * size}
+
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url='http://test')
+
+
+def test_entry_round_trip(cache):
+    entry = cache.pack(['a', 'b'], 123.0, 0.5, b'{"id":1}')
+    header, payload = cache.unpack(entry)
+    assert header == {'tags': ['a', 'b'], 'fresh_until': 123.0, 'delta': 0.5, 'size': 8}
+    assert payload == b'{"id":1}'
+
+
+def test_large_bodies_are_stored_gzipped_too(cache):
+    body = orjson.dumps({'payload': 'x' * 200})
+    header, payload = cache.unpack(cache.pack([], 0, 0, body))
+    assert payload[:header['size']] == body
+    assert gzip.decompress(payload[header['size']:]) == body
+
+
+async def test_second_request_is_served_from_redis(client, calls):
+    first = await client.get('/items/1')
+    second = await client.get('/items/1')
+    assert first.json() == second.json() == {'id': 1, 'version': 1, 'payload': 'x'}
+    assert second.content == first.content
+    assert calls == [1]
+
+
+async def test_query_string_is_part_of_the_key(client, calls):
+    await client.get('/items/1?size=1')
+    await client.get('/items/1?size=2')
+    assert calls == [1, 1]
+
+
+async def test_gzip_is_served_to_clients_accepting_it(client):
+    response = await client.get('/items/1?size=500', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['content-encoding'] == 'gzip'
+    assert response.headers['vary'] == 'Accept-Encoding'
+    assert response.json()['payload'] == 'x' * 500
+
+    plain = await client.get('/items/1?size=500', headers={'Accept-Encoding': 'identity'})
+    assert 'content-encoding' not in plain.headers
+    assert plain.json()['payload'] == 'x' * 500
+
+
+async def test_invalidating_a_tag_drops_only_its_entries(cache, client, calls):
+    await client.get('/items/1')
+    await client.get('/items/2')
+    await cache.invalidate('item:1')
+    await client.get('/items/1')
+    await client.get('/items/2')
+    assert calls == [1, 2, 1]
+
+
+async def test_concurrent_misses_compute_the_entry_once(cache, client, calls):
+    responses = await asyncio.gather(*(client.get('/items/1') for _ in range(20)))
+    assert {response.json()['version'] for response in responses} == {1}
+    assert calls == [1]
+    assert cache.coalesced == 19
+
+
+async def test_stale_entry_is_served_while_refreshed(cache, client, calls, monkeypatch):
+    await client.get('/items/1')
+    now = time.time()
+    monkeypatch.setattr(response_cache_module.time, 'time', lambda: now + 61)
+
+    stale = await client.get('/items/1')
+    assert stale.json()['version'] == 1
+    assert cache.stale_refreshes == 1
+    await asyncio.gather(*cache._refreshing.values())
+
+    fresh = await client.get('/items/1')
+    assert fresh.json()['version'] == 2
+    assert calls == [1, 1]
+
+
+async def test_store_is_skipped_when_its_tag_was_purged_meanwhile(cache):
+    seen = await redis_client.get(cache.generation_key) or b'0'
+    await cache.invalidate('item:1')
+
+    def store(key, tag):
+        return cache._store(keys=[key, cache.tag_key(tag), cache.tag_generation_key(tag)], args=[seen, b'entry', 60, 0])
+
+    assert await store('stale', 'item:1') == 0
+    assert await store('unrelated', 'item:2') == 1
+    assert await redis_client.get('stale') is None
+    assert await redis_client.smembers(cache.tag_key('item:2')) == {b'unrelated'}
+
+
+async def test_store_is_skipped_while_replicas_may_miss_a_purge(cache):
+    await cache.invalidate('item:1')
+    seen = await redis_client.get(cache.generation_key)
+
+    def store(key, staleness):
+        return cache._store(
+            keys=[key, cache.tag_key('item:1'), cache.tag_generation_key('item:1')], args=[seen, b'entry', 60, staleness]
+        )
+
+    assert await store('lagging', 30) == 0
+    assert await redis_client.get('lagging') is None
+    assert await store('caught-up', 0) == 1
+
+
+async def test_entries_purged_within_the_staleness_are_served_uncached(cache, client, calls):
+    cache.staleness = 30
+    await client.get('/items/1')
+    await cache.invalidate('item:1')
+
+    first = await client.get('/items/1')
+    second = await client.get('/items/1')
+
+    assert [first.json()['version'], second.json()['version']] == [2, 3]
+    assert calls == [1, 1, 1]
+    await client.get('/items/2')
+    await client.get('/items/2')
+    assert calls == [1, 1, 1, 2]
+
+
+async def test_purge_deletes_the_entries_and_tag_sets(cache):
+    await redis_client.set('entry:1', b'1')
+    await redis_client.set('entry:2', b'2')
+    await redis_client.sadd(cache.tag_key('a'), 'entry:1')
+    await redis_client.sadd(cache.tag_key('b'), 'entry:1', 'entry:2')
+    await cache.invalidate('a')
+    assert await redis_client.get('entry:1') is None
+    assert await redis_client.get('entry:2') == b'2'
+    assert not await redis_client.exists(cache.tag_key('a'))
+    assert await redis_client.ttl(cache.tag_generation_key('a')) == cache.purge_window
+
+
+async def test_invalidations_reach_the_local_tier_of_other_workers(cache, client, calls):
+    other = ResponseCache(
+        prefix=cache.prefix, default_expire=60, channel=cache.channel,
+        local=SizedLRUCache(maxsize=100, maxbytes=1 << 20, ttl=60),
+        stale_ttl=60, lock_timeout=5, lock_wait=1, beta=0, gzip_min_size=100, staleness=0,
+    )
+    cache.start()
+    other.start()
+    try:
+        while not (cache._listening and other._listening):
+            await asyncio.sleep(0.01)
+        await client.get('/items/1')
+        await client.get('/items/1')
+        assert cache.local.metrics()['hits'] == 1
+
+        await other.invalidate('item:1')
+        for _ in range(100):
+            if not cache.local.metrics()['entries']:
+                break
+            await asyncio.sleep(0.01)
+        assert cache.local.metrics()['entries'] == 0
+        await client.get('/items/1')
+        assert calls == [1, 1]
+    finally:
+        await cache.stop()
+        await other.stop()
@@ -0,0 +1,83 @@
+import struct
+
+import pytest
+
+from app.models.models import CategoryModel, ProductModel
+from app.services.product_card import ProductCardService
+from app.utils.pagination import decode_cursor, encode_cursor
+
+# (name, description): matches in the name rank above matches in the description,
+# the three identical products tie and are ordered by id
+PRODUCTS = [
+    ('Red running shoe', 'A light shoe for the road.'),
+    ('Red trail shoe', 'A red shoe for red mud.'),
+    ('Trail shoe', 'Comes in red.'),
+    ('Road shoe', 'Comes in red.'),
+    ('Track shoe', 'Comes in red.'),
+    ('Blue running shoe', 'A light shoe for the road.'),
+]
+
+
+@pytest.fixture
+async def catalog(db_session, uow):
+    category = CategoryModel(name='Shoes')
+    db_session.add(category)
+    await db_session.flush()
+    products = [ProductModel(name=name, description=description, category_id=category.id, price=100) for name, description in PRODUCTS]
+    db_session.add_all(products)
+    await db_session.commit()
+    async with uow:
+        await ProductCardService.refresh(uow=uow, product_ids=[product.id for product in products])
+    return {product.name: product.id for product in products}
+
+
+async def search_all(uow, text, limit):
+    """Every page of the search, following the cursors"""
+    pages, cursor = [], None
+    while True:
+        cards, cursor = await ProductCardService.search_page(uow=uow, text=text, limit=limit, cursor=cursor)
+        pages.append(cards)
+        if cursor is None:
+            return pages
+
+
+def test_a_float4_rank_survives_the_cursor():
+    # ts_rank returns a float4, asyncpg widens it to a Python float exactly
+    rank = struct.unpack('f', struct.pack('f', 0.0607927))[0]
+    after_rank, after_id = decode_cursor(encode_cursor('search', [rank, 7]), 'search', 2)
+    assert (after_rank, after_id) == (rank, 7)
+    assert struct.pack('f', after_rank) == struct.pack('f', rank)
+
+
+async def test_results_are_ordered_by_rank(uow, catalog):
+    cards, cursor = await ProductCardService.search_page(uow=uow, text='red', limit=10)
+
+    assert cursor is None
+    ranks = [card['rank'] for card in cards]
+    assert ranks == sorted(ranks, reverse=True)
+    names = [card['name'] for card in cards]
+    assert set(names[:2]) == {'Red running shoe', 'Red trail shoe'}
+    tied = [catalog['Trail shoe'], catalog['Road shoe'], catalog['Track shoe']]
+    assert [card['id'] for card in cards[-3:]] == sorted(tied, reverse=True)
+    assert 'Blue running shoe' not in names
+
+
+@pytest.mark.parametrize('limit', [1, 2, 4])
+async def test_pages_have_neither_duplicates_nor_gaps(uow, catalog, limit):
+    everything, _ = await ProductCardService.search_page(uow=uow, text='red', limit=100)
+
+    pages = await search_all(uow, 'red', limit)
+
+    assert [card['id'] for page in pages for card in page] == [card['id'] for card in everything]
+    assert all(len(page) == limit for page in pages[:-1])
+
+
+async def test_the_cursor_splits_ties_on_the_id(uow, catalog):
+    cards, _ = await ProductCardService.search_page(uow=uow, text='red', limit=100)
+    first_tied = cards[-3]
+
+    after = decode_cursor(encode_cursor('search', [first_tied['rank'], first_tied['id']]), 'search', 2)
+    async with uow:
+        rows = await uow.product_card.search('red', 100, after)
+
+    assert [row['id'] for row in rows] == [card['id'] for card in cards[-2:]]
@@ -0,0 +1,153 @@
+import pytest
+
+from app.services.category import CategoryService
+from app.services.product import ProductService
+from app.utils.unit_of_work import UnitOfWork, get_uow
+
+
+class FakeSession:
+    """Counts what the unit of work does with its session, queries return nothing"""
+
+    def __init__(self):
+        self.commits = self.rollbacks = self.closes = self.queries = 0
+
+    async def execute(self, query):
+        self.queries += 1
+        return FakeResult()
+
+    async def commit(self):
+        self.commits += 1
+
+    async def rollback(self):
+        self.rollbacks += 1
+
+    async def close(self):
+        self.closes += 1
+
+
+class FakeResult:
+    def scalars(self):
+        return self
+
+    def unique(self):
+        return self
+
+    def scalar_one_or_none(self):
+        return None
+
+    def all(self):
+        return []
+
+
+@pytest.fixture
+def sessions():
+    return []
+
+
+@pytest.fixture
+def uow(sessions):
+    def session_factory():
+        sessions.append(FakeSession())
+        return sessions[-1]
+
+    uow = UnitOfWork()
+    uow.session_factory = session_factory
+    return uow
+
+
+async def test_nested_blocks_share_one_session_committed_once(uow, sessions):
+    async with uow:
+        async with uow:
+            async with uow:
+                pass
+        assert (sessions[0].commits, sessions[0].closes) == (0, 0)
+
+    assert len(sessions) == 1
+    assert (sessions[0].commits, sessions[0].rollbacks, sessions[0].closes) == (1, 0, 1)
+
+
+async def test_an_exception_in_a_nested_block_rolls_everything_back(uow, sessions):
+    with pytest.raises(RuntimeError):
+        async with uow:
+            async with uow:
+                raise RuntimeError
+
+    assert (sessions[0].commits, sessions[0].closes) == (0, 1)
+    assert sessions[0].rollbacks >= 1
+
+
+async def test_every_outermost_block_gets_a_new_session_and_repositories(uow, sessions):
+    async with uow:
+        first = uow.product
+        assert uow.product is first
+    async with uow:
+        assert uow.product is not first
+        assert uow.product.session is sessions[1]
+
+
+async def test_repositories_need_an_open_session(uow):
+    with pytest.raises(AttributeError):
+        uow.product
+
+
+async def test_a_request_makes_one_session_and_one_commit(uow, sessions, monkeypatch):
+    """Several service calls through `get_uow` share its session, as the endpoint and its dependencies do"""
+    monkeypatch.setattr('app.utils.unit_of_work.async_session_maker', uow.session_factory)
+    dependency = get_uow()
+    request_uow = await dependency.__anext__()
+
+    await CategoryService.get_by_query_one_or_none(uow=request_uow, id=1)
+    await ProductService.get_by_query_all(uow=request_uow, category_id=1)
+    await ProductService.get_by_query_one_or_none(uow=request_uow, id=1)
+    with pytest.raises(StopAsyncIteration):
+        await dependency.__anext__()
+
+    assert len(sessions) == 1
+    assert (sessions[0].queries, sessions[0].commits, sessions[0].closes) == (3, 1, 1)
+
+
+async def test_after_commit_callbacks_run_once_committed(uow, sessions):
+    calls = []
+
+    async def purge():
+        calls.append(sessions[-1].commits)
+
+    async with uow:
+        async with uow:
+            uow.after_commit(purge)
+        assert calls == []
+
+    assert calls == [1]
+
+
+async def test_after_commit_callbacks_are_dropped_on_rollback(uow):
+    calls = []
+
+    async def purge():
+        calls.append(True)
+
+    with pytest.raises(RuntimeError):
+        async with uow:
+            uow.after_commit(purge)
+            raise RuntimeError
+    async with uow:
+        pass
+
+    assert calls == []
+
+
+async def test_a_failing_after_commit_callback_does_not_fail_the_commit(uow, sessions):
+    calls = []
+
+    async def failing():
+        raise ConnectionError
+
+    async def purge():
+        calls.append(True)
+
+    async with uow:
+        uow.after_commit(failing)
+        uow.after_commit(purge)
+
+    assert calls == [True]
+    assert sessions[0].commits == 1